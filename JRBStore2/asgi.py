@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
@@ -14,3 +15,33 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'JRBStore2.settings')
 
 application = get_asgi_application()
+
+# Solo los procesos del servidor vuelcan sus métricas a METRICAS_DIR (ver
+# store/metricas.py); tests y comandos quedan en memoria.
+from store import metricas  # noqa: E402
+
+metricas.habilitar_volcado()
+
+# Índices del buscador cargados antes del primer request (y la matriz de
+# recomendaciones en segundo plano). Si la BD todavía no está migrada se
+# cargan en el primer uso.
+try:
+    from store import busqueda, recomendaciones
+
+    recomendaciones.cargar_en_segundo_plano()
+    busqueda.construir()
+except Exception:
+    logging.getLogger(__name__).exception(
+        "No se pudieron cargar los índices del buscador al arrancar; se cargan en el primer uso"
+    )
+
+# Firebase (SDK, credenciales y token) inicializado en segundo plano para que
+# el primer guardado del admin no pague la inicialización.
+try:
+    import firebase_app
+    from django.conf import settings
+
+    if settings.FIREBASE_PRECALENTAR:
+        firebase_app.precalentar()
+except Exception:
+    logging.getLogger(__name__).exception("No se pudo precalentar Firebase al arrancar")
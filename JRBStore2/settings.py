@@ -17,7 +17,15 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-FIREBASE_KEY_PATH = BASE_DIR / "firebase-key.json"
+# Firebase (ver firebase_app.py). FIREBASE_HABILITADO=0 corre la tienda sin
+# Firebase. Tras FIREBASE_FALLOS_MAXIMOS fallos seguidos no se llama a
+# Firestore por FIREBASE_ENFRIAMIENTO_SEGUNDOS. FIREBASE_PRECALENTAR=1
+# inicializa el SDK al arrancar cada worker (wsgi/asgi).
+FIREBASE_HABILITADO = os.environ.get("FIREBASE_HABILITADO", "1") == "1"
+FIREBASE_KEY_PATH = Path(os.environ.get("FIREBASE_KEY_PATH", BASE_DIR / "firebase-key.json"))
+FIREBASE_PRECALENTAR = os.environ.get("FIREBASE_PRECALENTAR", "0") == "1"
+FIREBASE_FALLOS_MAXIMOS = int(os.environ.get("FIREBASE_FALLOS_MAXIMOS", "3"))
+FIREBASE_ENFRIAMIENTO_SEGUNDOS = int(os.environ.get("FIREBASE_ENFRIAMIENTO_SEGUNDOS", "60"))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -44,7 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.instrumentacion.InstrumentacionMiddleware',
+    'store.perfiles.PerfilesMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'store.db_routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,7 +69,8 @@ ROOT_URLCONF = 'JRBStore2.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que mide el tiempo de render (store.instrumentacion)
+        'BACKEND': 'store.template_backends.DjangoTemplatesMedido',
         # carpeta global de templates (la puedes crear luego)
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
@@ -74,18 +86,210 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'JRBStore2.wsgi.application'
+ASGI_APPLICATION = 'JRBStore2.asgi.application'
+
+# Vistas async para catálogo y carrito (usar con un servidor ASGI, p. ej. uvicorn)
+STORE_ASYNC_VIEWS = os.environ.get("STORE_ASYNC_VIEWS", "0") == "1"
 
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+#
+# Se configura por variables de entorno:
+#   DB_ENGINE=sqlite (por defecto) | postgres
+#
+# SQLite: WAL + synchronous=NORMAL + busy timeout + mmap, y transacciones
+# IMMEDIATE para que las escrituras concurrentes (carrito, admin) esperen su
+# turno en vez de fallar con "database is locked". DB_SQLITE_TUNING=0 deja
+# SQLite con la configuración por defecto (útil para comparar en benchmarks).
+#
+# Postgres: conexiones persistentes (CONN_MAX_AGE + health checks) o, con
+# DB_POOL=1, el pool nativo de Django/psycopg (requiere psycopg[pool]).
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DB_NAME", "jrbstore"),
+            'USER': os.environ.get("DB_USER", "jrbstore"),
+            'PASSWORD': os.environ.get("DB_PASSWORD", ""),
+            'HOST': os.environ.get("DB_HOST", "localhost"),
+            'PORT': os.environ.get("DB_PORT", "5432"),
+            'CONN_MAX_AGE': int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get("DB_POOL", "0") == "1":
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get("DB_POOL_MIN", "2")),
+            'max_size': int(os.environ.get("DB_POOL_MAX", "10")),
+            'timeout': int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+        # El pool administra las conexiones: Django exige CONN_MAX_AGE = 0
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get("DB_SQLITE_TUNING", "1") == "1":
+        busy_timeout_ms = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "20000"))
+        DATABASES['default']['OPTIONS'] = {
+            'timeout': busy_timeout_ms / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                f"PRAGMA busy_timeout={busy_timeout_ms};"
+                "PRAGMA mmap_size=134217728;"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+        }
+
+# Réplicas de lectura para el catálogo (ver store/db_routers.py).
+# DB_REPLICAS es una lista separada por comas: hosts en Postgres o rutas de
+# archivo en SQLite (p. ej. una copia hecha con `manage.py sincronizar_replica`).
+DB_REPLICAS = [r.strip() for r in os.environ.get("DB_REPLICAS", "").split(",") if r.strip()]
+
+for i, replica in enumerate(DB_REPLICAS):
+    config = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == "postgres":
+        config['HOST'] = replica
+    else:
+        config['NAME'] = replica
+    DATABASES[f'replica_{i}'] = config
+
+DATABASE_ROUTERS = ["store.db_routers.CatalogoRouter"] if DB_REPLICAS else []
+
+# Segundos que un cliente sigue leyendo de la primaria después de escribir
+# (cubre el redirect posterior a un POST mientras la réplica se pone al día).
+DB_REPLICA_FIJAR_SEGUNDOS = int(os.environ.get("DB_REPLICA_FIJAR_SEGUNDOS", "5"))
+
+
+# Caché
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+#
+# CACHE_BACKEND=locmem (un solo nodo, por defecto) | file | redis (cluster).
+# Todas las claves llevan CACHE_KEY_PREFIX y CACHE_VERSION: subir la versión
+# en un deploy invalida toda la caché de una vez sin tener que vaciarla.
+# Los backends de store.cache_backends cuentan hits/misses (admin/cache/).
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "redis":
+    _cache = {
+        'BACKEND': 'store.cache_backends.ContadorRedisCache',
+        'LOCATION': os.environ.get("CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+    }
+elif CACHE_BACKEND == "file":
+    _cache = {
+        'BACKEND': 'store.cache_backends.ContadorFileBasedCache',
+        'LOCATION': os.environ.get("CACHE_LOCATION", "/var/tmp/jrbstore_cache"),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+else:
+    _cache = {
+        'BACKEND': 'store.cache_backends.ContadorLocMemCache',
+        'LOCATION': 'jrbstore',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **_cache,
+        'TIMEOUT': int(os.environ.get("CACHE_TIMEOUT", "300")),
+        'KEY_PREFIX': os.environ.get("CACHE_KEY_PREFIX", "jrbstore"),
+        'VERSION': int(os.environ.get("CACHE_VERSION", "1")),
     }
 }
 
+# Sesiones en caché con respaldo en BD: el context processor del carrito lee
+# la sesión en cada render y así no consulta la BD por cada página.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Catálogo para anónimos: segundos que lo puede guardar el navegador y un
+# proxy / CDN (s-maxage). Después se revalida con ETag (ver store/condicional.py).
+CATALOGO_CACHE_MAX_AGE = int(os.environ.get("CATALOGO_CACHE_MAX_AGE", "60"))
+CATALOGO_CACHE_S_MAXAGE = int(os.environ.get("CATALOGO_CACHE_S_MAXAGE", "300"))
+
+
+# Instrumentación por request (ver store/instrumentacion.py): cabecera
+# Server-Timing, log JSON por request y presupuesto de consultas por nombre
+# de URL. Con INSTRUMENTACION_ESTRICTA=1 (tests) superar el presupuesto lanza
+# una excepción en vez de solo registrar un warning.
+INSTRUMENTACION_SERVER_TIMING = os.environ.get(
+    "INSTRUMENTACION_SERVER_TIMING", "1" if DEBUG else "0"
+) == "1"
+INSTRUMENTACION_ESTRICTA = os.environ.get("INSTRUMENTACION_ESTRICTA", "0") == "1"
+INSTRUMENTACION_PRESUPUESTO_CONSULTAS = {
+    "home": 6,
+    "cart_detail": 8,
+    "product_list": 10,
+}
+
+
+# Perfiles de requests (ver store/perfiles.py, panel/perfiles/). Apagados
+# por defecto. PERFILES_MUESTREO: fracción de requests perfilados con
+# cProfile (0.01 = 1 %). PERFILES_UMBRAL_MS: muestrea la pila de todos los
+# requests y guarda los que tardan más que eso. PERFILES_VISTAS: nombres de
+# URL separados por coma (vacío = todas).
+PERFILES_MUESTREO = float(os.environ.get("PERFILES_MUESTREO", "0"))
+PERFILES_UMBRAL_MS = float(os.environ.get("PERFILES_UMBRAL_MS", "0"))
+PERFILES_INTERVALO_MS = float(os.environ.get("PERFILES_INTERVALO_MS", "5"))
+PERFILES_VISTAS = [v for v in os.environ.get("PERFILES_VISTAS", "").split(",") if v]
+PERFILES_MAXIMO = int(os.environ.get("PERFILES_MAXIMO", "500"))
+
+
+# Consultas lentas (ver store/consultas_lentas.py, panel/consultas-lentas/):
+# las que tardan al menos este umbral se registran con su plan. 0 = apagado
+# (100 es un buen valor para producción).
+CONSULTAS_LENTAS_UMBRAL_MS = float(os.environ.get("CONSULTAS_LENTAS_UMBRAL_MS", "0"))
+
+
+# Métricas Prometheus en /metrics (ver store/metricas.py). Cada worker del
+# servidor (wsgi.py / asgi.py) vuelca lo suyo a METRICAS_DIR (local a la
+# máquina); tests y comandos no escriben ahí. Vaciar el directorio en cada
+# deploy. Con METRICAS_TOKEN el endpoint exige
+# "Authorization: Bearer <token>"; sin token solo responde al staff.
+METRICAS_DIR = os.environ.get("METRICAS_DIR", "/var/tmp/jrbstore_metricas")
+METRICAS_VOLCADO_SEGUNDOS = int(os.environ.get("METRICAS_VOLCADO_SEGUNDOS", "5"))
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+
+
+# Login con usuario o correo (ver store/autenticacion.py)
+AUTHENTICATION_BACKENDS = ["store.autenticacion.UsuarioOCorreoBackend"]
+
+
+# Hash de contraseñas (ver store/hashers.py). PASSWORD_HASHER elige el
+# algoritmo de las contraseñas nuevas; los hashes existentes de los otros
+# algoritmos se siguen aceptando y se migran solos al iniciar sesión.
+# "argon2" requiere argon2-cffi (pip install "django[argon2]").
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "pbkdf2")
+# Sin PBKDF2_ITERATIONS se usan las iteraciones de Django, que suben con
+# cada versión (los hashes viejos se actualizan al iniciar sesión).
+PBKDF2_ITERATIONS = int(os.environ["PBKDF2_ITERATIONS"]) if os.environ.get("PBKDF2_ITERATIONS") else None
+SCRYPT_WORK_FACTOR = int(os.environ.get("SCRYPT_WORK_FACTOR", str(2**15)))
+SCRYPT_BLOCK_SIZE = int(os.environ.get("SCRYPT_BLOCK_SIZE", "8"))
+SCRYPT_PARALLELISM = int(os.environ.get("SCRYPT_PARALLELISM", "1"))
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "1"))
+
+_HASHERS = {
+    "pbkdf2": "store.hashers.PBKDF2Hasher",
+    "scrypt": "store.hashers.ScryptHasher",
+    "argon2": "store.hashers.Argon2Hasher",
+}
+PASSWORD_HASHERS = [_HASHERS[PASSWORD_HASHER]] + [
+    ruta for nombre, ruta in _HASHERS.items() if nombre != PASSWORD_HASHER
+] + ["django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -141,6 +345,12 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Módulo de stock: desde cuántas unidades un producto se considera "bajo stock"
+STOCK_BAJO_UMBRAL = int(os.environ.get("STOCK_BAJO_UMBRAL", "5"))
+
+# Productos por página en el panel de stock
+PANEL_PRODUCTOS_POR_PAGINA = 50
+
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "account_dashboard"
 LOGOUT_REDIRECT_URL = "home"
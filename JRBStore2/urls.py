@@ -19,7 +19,10 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from store.admin import estadisticas_cache
+
 urlpatterns = [
+    path('admin/cache/', admin.site.admin_view(estadisticas_cache), name='admin_cache'),
     path('admin/', admin.site.urls),
     path('', include('store.urls')),
 ]
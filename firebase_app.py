@@ -1,31 +1,184 @@
-from pathlib import Path
+"""
+Acceso a Firestore (firebase_admin) para la sincronización de la tienda.
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+- firebase_admin se importa recién al inicializar: los comandos de manage.py
+  y los tests que no sincronizan no pagan la importación del SDK.
+- FIREBASE_HABILITADO=0 apaga Firebase por completo: disponible() es False
+  y quien sincroniza no hace nada.
+- Si falta el archivo de credenciales se registra una sola vez y Firebase
+  queda no disponible hasta reiniciar el proceso (no se reintenta en cada
+  guardado).
+- Circuito: tras FIREBASE_FALLOS_MAXIMOS fallos seguidos no se llama a
+  Firestore durante FIREBASE_ENFRIAMIENTO_SEGUNDOS. Pasado ese tiempo queda
+  semiabierto: llamada() deja pasar una sola llamada de prueba (reservada
+  bajo _lock) y rechaza las demás mientras dura. Si funciona se cierra; si
+  falla vuelve a abrirse.
+- precalentar() (FIREBASE_PRECALENTAR, desde wsgi/asgi) inicializa el SDK y
+  hace una lectura para resolver el token antes del primer guardado.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
 
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
 _firebase_app = None
 _db = None
+_error_configuracion = None
+_fallos = 0
+_abierto_hasta = 0.0  # 0: circuito cerrado
+_sonda = None  # hilo que hace la llamada de prueba con el circuito semiabierto
 
 
-def get_db():
+class FirebaseNoDisponible(RuntimeError):
+    pass
+
+
+def disponible():
+    """True si tiene sentido llamar a Firestore ahora."""
+    return (
+        settings.FIREBASE_HABILITADO
+        and _error_configuracion is None
+        and _abierto_hasta <= time.monotonic()
+        and _sonda in (None, threading.get_ident())
+    )
+
+
+def _reservar():
     """
-    Devuelve una instancia de Firestore.
-    Inicializa Firebase solo la primera vez que se llama.
+    True si este hilo puede llamar a Firestore. Con el circuito semiabierto
+    solo el primero que llega (la sonda) pasa; los demás reciben False hasta
+    que la sonda termina.
     """
-    global _firebase_app, _db
+    global _sonda
+    if not disponible():
+        return False
+    if not _abierto_hasta:
+        return True
+    with _lock:
+        if not _abierto_hasta:
+            return True
+        if _sonda is None:
+            _sonda = threading.get_ident()
+        return _sonda == threading.get_ident()
 
-    if _db is not None:
-        return _db
 
-    base_dir = Path(__file__).resolve().parent
-    cred_path = base_dir / "firebase-key.json"
+def _liberar():
+    global _sonda
+    if _sonda == threading.get_ident():
+        with _lock:
+            _sonda = None
 
+
+def _registrar_fallo(error):
+    global _fallos, _abierto_hasta
+    with _lock:
+        _fallos += 1
+        if _fallos >= settings.FIREBASE_FALLOS_MAXIMOS:
+            _abierto_hasta = time.monotonic() + settings.FIREBASE_ENFRIAMIENTO_SEGUNDOS
+            logger.warning(
+                "Firebase: %s fallos seguidos (%s). No se llama a Firestore por %s s.",
+                _fallos,
+                error,
+                settings.FIREBASE_ENFRIAMIENTO_SEGUNDOS,
+            )
+
+
+def _registrar_exito():
+    global _fallos, _abierto_hasta
+    if _fallos:
+        with _lock:
+            _fallos, _abierto_hasta = 0, 0.0
+
+
+def _inicializar():
+    global _firebase_app, _db, _error_configuracion
+
+    cred_path = settings.FIREBASE_KEY_PATH
     if not cred_path.exists():
-        raise FileNotFoundError(
-            f"No se encontró el archivo de credenciales de Firebase: {cred_path}"
-        )
+        _error_configuracion = f"No se encontró el archivo de credenciales de Firebase: {cred_path}"
+        logger.error("%s. La sincronización con Firestore queda desactivada.", _error_configuracion)
+        raise FirebaseNoDisponible(_error_configuracion)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    from store.instrumentacion import ClienteMedido
 
     cred = credentials.Certificate(str(cred_path))
     _firebase_app = firebase_admin.initialize_app(cred)
-    _db = firestore.client()
+    # Mide el tiempo de Firestore de cada request (Server-Timing / logs)
+    _db = ClienteMedido(firestore.client())
+
+
+def get_db():
+    """
+    Devuelve una instancia de Firestore.
+    Inicializa Firebase solo la primera vez que se llama.
+    """
+    if _db is not None and disponible():
+        return _db
+    if not settings.FIREBASE_HABILITADO:
+        raise FirebaseNoDisponible("Firebase está desactivado (FIREBASE_HABILITADO=0).")
+    if _error_configuracion is not None:
+        raise FirebaseNoDisponible(_error_configuracion)
+    if not disponible():
+        raise FirebaseNoDisponible("Circuito de Firebase abierto tras fallos seguidos.")
+
+    # Los errores al inicializar los cuenta llamada() para el circuito
+    with _lock:
+        if _db is None:
+            _inicializar()
     return _db
+
+
+@contextmanager
+def llamada():
+    """
+    Envuelve una sincronización con Firestore: sus errores cuentan para el
+    circuito y, con el circuito abierto, falla enseguida sin llamar.
+    """
+    if not _reservar():
+        raise FirebaseNoDisponible("Firebase no disponible.")
+    try:
+        yield
+    except FirebaseNoDisponible:
+        raise
+    except Exception as e:
+        _registrar_fallo(e)
+        raise
+    else:
+        _registrar_exito()
+    finally:
+        _liberar()
+
+
+def precalentar():
+    """Inicializa Firebase y hace una lectura en segundo plano (al arrancar el worker)."""
+
+    def correr():
+        try:
+            with llamada():
+                get_db().collection("productos").document("_precalentamiento").get()
+        except Exception as e:
+            logger.warning("No se pudo precalentar Firebase: %s", e)
+
+    if disponible():
+        threading.Thread(target=correr, daemon=True, name="firebase-precalentar").start()
+
+
+def estado():
+    """Resumen para diagnóstico."""
+    return {
+        "habilitado": settings.FIREBASE_HABILITADO,
+        "inicializado": _db is not None,
+        "error_configuracion": _error_configuracion,
+        "fallos_seguidos": _fallos,
+        "circuito_abierto": _abierto_hasta > time.monotonic(),
+        "circuito_semiabierto": 0 < _abierto_hasta <= time.monotonic(),
+        "sonda_en_curso": _sonda is not None,
+    }
@@ -1,13 +1,106 @@
-from django.contrib import admin
-from .models import Producto, Genero
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.shortcuts import redirect, render
+
+from . import generos
+from .cache_backends import ContadorMixin, estadisticas
+from .forms import AdminCrearUsuarioForm, AdminUsuarioForm
+from .models import Producto, Genero, MovimientoStock, SnapshotStock
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UsuarioAdmin(UserAdmin):
+    """UserAdmin con el correo validado sin distinguir mayúsculas."""
+    form = AdminUsuarioForm
+    add_form = AdminCrearUsuarioForm
+    add_fieldsets = (
+        (
+            None,
+            {
+                "classes": ("wide",),
+                "fields": ("username", "email", "usable_password", "password1", "password2"),
+            },
+        ),
+    )
+
 
 @admin.register(Genero)
 class GeneroAdmin(admin.ModelAdmin):
     list_display = ("nombre",)
     search_fields = ("nombre",)
 
+class GeneroFilter(admin.SimpleListFilter):
+    """Filtro por género usando la caché de géneros."""
+    title = "género"
+    parameter_name = "genero"
+
+    def lookups(self, request, model_admin):
+        return generos.choices()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(generos__id=self.value())
+        return queryset
+
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ("nombre", "plataforma", "formato", "estado", "valor", "stock")
-    list_filter = ("plataforma", "formato", "estado", "generos")
-    search_fields = ("nombre",)
\ No newline at end of file
+    list_filter = ("plataforma", "formato", "estado", GeneroFilter)
+    search_fields = ("nombre",)
+
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ("producto_nombre", "plataforma", "delta", "motivo", "creado_en")
+    list_filter = ("motivo", "plataforma")
+    search_fields = ("producto_nombre",)
+    date_hierarchy = "creado_en"
+
+    # El historial es de solo lectura (solo se agregan filas)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SnapshotStock)
+class SnapshotStockAdmin(admin.ModelAdmin):
+    list_display = ("producto", "stock", "tomado_en")
+    search_fields = ("producto__nombre",)
+    list_select_related = ("producto",)
+    date_hierarchy = "tomado_en"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def estadisticas_cache(request):
+    """
+    Hits/misses de las cachés configuradas. Se monta en admin/cache/ con
+    admin.site.admin_view (solo staff).
+    """
+    if request.method == "POST":
+        for alias in caches:
+            if isinstance(caches[alias], ContadorMixin):
+                caches[alias].reiniciar_estadisticas()
+        messages.success(request, "Contadores reiniciados.")
+        return redirect("admin_cache")
+
+    context = {
+        **admin.site.each_context(request),
+        "title": "Caché",
+        "filas": estadisticas(),
+    }
+    return render(request, "admin/cache_stats.html", context)
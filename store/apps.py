@@ -15,4 +15,12 @@ class StoreConfig(AppConfig):
 
     def ready(self):
         # Importa los signals para que se registren
-        import store.signals  
\ No newline at end of file
+        import store.signals  
+        # Instala el registro de consultas lentas en cada conexión
+        import store.consultas_lentas
+        # Chequeos de configuración (manage.py check)
+        import store.checks
+        # Reconstruye el resumen de stock si cambió STOCK_BAJO_UMBRAL
+        from django.db.models.signals import post_migrate
+        from store import inventario
+        post_migrate.connect(inventario.al_migrar, sender=self)
@@ -0,0 +1,219 @@
+# store/async_views.py
+"""
+Versiones async (ASGI) de las vistas del catálogo, del carrito y del login.
+
+Se activan con STORE_ASYNC_VIEWS=1 (ver store/urls.py) y mantienen los mismos
+nombres de URL, templates y mensajes que las vistas de store.views. Toda la
+E/S (sesión, usuario, ORM) se hace con las APIs async de Django, así que bajo
+un servidor ASGI no ocupan un hilo del pool sync_to_async por request.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import alogin
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render, redirect, aget_object_or_404
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from .cart import Cart, CART_SESSION_ID
+from .condicional import catalogo_condicional
+from .filtros import filtrar_catalogo
+from .forms import UserLoginForm
+from .hashers import pool as pool_hashers
+from .models import Producto
+from . import generos, catalogo, busqueda, metricas
+from .views import PLATAFORMA_CHOICES, FORMATO_CHOICES
+
+
+async def _preparar(request):
+    """
+    Resuelve de forma async lo que los templates y context processors leen
+    después de forma sync: el usuario autenticado y la sesión.
+    """
+    request.user = await request.auser()
+    return await Cart.acrear(request)
+
+
+# ---------------------------------------------------------------------------
+#  PÁGINA PRINCIPAL (CATÁLOGO + BÚSQUEDA + FILTROS)
+# ---------------------------------------------------------------------------
+@catalogo_condicional
+async def home(request):
+    """Versión async de store.views.home (mismos parámetros GET)."""
+    # Sin carrito: el catálogo no toca la sesión para poder cachearse
+    request.user = await request.auser()
+
+    # filtrar_catalogo puede consultar el resumen de stock (sync)
+    productos, filters = await sync_to_async(filtrar_catalogo)(
+        Producto.objects.all().order_by("-creado_en"), request.GET
+    )
+
+    context = {
+        "productos": [p async for p in catalogo.listar(productos, filters["relevancia"]).aiterator(chunk_size=2000)],
+        "plataformas": PLATAFORMA_CHOICES,
+        "formatos": FORMATO_CHOICES,
+        # La caché de géneros solo consulta la BD cuando está vacía o vencida
+        "generos_disponibles": await sync_to_async(generos.todos)(),
+        "filters": filters,
+    }
+    return render(request, "store/home.html", context)
+
+
+@require_GET
+async def search_suggest(request):
+    """Versión async de store.views.search_suggest."""
+    if not busqueda.indice.listo:
+        # Sin warm-up: la primera carga del índice consulta la BD
+        await sync_to_async(busqueda.indice.construir)()
+    return busqueda.respuesta_sugerencias(request)
+
+
+# ---------------------------------------------------------------------------
+#  CARRITO DE COMPRAS
+# ---------------------------------------------------------------------------
+@never_cache
+@require_GET
+async def cart_summary(request):
+    """Versión async de store.views.cart_summary."""
+    await request.session.aget(CART_SESSION_ID)
+    return JsonResponse(
+        {
+            "cantidad": Cart.cantidad_en_sesion(request.session),
+            "csrf_token": get_token(request),
+        }
+    )
+
+
+async def cart_detail(request):
+    """Versión async de store.views.cart_detail."""
+    cart = await _preparar(request)
+    items = await cart.aitems()
+
+    total_products = sum(i["total_price"] for i in items)
+    shipping = 0
+    if total_products > 0:
+        # Envío fijo de ejemplo
+        shipping = 3000
+
+    grand_total = total_products + shipping
+
+    if any(i.get("missing") or i.get("insufficient_stock") for i in items):
+        messages.warning(
+            request,
+            "Algunos productos del carrito ya no están disponibles o no tienen stock. "
+            "Revisa los mensajes junto a cada producto antes de continuar.",
+        )
+
+    context = {
+        "cart_items": items,
+        "total_products": total_products,
+        "shipping": shipping,
+        "grand_total": grand_total,
+        "quantity_range": range(1, 11),
+    }
+    return render(request, "store/cart_detail.html", context)
+
+
+async def cart_add(request, product_id):
+    """Versión async de store.views.cart_add."""
+    cart = await _preparar(request)
+    producto = await aget_object_or_404(Producto, id=product_id)
+
+    if request.method != "POST":
+        return render(request, "store/cart_add_confirm.html", {"producto": producto})
+
+    if producto.stock < 1:
+        messages.warning(
+            request,
+            f"El producto '{producto.nombre}' ya no tiene stock disponible."
+        )
+        metricas.contar("stock_agotado_total")
+        return redirect("cart_detail")
+
+    cart.add(producto, quantity=1)
+    metricas.contar("carrito_operaciones_total", operacion="agregar")
+    return redirect("cart_detail")
+
+
+async def cart_remove(request, product_id):
+    """Versión async de store.views.cart_remove."""
+    cart = await _preparar(request)
+    producto = await aget_object_or_404(Producto, id=product_id)
+    cart.remove(producto)
+    metricas.contar("carrito_operaciones_total", operacion="quitar")
+    messages.info(request, f"'{producto.nombre}' se eliminó del carrito.")
+    return redirect("cart_detail")
+
+
+async def cart_remove_by_id(request, product_id):
+    """Versión async de store.views.cart_remove_by_id (no consulta la BD)."""
+    cart = await _preparar(request)
+    cart.remove_by_id(product_id)
+    metricas.contar("carrito_operaciones_total", operacion="quitar")
+    messages.info(
+        request,
+        "Un producto que ya no existe en la tienda fue eliminado del carrito.",
+    )
+    return redirect("cart_detail")
+
+
+async def cart_update(request, product_id):
+    """Versión async de store.views.cart_update."""
+    cart = await _preparar(request)
+    producto = await aget_object_or_404(Producto, id=product_id)
+
+    try:
+        quantity = int(request.POST.get("quantity", 1))
+    except (TypeError, ValueError):
+        quantity = 1
+
+    if quantity < 1:
+        cart.remove(producto)
+        metricas.contar("carrito_operaciones_total", operacion="quitar")
+        messages.info(request, f"'{producto.nombre}' se eliminó del carrito.")
+        return redirect("cart_detail")
+
+    if quantity > producto.stock:
+        quantity = producto.stock
+        messages.warning(
+            request,
+            f"Solo hay {producto.stock} unidades disponibles de '{producto.nombre}'. "
+            "Se ajustó la cantidad en el carrito.",
+        )
+
+    cart.add(producto, quantity=quantity, override_quantity=True)
+    metricas.contar("carrito_operaciones_total", operacion="actualizar")
+    return redirect("cart_detail")
+
+
+# ---------------------------------------------------------------------------
+#  AUTENTICACIÓN
+# ---------------------------------------------------------------------------
+async def login_view(request):
+    """
+    Versión async de store.views.login_view. La validación del formulario
+    (que verifica la contraseña) corre en el pool de store.hashers.
+    """
+    request.user = await request.auser()
+    if request.user.is_authenticated:
+        return redirect("account_dashboard")
+
+    if request.method == "POST":
+        form = UserLoginForm(request, data=request.POST)
+        valido = await sync_to_async(
+            form.is_valid, thread_sensitive=False, executor=pool_hashers
+        )()
+        if valido:
+            user = form.get_user()
+            await alogin(request, user)
+            messages.success(
+                request,
+                f"Bienvenido de nuevo, {user.get_full_name() or user.username}."
+            )
+            next_url = request.GET.get("next") or "account_dashboard"
+            return redirect(next_url)
+    else:
+        form = UserLoginForm(request)
+
+    return render(request, "accounts/login.html", {"form": form})
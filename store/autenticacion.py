@@ -0,0 +1,53 @@
+# store/autenticacion.py
+"""
+Login con nombre de usuario o correo.
+
+El correo se guarda ya normalizado en Python (normalizar_correo, señal
+pre_save de User): LOWER() de SQLite solo pasa a minúsculas las letras
+ASCII, así que "ÑANDÚ@x.cl" y "ñandú@x.cl" serían dos correos para la BD.
+Se compara con la expresión NULLIF(LOWER(email), ''), la misma del índice
+único auth_user_email_lower_uniq (migración 0012): sobre un correo ya
+normalizado LOWER() no cambia nada, y registrar y entrar con correo son
+búsquedas por índice. Los usuarios sin correo quedan en NULL y no chocan
+entre sí.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import CharField, Func
+
+
+class CorreoNormalizado(Func):
+    # Con el '' literal (no como parámetro) la expresión es idéntica a la del
+    # índice; si no, SQLite no lo usa.
+    template = "NULLIF(LOWER(%(expressions)s), '')"
+    output_field = CharField()
+
+
+def normalizar_correo(email):
+    """Correo sin espacios y en minúsculas (también las letras no ASCII)."""
+    return (email or "").strip().lower()
+
+
+def usuarios_con_correo(email):
+    """Usuarios cuyo correo coincide con `email` (sin distinguir mayúsculas)."""
+    return get_user_model()._default_manager.alias(correo=CorreoNormalizado("email")).filter(
+        correo=normalizar_correo(email)
+    )
+
+
+class UsuarioOCorreoBackend(ModelBackend):
+    """ModelBackend que además acepta el correo en el campo "usuario"."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is not None or not username or "@" not in username or password is None:
+            return user
+
+        user = usuarios_con_correo(username).first()
+        if user is None:
+            # Mismo costo que un usuario existente (ver ModelBackend)
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,28 @@
+# store/benchmarks.py
+"""
+Estadísticas compartidas por los comandos de benchmark y de carga
+(bench_asgi, bench_db, bench_suite, prueba_carga).
+"""
+import statistics
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) por el método del rango más cercano; 0.0 si no hay valores."""
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    k = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+
+def resumen(latencias, errores, duracion):
+    """Requests, errores, throughput y latencias (en ms) de una corrida."""
+    return {
+        "requests": len(latencias),
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "req_por_s": round(len(latencias) / duracion, 1) if duracion else 0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2) if latencias else 0,
+    }
@@ -0,0 +1,458 @@
+# store/busqueda.py
+"""
+Índices en memoria (por proceso) para el buscador del catálogo.
+
+- IndicePrefijos (autocompletado): arreglo ordenado de (clave, id, completo)
+  donde la clave es el nombre normalizado (minúsculas, sin tildes) desde el
+  inicio y desde cada palabra, así "turis" encuentra "Gran Turismo". Buscar
+  es un bisect + un recorrido corto.
+- IndiceTrigramas (búsqueda aproximada): índice invertido de trigramas del
+  nombre, más un vocabulario de palabras de la descripción (con menos peso)
+  y las iniciales del nombre ("gt" -> "Gran Turismo"). Tolera errores de
+  tipeo ("gran turimso"). Es el respaldo de `home` cuando la búsqueda
+  exacta no encuentra nada (ver store/filtros.py).
+
+Ninguna consulta toca la BD. Los índices:
+- Se construyen al arrancar (JRBStore2/wsgi.py / asgi.py) o en el primer uso.
+- Se actualizan con las señales de Producto en el proceso que hizo el
+  cambio, cuando la transacción se confirma (un rollback no deja nombres
+  fantasma). El autocompletado junta esos cambios y los aplica todos
+  juntos en la siguiente sugerencia. Los demás procesos los reconstruyen en segundo plano cada
+  BUSQUEDA_INDICE_TTL segundos (mientras tanto siguen respondiendo con el
+  índice anterior).
+- Las lecturas no toman lock (salvo la sugerencia que aplica cambios
+  pendientes): lo que se reemplaza entero (las entradas del
+  autocompletado, las listas de las que se quita un producto) se arma en una
+  copia y se publica de una vez; lo que solo crece (agregar un id a una
+  lista de trigramas) se agrega en el lugar, y un lector ve la lista con o
+  sin el id nuevo.
+"""
+import abc
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+
+from .models import Producto
+
+logger = logging.getLogger(__name__)
+
+_PALABRA = re.compile(r"[^\W_]+")
+
+BUSQUEDA_INDICE_TTL = 300
+MAX_SUGERENCIAS = 8
+SUGERENCIAS_CACHE_MAX_AGE = 30
+
+# Búsqueda aproximada
+APROX_MAX_RESULTADOS = 100
+APROX_PRESUPUESTO_MS = 50  # se deja de juntar candidatos pasado este tiempo
+APROX_UMBRAL = 0.5  # fracción mínima de trigramas de la consulta en el nombre
+APROX_UMBRAL_PALABRA = 0.45  # similitud mínima entre palabras (descripción)
+APROX_PESO_DESCRIPCION = 0.4
+APROX_DESCRIPCION_MAX_CARACTERES = 500
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes/diacríticos ("Pokémon" -> "pokemon")."""
+    if texto.isascii():
+        return texto.casefold()
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    """Palabras (alfanuméricas) del texto normalizado."""
+    return _PALABRA.findall(normalizar(texto))
+
+
+def trigramas(palabra):
+    """Trigramas de una palabra con relleno, al estilo de pg_trgm."""
+    rellena = f"  {palabra} "
+    return {rellena[i:i + 3] for i in range(len(rellena) - 2)}
+
+
+def trigramas_texto(texto):
+    resultado = set()
+    for palabra in palabras(texto):
+        resultado |= trigramas(palabra)
+    return resultado
+
+
+def iniciales(nombre):
+    """Iniciales de las palabras con letras ("Gran Turismo 7" -> "gt")."""
+    return "".join(p[0] for p in palabras(nombre) if p[0].isalpha())
+
+
+class _IndiceMemoria(abc.ABC):
+    """Carga, vigencia y reconstrucción en segundo plano de un índice."""
+
+    campos = ("id", "nombre")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._construido_en = None
+        self._reconstruyendo = False
+
+    @abc.abstractmethod
+    def _cargar(self, filas):
+        """Arma el índice desde las filas de `campos` y lo publica."""
+
+    def construir(self):
+        """Carga todos los productos desde la BD (una consulta)."""
+        filas = list(Producto.objects.values_list(*self.campos).iterator(chunk_size=5000))
+        self._cargar(filas)
+        self._construido_en = time.monotonic()
+        return len(filas)
+
+    @property
+    def listo(self):
+        return self._construido_en is not None
+
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            self.construir()
+        except Exception:
+            logger.exception("No se pudo reconstruir el índice de búsqueda")
+        finally:
+            self._reconstruyendo = False
+            # El hilo abrió su propia conexión: se cierra al terminar
+            connections.close_all()
+
+    def _revisar_vigencia(self):
+        if self._construido_en is None:
+            # Primer uso en este proceso (sin warm-up): se construye ahora
+            with self._lock_carga:
+                if self._construido_en is None:
+                    self.construir()
+            return
+        vencido = time.monotonic() - self._construido_en > BUSQUEDA_INDICE_TTL
+        if vencido and not self._reconstruyendo:
+            self._reconstruyendo = True
+            threading.Thread(target=self._reconstruir_en_segundo_plano, daemon=True).start()
+
+
+# ---------------------------------------------------------------------------
+#  Autocompletado
+# ---------------------------------------------------------------------------
+def _entradas(producto_id, nombre):
+    """Entrada del nombre completo y de cada palabra en adelante."""
+    normalizado = normalizar(nombre).strip()
+    entradas = [(normalizado, producto_id, True)]
+    for i, c in enumerate(normalizado):
+        if i and c.isalnum() and not normalizado[i - 1].isalnum():
+            entradas.append((normalizado[i:], producto_id, False))
+    return entradas
+
+
+class IndicePrefijos(_IndiceMemoria):
+    def __init__(self):
+        super().__init__()
+        # (entradas, nombres): [(clave, producto_id, completo)] ordenado y
+        # producto_id -> nombre. Se publican juntos en una sola asignación
+        # para que un lector nunca vea entradas sin su nombre.
+        self._estado = ([], {})
+        # producto_id -> nombre nuevo (None si se quitó), pendientes de
+        # aplicar. Copiar las entradas en cada guardado sería O(n) por
+        # producto (O(n²) en una importación): se juntan y se aplican todos
+        # de una vez en la próxima lectura.
+        self._pendientes = {}
+
+    def _cargar(self, filas):
+        entradas = sorted(
+            entrada for producto_id, nombre in filas for entrada in _entradas(producto_id, nombre)
+        )
+        with self._lock:
+            # Los pendientes se conservan: aplicarlos otra vez no cambia nada
+            # y no se pierde lo que se guardó mientras corría la consulta.
+            self._estado = (entradas, dict(filas))
+
+    def actualizar(self, producto):
+        with self._lock:
+            if self.listo:  # si no, se cargará completo en el primer uso
+                self._pendientes[producto.pk] = producto.nombre
+
+    def quitar(self, producto_id):
+        with self._lock:
+            if self.listo:
+                self._pendientes[producto_id] = None
+
+    def _aplicar_pendientes(self):
+        """
+        Una sola pasada por las entradas para todos los cambios anotados:
+        O(n + k log k) con k cambios, en vez de O(n) por cada uno.
+        """
+        with self._lock:
+            if not self._pendientes:
+                return
+            pendientes, self._pendientes = self._pendientes, {}
+            entradas, nombres = self._estado
+            nuevas = sorted(
+                entrada
+                for producto_id, nombre in pendientes.items()
+                if nombre is not None
+                for entrada in _entradas(producto_id, nombre)
+            )
+            entradas = list(
+                heapq.merge((e for e in entradas if e[1] not in pendientes), nuevas)
+            )
+            nombres = dict(nombres)
+            for producto_id, nombre in pendientes.items():
+                if nombre is None:
+                    nombres.pop(producto_id, None)
+                else:
+                    nombres[producto_id] = nombre
+            self._estado = (entradas, nombres)
+
+    def sugerir(self, prefijo, limite=MAX_SUGERENCIAS):
+        """
+        Hasta `limite` productos cuyo nombre (o una de sus palabras) empieza
+        con `prefijo`. Primero los que coinciden desde el inicio del nombre.
+        """
+        prefijo = normalizar(prefijo).strip()
+        if not prefijo:
+            return []
+        self._revisar_vigencia()
+        if self._pendientes:
+            self._aplicar_pendientes()
+
+        entradas, nombres = self._estado
+        inicio = bisect.bisect_left(entradas, (prefijo,))
+        desde_inicio, por_palabra, vistos = [], [], set()
+        for clave, producto_id, completo in entradas[inicio:inicio + limite * 8]:
+            if not clave.startswith(prefijo):
+                break
+            if producto_id in vistos:
+                continue
+            vistos.add(producto_id)
+            destino = desde_inicio if completo else por_palabra
+            destino.append({"id": producto_id, "nombre": nombres[producto_id]})
+
+        return (desde_inicio + por_palabra)[:limite]
+
+
+# ---------------------------------------------------------------------------
+#  Búsqueda aproximada (trigramas)
+# ---------------------------------------------------------------------------
+# Las listas de ids son arrays de enteros sin signo de 64 bits: los ids son
+# BigAutoField y con "I" (32 bits) un id >= 2**32 daría OverflowError.
+_TIPO_ID = "Q"
+
+
+def _agregar(postings, clave, producto_id):
+    """Agrega en el lugar (O(1) amortizado): la lista solo crece."""
+    ids = postings.get(clave)
+    if ids is None:
+        postings[clave] = array(_TIPO_ID, [producto_id])
+    else:
+        ids.append(producto_id)
+
+
+def _sacar(postings, clave, producto_id):
+    """Quita sobre una copia y la publica: un lector nunca ve la lista corrida."""
+    ids = postings.get(clave)
+    if ids is None or producto_id not in ids:
+        return
+    restantes = array(_TIPO_ID, ids)
+    restantes.remove(producto_id)
+    if restantes:
+        postings[clave] = restantes
+    else:
+        postings.pop(clave, None)
+
+
+class IndiceTrigramas(_IndiceMemoria):
+    """
+    - _nombre: trigrama -> ids de productos cuyo nombre lo contiene.
+    - _iniciales: iniciales del nombre -> ids.
+    - _palabras: palabra de la descripción -> ids; _vocabulario: trigrama ->
+      palabras. La descripción se compara palabra a palabra contra el
+      vocabulario (mucho más chico que el texto completo).
+    - _producto: id -> (trigramas del nombre, iniciales, palabras de la
+      descripción), para las actualizaciones incrementales.
+    """
+
+    campos = ("id", "nombre", "descripcion")
+
+    def __init__(self):
+        super().__init__()
+        self._nombre = {}
+        self._iniciales = {}
+        self._palabras = {}
+        self._vocabulario = {}
+        self._producto = {}
+
+    @staticmethod
+    def _datos(nombre, descripcion):
+        return (
+            frozenset(trigramas_texto(nombre)),
+            iniciales(nombre),
+            frozenset(palabras((descripcion or "")[:APROX_DESCRIPCION_MAX_CARACTERES])),
+        )
+
+    def _cargar(self, filas):
+        nombre_ids, iniciales_ids, palabras_ids, producto = {}, {}, {}, {}
+        for producto_id, nombre, descripcion in filas:
+            datos = self._datos(nombre, descripcion)
+            producto[producto_id] = datos
+            tris, ini, pals = datos
+            for t in tris:
+                nombre_ids.setdefault(t, []).append(producto_id)
+            if ini:
+                iniciales_ids.setdefault(ini, []).append(producto_id)
+            for p in pals:
+                palabras_ids.setdefault(p, []).append(producto_id)
+
+        vocabulario = {}
+        for palabra in palabras_ids:
+            for t in trigramas(palabra):
+                vocabulario.setdefault(t, []).append(palabra)
+
+        def compactar(postings):
+            return {k: array(_TIPO_ID, v) for k, v in postings.items()}
+
+        with self._lock:
+            self._nombre = compactar(nombre_ids)
+            self._iniciales = compactar(iniciales_ids)
+            self._palabras = compactar(palabras_ids)
+            self._vocabulario = vocabulario
+            self._producto = producto
+
+    def actualizar(self, producto):
+        with self._lock:
+            if not self.listo:
+                return
+            self._quitar(producto.pk)
+            datos = self._datos(producto.nombre, producto.descripcion)
+            tris, ini, pals = datos
+            for t in tris:
+                _agregar(self._nombre, t, producto.pk)
+            if ini:
+                _agregar(self._iniciales, ini, producto.pk)
+            for p in pals:
+                if p not in self._palabras:
+                    for t in trigramas(p):
+                        self._vocabulario.setdefault(t, []).append(p)
+                _agregar(self._palabras, p, producto.pk)
+            self._producto[producto.pk] = datos
+
+    def quitar(self, producto_id):
+        with self._lock:
+            if self.listo:
+                self._quitar(producto_id)
+
+    def _quitar(self, producto_id):
+        datos = self._producto.pop(producto_id, None)
+        if datos is None:
+            return
+        tris, ini, pals = datos
+        for t in tris:
+            _sacar(self._nombre, t, producto_id)
+        if ini:
+            _sacar(self._iniciales, ini, producto_id)
+        # Las palabras que quedan sin productos siguen en el vocabulario
+        # hasta la próxima reconstrucción; no aportan resultados.
+        for p in pals:
+            _sacar(self._palabras, p, producto_id)
+
+    def _palabras_parecidas(self, palabra):
+        """Palabras del vocabulario con similitud >= APROX_UMBRAL_PALABRA."""
+        consulta = trigramas(palabra)
+        comunes = Counter()
+        for t in consulta:
+            comunes.update(self._vocabulario.get(t, ()))
+        parecidas = {}
+        for candidata, n in comunes.items():
+            similitud = n / (len(consulta) + len(candidata) + 2 - n)
+            if similitud >= APROX_UMBRAL_PALABRA:
+                parecidas[candidata] = similitud
+        return parecidas
+
+    def buscar(self, texto, limite=APROX_MAX_RESULTADOS):
+        """
+        Ids de productos parecidos a `texto`, del más al menos relevante.
+
+        Puntaje = fracción de trigramas de la consulta presentes en el nombre
+        (1.0 si la consulta son sus iniciales) + APROX_PESO_DESCRIPCION por
+        las palabras de la descripción parecidas a las de la consulta.
+        """
+        self._revisar_vigencia()
+        limite_tiempo = time.perf_counter() + APROX_PRESUPUESTO_MS / 1000
+        puntajes = Counter()
+
+        for producto_id in self._iniciales.get("".join(palabras(texto)), ()):
+            puntajes[producto_id] += 1.0
+
+        # Nombre: los trigramas más raros primero, así si se acaba el
+        # presupuesto ya se contaron los que más discriminan. Counter.update
+        # cuenta cada lista de ids de una vez (en C).
+        tris = trigramas_texto(texto)
+        postings = sorted(filter(None, (self._nombre.get(t) for t in tris)), key=len)
+        comunes = Counter()
+        for ids in postings:
+            comunes.update(ids)
+            if time.perf_counter() > limite_tiempo:
+                logger.info("Búsqueda aproximada %r: presupuesto agotado", texto)
+                break
+        minimo = math.ceil(APROX_UMBRAL * len(tris))
+        for producto_id, n in comunes.items():
+            if n >= minimo:
+                puntajes[producto_id] += n / len(tris)
+
+        # Descripción: cada palabra de la consulta contra el vocabulario
+        palabras_consulta = [p for p in palabras(texto) if len(p) >= 3]
+        for palabra in palabras_consulta:
+            if time.perf_counter() > limite_tiempo:
+                break
+            # De menor a mayor similitud: cada producto queda con la de su
+            # palabra más parecida
+            mejor = {}
+            parecidas = sorted(self._palabras_parecidas(palabra).items(), key=lambda par: par[1])
+            for candidata, similitud in parecidas:
+                mejor.update(dict.fromkeys(self._palabras.get(candidata, ()), similitud))
+            peso = APROX_PESO_DESCRIPCION / len(palabras_consulta)
+            for producto_id, similitud in mejor.items():
+                puntajes[producto_id] += peso * similitud
+
+        # Los que solo se parecen un poco en la descripción no alcanzan
+        umbral = APROX_PESO_DESCRIPCION * APROX_UMBRAL_PALABRA
+        mejores = heapq.nlargest(limite, puntajes.items(), key=lambda par: (par[1], -par[0]))
+        return [producto_id for producto_id, puntaje in mejores if puntaje >= umbral]
+
+
+indice = IndicePrefijos()
+indice_aproximado = IndiceTrigramas()
+
+
+def construir():
+    """Carga los dos índices (warm-up al arrancar)."""
+    indice.construir()
+    indice_aproximado.construir()
+
+
+def actualizar(producto):
+    indice.actualizar(producto)
+    indice_aproximado.actualizar(producto)
+
+
+def quitar(producto_id):
+    indice.quitar(producto_id)
+    indice_aproximado.quitar(producto_id)
+
+
+def respuesta_sugerencias(request):
+    """JSON de search_suggest (sync y async); cacheable unos segundos."""
+    q = request.GET.get("q", "")[:100]
+    response = JsonResponse({"q": q, "sugerencias": indice.sugerir(q)})
+    patch_cache_control(response, public=True, max_age=SUGERENCIAS_CACHE_MAX_AGE)
+    return response
@@ -0,0 +1,109 @@
+# store/cache_backends.py
+"""
+Backends de caché de Django que cuentan hits y misses.
+
+Son los backends estándar (locmem, archivo, Redis) con un mixin que lleva
+contadores por proceso. Django crea una instancia de backend por hilo, así
+que los contadores viven a nivel de módulo, agrupados por backend+ubicación.
+La página admin/cache/ los muestra (ver store.admin.estadisticas_cache) y
+cada request suma los suyos a store.instrumentacion.
+"""
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .instrumentacion import registrar_cache
+
+_AUSENTE = object()
+_contadores = Counter()
+_lock = threading.Lock()
+
+
+class ContadorMixin:
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self._clave_contador = f"{type(self).__name__}:{location}"
+
+    def _contar(self, hits, misses):
+        registrar_cache(hits, misses)
+        with _lock:
+            _contadores[(self._clave_contador, "hits")] += hits
+            _contadores[(self._clave_contador, "misses")] += misses
+
+    def get(self, key, default=None, version=None):
+        valor = super().get(key, _AUSENTE, version)
+        if valor is _AUSENTE:
+            self._contar(0, 1)
+            return default
+        self._contar(1, 0)
+        return valor
+
+    def estadisticas(self):
+        with _lock:
+            hits = _contadores[(self._clave_contador, "hits")]
+            misses = _contadores[(self._clave_contador, "misses")]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "ratio": round(100 * hits / total, 1) if total else None,
+        }
+
+    def reiniciar_estadisticas(self):
+        with _lock:
+            _contadores[(self._clave_contador, "hits")] = 0
+            _contadores[(self._clave_contador, "misses")] = 0
+
+
+class ContadorLocMemCache(ContadorMixin, LocMemCache):
+    pass
+
+
+class ContadorFileBasedCache(ContadorMixin, FileBasedCache):
+    pass
+
+
+class ContadorRedisCache(ContadorMixin, RedisCache):
+    # RedisCache resuelve get_many con un solo MGET (no pasa por get)
+    def get_many(self, keys, version=None):
+        valores = super().get_many(keys, version)
+        self._contar(len(valores), len(keys) - len(valores))
+        return valores
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        # En un cluster los contadores del proceso son parciales: se agregan
+        # los del servidor, que cubren a todos los nodos.
+        try:
+            info = self._cache.get_client().info("stats")
+            datos["servidor_hits"] = info.get("keyspace_hits")
+            datos["servidor_misses"] = info.get("keyspace_misses")
+        except Exception:
+            pass
+        return datos
+
+
+def estadisticas():
+    """Estadísticas de cada caché configurada en CACHES."""
+    filas = []
+    for alias in caches:
+        cache = caches[alias]
+        fila = {
+            "alias": alias,
+            "backend": type(cache).__name__,
+            "prefijo": cache.key_prefix,
+            "version": cache.version,
+            "hits": None,
+            "misses": None,
+            "ratio": None,
+            "servidor_hits": None,
+            "servidor_misses": None,
+        }
+        if isinstance(cache, ContadorMixin):
+            fila.update(cache.estadisticas())
+        filas.append(fila)
+    return filas
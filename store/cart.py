@@ -13,6 +13,24 @@ class Cart:
             cart = self.session[CART_SESSION_ID] = {}
         self.cart = cart
 
+    @staticmethod
+    def cantidad_en_sesion(session) -> int:
+        """
+        Unidades en el carrito leyendo la sesión sin modificarla (no crea
+        una sesión nueva para visitantes que todavía no agregaron nada).
+        """
+        cart = session.get(CART_SESSION_ID) or {}
+        return sum(item["quantity"] for item in cart.values())
+
+    @classmethod
+    async def acrear(cls, request):
+        """
+        Constructor para vistas async: carga la sesión con la API async de
+        Django y después construye el carrito sin tocar la BD.
+        """
+        await request.session.aget(CART_SESSION_ID)
+        return cls(request)
+
     # ------------------- operaciones básicas -------------------
 
     def add(self, producto: Producto, quantity=1, override_quantity=False):
@@ -79,40 +97,48 @@ class Cart:
         productos_map = {str(p.id): p for p in productos}
 
         for product_id in product_ids:
-            data = self.cart[product_id]
-            quantity = data["quantity"]
-            unit_price = Decimal(data["price"])
-
-            producto = productos_map.get(product_id)
-
-            if not producto:
-                # producto eliminado de la BD
-                yield {
-                    "product": None,
-                    "product_id": product_id,
-                    "quantity": quantity,
-                    "unit_price": unit_price,
-                    "total_price": Decimal("0"),
-                    "missing": True,
-                    "insufficient_stock": False,
-                }
-                continue
-
-            # stock insuficiente o sin stock
-            insufficient = quantity > producto.stock or producto.stock <= 0
-
-            total_price = producto.valor * quantity if not insufficient else Decimal("0")
-
-            yield {
-                "product": producto,
+            yield self._item(product_id, productos_map.get(product_id))
+
+    async def aitems(self):
+        """Igual que __iter__, pero consulta los productos con el ORM async."""
+        product_ids = list(self.cart.keys())
+        productos_map = {
+            str(p.id): p async for p in Producto.objects.filter(id__in=product_ids)
+        }
+        return [self._item(product_id, productos_map.get(product_id)) for product_id in product_ids]
+
+    def _item(self, product_id, producto):
+        data = self.cart[product_id]
+        quantity = data["quantity"]
+        unit_price = Decimal(data["price"])
+
+        if not producto:
+            # producto eliminado de la BD
+            return {
+                "product": None,
                 "product_id": product_id,
                 "quantity": quantity,
-                "unit_price": producto.valor,
-                "total_price": total_price,
-                "missing": False,
-                "insufficient_stock": insufficient,
+                "unit_price": unit_price,
+                "total_price": Decimal("0"),
+                "missing": True,
+                "insufficient_stock": False,
             }
 
+        # stock insuficiente o sin stock
+        insufficient = quantity > producto.stock or producto.stock <= 0
+
+        total_price = producto.valor * quantity if not insufficient else Decimal("0")
+
+        return {
+            "product": producto,
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_price": producto.valor,
+            "total_price": total_price,
+            "missing": False,
+            "insufficient_stock": insufficient,
+        }
+
     @property
     def total_quantity(self) -> int:
         """Cantidad total de unidades (no de productos distintos)."""
@@ -0,0 +1,136 @@
+# store/catalogo.py
+"""
+Modelo de lectura del catálogo (ProductoVista).
+
+- fila_vista(): arma, desde un Producto, la fila plana que se guarda en la
+  proyección. producto_to_doc() usa la misma fila para Firestore.
+- guardar() / refrescar(): escriben la proyección (upsert por lotes) desde
+  instancias o desde ids. Las llaman las señales de Producto/Genero y los
+  ajustes masivos.
+- relacionados la escribe aparte store.recomendaciones (no está en
+  CAMPOS_VISTA, así que guardar() no la pisa).
+- listar(): la consulta del catálogo. Filtra sobre Producto (índices,
+  géneros, ocultar agotados) y lee las columnas de ProductoVista con
+  .values(), sin instanciar modelos.
+"""
+from itertools import islice
+
+from django.db.models import Case, F, IntegerField, When
+from django.utils.text import Truncator
+
+from . import generos
+from .models import Producto, ProductoVista
+
+REFRESCAR_LOTE = 1000
+
+CAMPOS_VISTA = (
+    "nombre",
+    "anio_lanzamiento",
+    "anio",
+    "plataforma",
+    "formato",
+    "formato_display",
+    "estado",
+    "estado_display",
+    "generos",
+    "generos_texto",
+    "descripcion",
+    "descripcion_corta",
+    "valor",
+    "stock",
+    "imagen_url",
+    "creado_en",
+    "actualizado_en",
+)
+
+# Lo que lee el catálogo: solo las columnas de la tarjeta de home.html
+CAMPOS_TARJETA = (
+    "nombre",
+    "anio",
+    "plataforma",
+    "formato_display",
+    "estado_display",
+    "generos_texto",
+    "descripcion_corta",
+    "valor",
+    "imagen_url",
+    "relacionados",
+)
+
+
+def fila_vista(producto, nombres_generos):
+    """Columnas de ProductoVista para `producto` (sin la clave)."""
+    nombres_generos = list(nombres_generos)
+    return {
+        "nombre": producto.nombre,
+        "anio_lanzamiento": producto.anio_lanzamiento,
+        "anio": producto.anio_lanzamiento.year,
+        "plataforma": producto.plataforma,
+        "formato": producto.formato,
+        "formato_display": producto.get_formato_display(),
+        "estado": producto.estado,
+        "estado_display": producto.get_estado_display(),
+        "generos": nombres_generos,
+        "generos_texto": ", ".join(nombres_generos),
+        "descripcion": producto.descripcion,
+        # Igual que |default:"Sin descripción."|truncatechars:90
+        "descripcion_corta": Truncator(producto.descripcion or "Sin descripción.").chars(90),
+        "valor": producto.valor,
+        "stock": producto.stock,
+        "imagen_url": producto.imagen.url if producto.imagen else "",
+        "creado_en": producto.creado_en,
+        "actualizado_en": producto.actualizado_en,
+    }
+
+
+def guardar(productos):
+    """Escribe (upsert) la proyección de las instancias dadas."""
+    productos = generos.anotar_generos(productos)
+    ProductoVista.objects.bulk_create(
+        [
+            ProductoVista(producto_id=p.id, **fila_vista(p, p.nombres_generos))
+            for p in productos
+        ],
+        update_conflicts=True,
+        unique_fields=["producto"],
+        update_fields=list(CAMPOS_VISTA),
+    )
+    return len(productos)
+
+
+def refrescar(producto_ids):
+    """
+    Recalcula la proyección de los productos indicados. Los que ya no
+    existen desaparecen solos (on_delete=CASCADE).
+    """
+    ids = iter(list(dict.fromkeys(producto_ids)))
+    while lote := list(islice(ids, REFRESCAR_LOTE)):
+        guardar(Producto.objects.filter(id__in=lote))
+
+
+def reconstruir():
+    """Recalcula la proyección completa. Devuelve cuántas filas escribió."""
+    total = 0
+    productos = Producto.objects.order_by("id").iterator(chunk_size=REFRESCAR_LOTE)
+    while lote := list(islice(productos, REFRESCAR_LOTE)):
+        total += guardar(lote)
+    ProductoVista.objects.exclude(producto__in=Producto.objects.all()).delete()
+    return total
+
+
+def listar(productos, relevancia=None):
+    """
+    Filas del catálogo (diccionarios) para los productos del queryset ya
+    filtrado `productos`, de más nuevo a más antiguo, o en el orden de la
+    lista de ids `relevancia` (búsqueda aproximada).
+    """
+    filas = ProductoVista.objects.filter(producto__in=productos.order_by().values("pk"))
+    if relevancia:
+        orden = Case(
+            *(When(producto_id=pk, then=pos) for pos, pk in enumerate(relevancia)),
+            output_field=IntegerField(),
+        )
+        filas = filas.order_by(orden)
+    else:
+        filas = filas.order_by("-creado_en")
+    return filas.values(*CAMPOS_TARJETA, id=F("producto_id"))
@@ -0,0 +1,18 @@
+# store/checks.py
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def revisar_firebase(app_configs, **kwargs):
+    """Avisa al arrancar si Firebase está activado pero faltan las credenciales."""
+    if settings.FIREBASE_HABILITADO and not settings.FIREBASE_KEY_PATH.exists():
+        return [
+            Warning(
+                f"No se encontró el archivo de credenciales de Firebase: {settings.FIREBASE_KEY_PATH}",
+                hint="La sincronización con Firestore queda desactivada. Para correr sin "
+                "Firebase a propósito usar FIREBASE_HABILITADO=0.",
+                id="store.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,130 @@
+# store/condicional.py
+"""
+Respuestas condicionales (ETag / Last-Modified) y cabeceras de caché para el
+catálogo.
+
+- El validador sale de la última modificación de Producto (Max de
+  actualizado_en, que se resuelve con el índice sin recorrer la tabla) y de
+  la cantidad de productos (suma de ResumenStock.total, mantenido por
+  store.inventario, para notar los borrados), de los géneros
+  (barra lateral), de los filtros normalizados del request, de quién mira
+  (anónimo / usuario / staff) y de CACHE_VERSION (un deploy los invalida).
+- Si el cliente (o el CDN) manda If-None-Match / If-Modified-Since y nada
+  cambió, se responde 304 sin ejecutar la vista.
+- Las páginas de anónimos son públicas por CATALOGO_CACHE_MAX_AGE segundos
+  (Vary: Cookie). Con sesión iniciada la respuesta es privada y siempre se
+  revalida. El contador del carrito y el token CSRF llegan aparte, desde
+  carrito/resumen/, para que la página no dependa del usuario.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.models import Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import generos
+from .models import Producto, ResumenStock
+
+# Parámetros GET que cambian el contenido del catálogo; el resto (utm_*,
+# fbclid, ...) no debe partir la caché.
+PARAMETROS_CATALOGO = ("q", "plataforma", "tipo", "generos", "precio_min", "precio_max", "disponibles")
+
+
+def filtros_normalizados(params):
+    """Filtros del request en forma canónica (sin vacíos, listas ordenadas)."""
+    filtros = []
+    for nombre in PARAMETROS_CATALOGO:
+        valores = sorted({v.strip() for v in params.getlist(nombre) if v.strip()})
+        if valores:
+            filtros.append(f"{nombre}={','.join(valores)}")
+    return "&".join(filtros)
+
+
+def _visitante(user):
+    if not user.is_authenticated:
+        return "anon"
+    return f"u{user.pk}{'s' if user.is_staff else ''}"
+
+
+def validadores_catalogo(request):
+    """Devuelve (etag, last_modified) para la página del catálogo."""
+    # Solo Max: con otro agregado en la misma consulta se recorrería la tabla
+    ultima = Producto.objects.aggregate(ultima=Max("actualizado_en"))["ultima"]
+    total = ResumenStock.objects.aggregate(total=Sum("total"))["total"]
+
+    firma = "|".join(
+        [
+            str(settings.CACHES["default"].get("VERSION", 1)),
+            ultima.isoformat() if ultima else "-",
+            str(total or 0),
+            ",".join(f"{g.id}:{g.nombre}" for g in generos.todos()),
+            filtros_normalizados(request.GET),
+            _visitante(request.user),
+        ]
+    )
+    etag = quote_etag(hashlib.sha1(firma.encode()).hexdigest())
+    return etag, ultima
+
+
+def _no_modificado(request, etag, ultima):
+    """HttpResponseNotModified si el cliente ya tiene esta versión, o None."""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(ultima.timestamp()) if ultima else None,
+    )
+
+
+def _cabeceras(request, response, etag, ultima):
+    if response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault("ETag", etag)
+    if ultima and "Last-Modified" not in response:
+        response["Last-Modified"] = http_date(ultima.timestamp())
+
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.CATALOGO_CACHE_MAX_AGE,
+            s_maxage=settings.CATALOGO_CACHE_S_MAXAGE,
+        )
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+def catalogo_condicional(vista):
+    """
+    Decorador para `home` (sync o async): 304 si el catálogo no cambió y
+    cabeceras de caché en la respuesta.
+    """
+    if iscoroutinefunction(vista):
+
+        @wraps(vista)
+        async def _wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await vista(request, *args, **kwargs)
+            etag, ultima = await sync_to_async(validadores_catalogo)(request)
+            response = _no_modificado(request, etag, ultima)
+            if response is None:
+                response = await vista(request, *args, **kwargs)
+            return _cabeceras(request, response, etag, ultima)
+
+        return _wrapped
+
+    @wraps(vista)
+    def _wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return vista(request, *args, **kwargs)
+        etag, ultima = validadores_catalogo(request)
+        response = _no_modificado(request, etag, ultima)
+        if response is None:
+            response = vista(request, *args, **kwargs)
+        return _cabeceras(request, response, etag, ultima)
+
+    return _wrapped
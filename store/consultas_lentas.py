@@ -0,0 +1,224 @@
+# store/consultas_lentas.py
+"""
+Registro de consultas lentas con su plan (panel/consultas-lentas/).
+
+- Un execute_wrapper en cada conexión mide las consultas; las que tardan
+  CONSULTAS_LENTAS_UMBRAL_MS o más se registran en el log con el SQL, la
+  vista que las hizo (si vienen de un request) y la pila de llamadas del
+  proyecto. Con el umbral en 0 no se mide nada.
+- Se agrupan por huella: el SQL normalizado (literales y parámetros como ?,
+  listas IN colapsadas). ConsultaLenta guarda por huella cuántas veces
+  apareció, el tiempo total y máximo y el último ejemplo (SQL, parámetros,
+  vista, pila).
+- La primera vez que aparece una huella se captura su plan: EXPLAIN QUERY
+  PLAN en SQLite, EXPLAIN ANALYZE en PostgreSQL solo para SELECT simples,
+  porque ANALYZE ejecuta la consulta: un WITH puede llevar un
+  INSERT/UPDATE/DELETE y un SELECT ... FOR UPDATE toma bloqueos. El resto
+  va con EXPLAIN a secas.
+- Todo lo que escribe y el EXPLAIN corren en un hilo aparte con su propia
+  conexión: el request no espera y una transacción que se revierte no se
+  lleva el registro.
+
+Los parámetros de consultas sobre usuarios y sesiones no se guardan.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connections
+from django.db.backends.signals import connection_created
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import instrumentacion
+from .models import ConsultaLenta
+
+logger = logging.getLogger(__name__)
+
+PARAMETROS_MAXIMO = 50
+PILA_MAXIMA = 12
+TABLAS_SENSIBLES = ("auth_user", "django_session")
+SENTENCIAS_EXPLICABLES = ("select", "with", "insert", "update", "delete")
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="consultas-lentas")
+# Marca el hilo del pool: sus propias consultas no se miden
+_local = threading.local()
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTA_IN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_ESPACIOS = re.compile(r"\s+")
+_BLOQUEO = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+
+def huella(sql):
+    """(SQL normalizado, sha1 del normalizado)."""
+    normalizado = sql.replace("%s", "?")
+    normalizado = _LITERAL.sub("?", normalizado)
+    normalizado = _NUMERO.sub("?", normalizado)
+    normalizado = _LISTA_IN.sub("IN (...)", normalizado)
+    normalizado = _ESPACIOS.sub(" ", normalizado).strip()
+    return normalizado, hashlib.sha1(normalizado.encode()).hexdigest()
+
+
+# Los execute_wrappers no aportan nada a la pila
+_PROPIOS = {__file__, instrumentacion.__file__}
+
+
+def _pila():
+    """Frames del proyecto (sin Django ni dependencias), del más externo al más interno."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        f
+        for f in traceback.extract_stack()
+        if f.filename.startswith(base)
+        and "site-packages" not in f.filename
+        and f.filename not in _PROPIOS
+    ]
+    return "".join(traceback.format_list(frames[-PILA_MAXIMA:]))
+
+
+def _parametros(params):
+    """Parámetros para mostrar: repr acotado de los primeros PARAMETROS_MAXIMO."""
+    if isinstance(params, dict):
+        return {k: repr(v)[:200] for k, v in list(params.items())[:PARAMETROS_MAXIMO]}
+    return [repr(p)[:200] for p in list(params or ())[:PARAMETROS_MAXIMO]]
+
+
+def _vista():
+    medicion = instrumentacion.medicion_actual()
+    match = getattr(medicion.request, "resolver_match", None) if medicion else None
+    if match is None:
+        return ""
+    return match.url_name or match.view_name
+
+
+# ---------------------------------------------------------------------------
+#  Medición (en el hilo que hace la consulta)
+# ---------------------------------------------------------------------------
+def _medir(execute, sql, params, many, context):
+    umbral = settings.CONSULTAS_LENTAS_UMBRAL_MS
+    if not umbral or getattr(_local, "interno", False):
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    resultado = execute(sql, params, many, context)
+    ms = (time.perf_counter() - inicio) * 1000
+    if ms >= umbral:
+        _registrar(context["connection"].alias, sql, params, many, ms)
+    return resultado
+
+
+def _registrar(alias, sql, params, many, ms):
+    vista = _vista()
+    logger.warning("Consulta lenta (%.1f ms, %s): %s", ms, vista or "fuera de un request", sql)
+    _pool.submit(
+        _guardar,
+        {
+            "alias": alias,
+            "sql": sql,
+            # executemany: se guarda el primer juego de parámetros
+            "params": (params[0] if params else None) if many else params,
+            "explicable": not many,
+            "ms": ms,
+            "vista": vista,
+            "pila": _pila(),
+        },
+    )
+
+
+def _instalar(sender, connection, **kwargs):
+    if _medir not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir)
+
+
+connection_created.connect(_instalar)
+for _conexion in connections.all(initialized_only=True):
+    _instalar(None, _conexion)
+
+
+# ---------------------------------------------------------------------------
+#  Plan y guardado (en el hilo del pool)
+# ---------------------------------------------------------------------------
+def _plan(alias, sql, params):
+    conexion = connections[alias]
+    sentencia = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ""
+    if sentencia not in SENTENCIAS_EXPLICABLES:
+        return ""
+
+    if conexion.vendor == "sqlite":
+        with conexion.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            filas = cursor.fetchall()
+        # (id, padre, _, detalle): se indenta según la profundidad
+        profundidad = {0: -1}
+        lineas = []
+        for id_, padre, _, detalle in filas:
+            profundidad[id_] = profundidad.get(padre, -1) + 1
+            lineas.append("  " * profundidad[id_] + detalle)
+        return "\n".join(lineas)
+
+    if conexion.vendor == "postgresql":
+        analizar = sentencia == "select" and not _BLOQUEO.search(sql)
+        prefijo = "EXPLAIN (ANALYZE, BUFFERS) " if analizar else "EXPLAIN "
+        with conexion.cursor() as cursor:
+            cursor.execute(prefijo + sql, params)
+            return "\n".join(fila[0] for fila in cursor.fetchall())
+    return ""
+
+
+def _sumar(clave, ms, ultimo):
+    return ConsultaLenta.objects.filter(huella=clave).update(
+        veces=F("veces") + 1,
+        total_ms=F("total_ms") + ms,
+        max_ms=Greatest("max_ms", Value(ms)),
+        **ultimo,
+    )
+
+
+def _guardar(evento):
+    _local.interno = True
+    normalizado, clave = huella(evento["sql"])
+    sensible = any(tabla in evento["sql"] for tabla in TABLAS_SENSIBLES)
+    ahora = timezone.now()
+    ultimo = {
+        "sql_ejemplo": evento["sql"],
+        "parametros": "oculto" if sensible else _parametros(evento["params"]),
+        "vista": evento["vista"],
+        "pila": evento["pila"],
+        "ultima_vez": ahora,
+    }
+    try:
+        if _sumar(clave, evento["ms"], ultimo):
+            return
+
+        plan = ""
+        if evento["explicable"]:
+            try:
+                plan = _plan(evento["alias"], evento["sql"], evento["params"])
+            except Exception as e:
+                plan = f"No se pudo obtener el plan: {e}"
+        try:
+            ConsultaLenta.objects.create(
+                huella=clave,
+                sql=normalizado,
+                alias=evento["alias"],
+                plan=plan,
+                veces=1,
+                total_ms=evento["ms"],
+                max_ms=evento["ms"],
+                primera_vez=ahora,
+                **ultimo,
+            )
+        except IntegrityError:
+            # Otro proceso la creó entre medio
+            _sumar(clave, evento["ms"], ultimo)
+    except Exception:
+        logger.exception("No se pudo registrar la consulta lenta")
+    finally:
+        connections.close_all()
@@ -5,8 +5,11 @@ def cart(request):
     """
     Hace disponible en todas las plantillas:
     - cart_total_items: número total de unidades en el carrito
+
+    Es un callable: la sesión solo se lee si la plantilla lo usa. El catálogo
+    no lo usa (pide el contador a carrito/resumen/), así su HTML no depende
+    de la sesión y se puede cachear.
     """
-    cart = Cart(request)
     return {
-        "cart_total_items": cart.total_quantity,
-    }
\ No newline at end of file
+        "cart_total_items": lambda: Cart.cantidad_en_sesion(request.session),
+    }
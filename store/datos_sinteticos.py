@@ -0,0 +1,102 @@
+# store/datos_sinteticos.py
+"""
+Catálogo sintético para benchmarks y pruebas de carga.
+
+`generar` crea los géneros y productos con bulk_create (sin señales) y
+combina plataforma, formato y estado de forma pareja. Con la misma semilla
+el catálogo sale igual, así los resultados se pueden comparar de una corrida
+a otra. Como bulk_create no dispara señales, `preparar` recalcula después lo
+derivado: proyección del catálogo, resumen de stock, relacionados e índices
+de búsqueda.
+"""
+import datetime
+import itertools
+import random
+from decimal import Decimal
+
+from . import busqueda, catalogo, generos, inventario, recomendaciones
+from .models import (
+    ESTADO_CHOICES,
+    FORMATO_CHOICES,
+    PLATAFORMA_CHOICES,
+    Genero,
+    Producto,
+)
+
+GENEROS_BASE = (
+    "Acción", "Aventura", "Carreras", "Deportes", "Estrategia", "Lucha",
+    "Plataformas", "Puzzle", "Rol", "Shooter", "Simulación", "Terror",
+)
+PALABRAS = (
+    "Leyenda", "Sombra", "Reino", "Guerra", "Dragón", "Ciudad", "Galaxia",
+    "Tormenta", "Caballero", "Furia", "Horizonte", "Eco", "Fortaleza", "Último",
+    "Rebelión", "Destino", "Fantasma", "Crónicas", "Velocidad", "Isla",
+)
+
+
+def generar(productos, cantidad_generos, semilla=0):
+    """
+    Crea `cantidad_generos` géneros y `productos` productos con 1 a 3
+    géneros cada uno. Devuelve la lista de productos creados.
+    """
+    azar = random.Random(semilla)
+
+    nombres_generos = [
+        GENEROS_BASE[j] if j < len(GENEROS_BASE) else f"{GENEROS_BASE[j % len(GENEROS_BASE)]} {j}"
+        for j in range(cantidad_generos)
+    ]
+    Genero.objects.bulk_create(
+        [Genero(nombre=nombre) for nombre in nombres_generos], ignore_conflicts=True
+    )
+    genero_ids = list(
+        Genero.objects.filter(nombre__in=nombres_generos).values_list("id", flat=True)
+    )
+
+    combinaciones = list(
+        itertools.product(
+            [c for c, _ in PLATAFORMA_CHOICES],
+            [c for c, _ in FORMATO_CHOICES],
+            [c for c, _ in ESTADO_CHOICES],
+        )
+    )
+    nuevos = []
+    for i in range(productos):
+        plataforma, formato, estado = combinaciones[i % len(combinaciones)]
+        titulo = " ".join(azar.sample(PALABRAS, 2))
+        nuevos.append(
+            Producto(
+                # El número evita chocar con la restricción única
+                nombre=f"{titulo} {i}",
+                nombre_minusculas=f"{titulo} {i}".lower(),
+                anio_lanzamiento=datetime.date(azar.randint(2006, 2025), 1, 1),
+                plataforma=plataforma,
+                formato=formato,
+                estado=estado,
+                descripcion=f"{titulo}: {' '.join(azar.sample(PALABRAS, 6)).lower()}.",
+                valor=Decimal(azar.randrange(1000, 100000, 10)),
+                # ~10 % sin stock y ~10 % bajo stock, como en la tienda real
+                stock=azar.choice((0, 1, 2) + (5, 10, 20, 50, 100) * 2),
+            )
+        )
+    nuevos = Producto.objects.bulk_create(nuevos, batch_size=1000)
+
+    if genero_ids:
+        through = Producto.generos.through
+        through.objects.bulk_create(
+            [
+                through(producto_id=p.id, genero_id=genero_id)
+                for p in nuevos
+                for genero_id in azar.sample(genero_ids, min(len(genero_ids), azar.randint(1, 3)))
+            ],
+            batch_size=2000,
+        )
+    return nuevos
+
+
+def preparar():
+    """Recalcula todo lo derivado del catálogo (después de `generar`)."""
+    generos.invalidar()
+    catalogo.reconstruir()
+    inventario.reconstruir()
+    recomendaciones.reconstruir()
+    busqueda.construir()
@@ -0,0 +1,126 @@
+# store/db_routers.py
+"""
+Enrutamiento de lecturas del catálogo hacia réplicas.
+
+- Solo las lecturas de modelos del catálogo (productos, géneros, resumen de
+  stock) hechas dentro de un request van a una réplica (DB_REPLICAS).
+- Todas las escrituras van a la primaria ("default"). Apenas un request
+  escribe algo, el resto de ese request lee también de la primaria.
+- Un request con método no seguro (POST, ...) lee de la primaria desde el
+  inicio. Si el request escribió, deja una cookie corta para que el redirect
+  siguiente (p. ej. cart_add -> cart_detail) vea sus propios cambios aunque
+  la réplica atrase.
+- Fuera de un request (comandos, shell, migraciones) todo va a la primaria.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+COOKIE_PRIMARIA = "db_primaria"
+
+# Estado del request actual: {"primaria": bool, "escribio": bool}, o None
+# fuera de un request. Es un dict mutable para que lo que se marque dentro de sync_to_async
+# (otro hilo, contexto copiado) sea visible para el resto del request.
+_estado = ContextVar("db_replica_estado", default=None)
+
+MODELOS_CATALOGO = {
+    "store.producto",
+    "store.genero",
+    "store.producto_generos",
+    "store.resumenstock",
+    "store.productovista",
+}
+
+
+def _marcar_escritura():
+    """El resto del request (y el siguiente, vía cookie) lee de la primaria."""
+    estado = _estado.get()
+    if estado is not None:
+        estado["primaria"] = estado["escribio"] = True
+
+
+def _usa_replica(model):
+    estado = _estado.get()
+    if estado is None or estado["primaria"]:
+        return False
+    if model._meta.label_lower not in MODELOS_CATALOGO:
+        return False
+    # Lecturas dentro de una transacción (p. ej. select_for_update en
+    # ajustar_stock) tienen que ver lo que la transacción ya escribió.
+    return not connections["default"].in_atomic_block
+
+
+class CatalogoRouter:
+    def __init__(self):
+        self.replicas = [a for a in settings.DATABASES if a.startswith("replica_")]
+
+    def db_for_read(self, model, **hints):
+        if self.replicas and _usa_replica(model):
+            return random.choice(self.replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        _marcar_escritura()
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases son copias de la misma: las relaciones son válidas
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas se migran por replicación, no con migrate
+        return db == "default"
+
+
+class ReplicaMiddleware:
+    """Abre el estado de enrutamiento por request (sync y async)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _inicio(self, request):
+        primaria = (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            or COOKIE_PRIMARIA in request.COOKIES
+        )
+        return {"primaria": primaria, "escribio": False}
+
+    def _fin(self, request, response, estado):
+        if estado["escribio"]:
+            response.set_cookie(
+                COOKIE_PRIMARIA,
+                str(int(time.time())),
+                max_age=settings.DB_REPLICA_FIJAR_SEGUNDOS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado = self._inicio(request)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fin(request, response, estado)
+
+    async def __acall__(self, request):
+        estado = self._inicio(request)
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._fin(request, response, estado)
@@ -0,0 +1,134 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.files.storage import default_storage
+
+from .models import Producto
+from . import generos
+
+# Cantidad de filas que se traen de la BD por vuelta. También es el tamaño
+# de lote para resolver los géneros (una consulta por lote, no por producto).
+CHUNK_SIZE = 2000
+
+COLUMNAS = [
+    "id",
+    "nombre",
+    "anio_lanzamiento",
+    "plataforma",
+    "formato",
+    "estado",
+    "generos",
+    "descripcion",
+    "valor",
+    "stock",
+    "imagen_url",
+    "creado_en",
+    "actualizado_en",
+]
+
+FORMATOS_EXPORTACION = ("csv", "jsonl")
+
+
+class Echo:
+    """
+    "Archivo" que devuelve lo que se le escribe, para que csv.writer
+    genere líneas sin acumularlas en memoria.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _lotes(iterable, size):
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, size))
+        if not lote:
+            return
+        yield lote
+
+
+def iterar_productos(productos=None, chunk_size=CHUNK_SIZE):
+    """
+    Recorre los productos como diccionarios planos (una fila por producto),
+    leyendo la BD por bloques con .iterator() para que la memoria usada
+    no dependa del tamaño del catálogo.
+
+    Los géneros se resuelven por lote: una consulta a la tabla intermedia
+    por cada `chunk_size` productos.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+
+    filas = (
+        productos.order_by("id")
+        .values(
+            "id",
+            "nombre",
+            "anio_lanzamiento",
+            "plataforma",
+            "formato",
+            "estado",
+            "descripcion",
+            "valor",
+            "stock",
+            "imagen",
+            "creado_en",
+            "actualizado_en",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for lote in _lotes(filas, chunk_size):
+        generos_por_producto = generos.ids_por_producto(fila["id"] for fila in lote)
+
+        for fila in lote:
+            imagen = fila.pop("imagen")
+            fila["imagen_url"] = default_storage.url(imagen) if imagen else None
+            fila["generos"] = generos.nombres_de(generos_por_producto.get(fila["id"], ()))
+            yield fila
+
+
+def _serializar(fila):
+    return {
+        "id": fila["id"],
+        "nombre": fila["nombre"],
+        "anio_lanzamiento": fila["anio_lanzamiento"].isoformat()
+        if fila["anio_lanzamiento"]
+        else None,
+        "plataforma": fila["plataforma"],
+        "formato": fila["formato"],
+        "estado": fila["estado"],
+        "generos": fila["generos"],
+        "descripcion": fila["descripcion"],
+        "valor": str(fila["valor"]),
+        "stock": fila["stock"],
+        "imagen_url": fila["imagen_url"],
+        "creado_en": fila["creado_en"].isoformat() if fila["creado_en"] else None,
+        "actualizado_en": fila["actualizado_en"].isoformat()
+        if fila["actualizado_en"]
+        else None,
+    }
+
+
+def lineas_csv(productos=None):
+    """Genera el export como líneas CSV (con encabezado)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNAS)
+    for fila in iterar_productos(productos):
+        data = _serializar(fila)
+        data["generos"] = "|".join(data["generos"])
+        yield writer.writerow([data[col] for col in COLUMNAS])
+
+
+def lineas_jsonl(productos=None):
+    """Genera el export como JSON Lines (un objeto por producto)."""
+    for fila in iterar_productos(productos):
+        yield json.dumps(_serializar(fila), ensure_ascii=False) + "\n"
+
+
+def exportar(formato, productos=None):
+    if formato == "jsonl":
+        return lineas_jsonl(productos)
+    return lineas_csv(productos)
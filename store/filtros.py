@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.db.models import Q
+
+from . import busqueda
+from .inventario import ocultar_agotados
+from .models import PLATAFORMA_CHOICES, FORMATO_CHOICES
+
+
+def parse_price(value: str):
+    """
+    Convierte string a entero >= 0.
+    Devuelve None si no es válido.
+    """
+    try:
+        v = int(value)
+        return v if v >= 0 else 0
+    except (TypeError, ValueError):
+        return None
+
+
+def filtrar_catalogo(productos, params):
+    """
+    Aplica sobre `productos` los filtros del catálogo leídos de `params`
+    (normalmente request.GET) y devuelve (queryset, filters).
+
+    Filtros soportados (los mismos que usa `home`):
+    - q: búsqueda por nombre / descripción. Si no hay coincidencias exactas
+      se usa la búsqueda aproximada de store.busqueda (errores de tipeo,
+      iniciales); entonces filters["relevancia"] trae los ids ordenados del
+      más al menos parecido y filters["aproximada"] es True.
+    - plataforma: código de plataforma.
+    - tipo: código de formato.
+    - generos: uno o varios IDs de género.
+    - precio_min / precio_max: rango de precio en CLP.
+    - disponibles: "1" para ocultar productos sin stock.
+
+    `filters` es el diccionario "limpio" que usan los templates para
+    mantener el estado del formulario.
+    """
+
+    # -------------------- Leer parámetros GET --------------------
+    q = params.get("q", "").strip()
+    plataforma = params.get("plataforma", "").strip()
+    tipo = params.get("tipo", "").strip()
+    genero_ids_raw = params.getlist("generos")
+    precio_min_raw = params.get("precio_min", "").strip()
+    precio_max_raw = params.get("precio_max", "").strip()
+    disponibles = params.get("disponibles", "") == "1"
+
+    # -------------------- Búsqueda (texto libre) --------------------
+    relevancia = None
+    if q:
+        exactos = productos.filter(
+            Q(nombre__icontains=q) | Q(descripcion__icontains=q)
+        )
+        if exactos.exists():
+            productos = exactos
+        else:
+            relevancia = busqueda.indice_aproximado.buscar(q)
+            productos = productos.filter(id__in=relevancia)
+
+    # -------------------- Filtro: plataforma --------------------
+    valid_plataformas = {code for code, _ in PLATAFORMA_CHOICES}
+    if plataforma and plataforma in valid_plataformas:
+        productos = productos.filter(plataforma=plataforma)
+    else:
+        plataforma = ""  # valor limpio para el template
+
+    # -------------------- Filtro: tipo / formato --------------------
+    valid_tipos = {code for code, _ in FORMATO_CHOICES}
+    if tipo and tipo in valid_tipos:
+        productos = productos.filter(formato=tipo)
+    else:
+        tipo = ""
+
+    # -------------------- Filtro: géneros (múltiples) --------------------
+    selected_generos = []
+    if genero_ids_raw:
+        genero_ids = [int(g) for g in genero_ids_raw if g.isdigit()]
+        if genero_ids:
+            productos = productos.filter(generos__id__in=genero_ids).distinct()
+            selected_generos = genero_ids
+
+    # -------------------- Filtro: rango de precio --------------------
+    precio_min = parse_price(precio_min_raw) if precio_min_raw else None
+    precio_max = parse_price(precio_max_raw) if precio_max_raw else None
+
+    # Si el usuario pone min > max, los invertimos para que tenga sentido.
+    if precio_min is not None and precio_max is not None and precio_min > precio_max:
+        precio_min, precio_max = precio_max, precio_min
+
+    if precio_min is not None:
+        productos = productos.filter(valor__gte=precio_min)
+    if precio_max is not None:
+        productos = productos.filter(valor__lte=precio_max)
+
+    # -------------------- Filtro: ocultar agotados --------------------
+    if disponibles:
+        productos = ocultar_agotados(productos)
+
+    filters = {
+        "q": q,
+        "plataforma": plataforma,
+        "tipo": tipo,
+        "generos": selected_generos,
+        "precio_min": precio_min_raw,
+        "precio_max": precio_max_raw,
+        "disponibles": disponibles,
+        "aproximada": relevancia is not None,
+        "relevancia": relevancia,
+    }
+    return productos, filters
+
+
+# ---------------------------------------------------------------------------
+#  Panel de stock (búsqueda / orden / bajo stock)
+# ---------------------------------------------------------------------------
+# Columnas por las que se puede ordenar el panel. Todas tienen índice
+# compuesto (columna, id) en Producto, así que ordenar + paginar no recorre
+# la tabla completa.
+ORDENES_PANEL = ("id", "nombre", "stock", "valor", "plataforma")
+
+
+def filtrar_panel(productos, params):
+    """
+    Filtros del módulo de stock. Devuelve (queryset, filters).
+
+    - q: ID exacto (si es numérico) o comienzo del nombre. Se usa prefijo y no
+      "contiene", expresado como rango sobre nombre_minusculas (pasado a
+      minúsculas en Python, igual que `q`), para que la búsqueda use el
+      índice producto_nombre_min_idx.
+    - orden: una de ORDENES_PANEL, con "-" delante para descendente.
+    - bajo_stock: "1" para ver solo productos con stock <= STOCK_BAJO_UMBRAL.
+    """
+    q = params.get("q", "").strip()
+    orden = params.get("orden", "id").strip()
+    bajo_stock = params.get("bajo_stock", "") == "1"
+
+    if q:
+        prefijo = q.lower()
+        condicion = Q(nombre_minusculas__gte=prefijo, nombre_minusculas__lt=prefijo + "\U0010ffff")
+        if q.isdigit():
+            condicion |= Q(id=int(q))
+        productos = productos.filter(condicion)
+
+    if bajo_stock:
+        productos = productos.filter(stock__lte=settings.STOCK_BAJO_UMBRAL)
+
+    if orden.lstrip("-") not in ORDENES_PANEL:
+        orden = "id"
+    if orden.lstrip("-") == "id":
+        productos = productos.order_by(orden)
+    else:
+        # desempate por id para que la paginación sea estable
+        desempate = "-id" if orden.startswith("-") else "id"
+        productos = productos.order_by(orden, desempate)
+
+    filters = {
+        "q": q,
+        "orden": orden,
+        "bajo_stock": bajo_stock,
+        "umbral": settings.STOCK_BAJO_UMBRAL,
+    }
+    return productos, filters
@@ -1,10 +1,47 @@
 import datetime
 from decimal import Decimal
 from django import forms
-from .models import Producto, Genero
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from .models import Genero, Producto
+from .generos import choices as choices_generos, invalidar as invalidar_generos, nombres as nombres_generos
+from .autenticacion import normalizar_correo, usuarios_con_correo
+from django.contrib.auth.forms import (
+    AdminUserCreationForm,
+    AuthenticationForm,
+    UserChangeForm,
+    UserCreationForm,
+)
 from django.contrib.auth.models import User
 
+class GenerosField(forms.TypedMultipleChoiceField):
+    """
+    Las opciones que se dibujan salen de la caché de géneros (sin consultar
+    Genero por formulario). Lo enviado se valida contra la BD con una sola
+    consulta: un género creado o borrado en otro proceso se acepta / rechaza
+    aunque la caché de este proceso todavía no se haya enterado.
+    """
+
+    def valid_value(self, value):
+        # La validación real es contra la BD, en clean()
+        return True
+
+    def clean(self, value):
+        ids = super().clean(value)
+        if not ids:
+            return ids
+        existentes = set(Genero.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        for genero_id in ids:
+            if genero_id not in existentes:
+                raise forms.ValidationError(
+                    self.error_messages["invalid_choice"],
+                    code="invalid_choice",
+                    params={"value": genero_id},
+                )
+        if not existentes <= nombres_generos().keys():
+            # Género nuevo de otro proceso: se recarga la caché de este
+            invalidar_generos()
+        return ids
+
+
 class ProductoForm(forms.ModelForm):
     anio_lanzamiento = forms.DateField(
         label="Año de lanzamiento",
@@ -16,8 +53,9 @@ class ProductoForm(forms.ModelForm):
         ),
     )
 
-    generos = forms.ModelMultipleChoiceField(
-        queryset=Genero.objects.all(),
+    generos = GenerosField(
+        choices=choices_generos,
+        coerce=int,
         required=False,  # permitimos sin género, pero podrías poner True
         widget=forms.CheckboxSelectMultiple,
         label="Géneros",
@@ -57,6 +95,14 @@ class ProductoForm(forms.ModelForm):
             "imagen": forms.ClearableFileInput(attrs={"class": "form-control"}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Al editar, model_to_dict entrega instancias de Genero; el campo
+        # trabaja con ids.
+        iniciales = self.initial.get("generos")
+        if iniciales:
+            self.initial["generos"] = [getattr(g, "pk", g) for g in iniciales]
+
     # ---------- Validaciones de formulario ----------
 
     def clean_nombre(self):
@@ -159,12 +205,35 @@ class UserRegisterForm(UserCreationForm):
                 field.widget.attrs["class"] = "form-control"
 
     def clean_email(self):
-        email = self.cleaned_data["email"].lower()
-        if User.objects.filter(email=email).exists():
+        email = normalizar_correo(self.cleaned_data["email"])
+        if usuarios_con_correo(email).exists():
+            raise forms.ValidationError("Ya existe un usuario registrado con este correo.")
+        return email
+
+
+class CorreoUnicoMixin:
+    """
+    Correo único sin distinguir mayúsculas en los formularios de usuario del
+    admin. Sin esto un correo repetido llega al índice
+    auth_user_email_lower_uniq y termina en IntegrityError (500).
+    """
+
+    def clean_email(self):
+        email = normalizar_correo(self.cleaned_data.get("email"))
+        if email and usuarios_con_correo(email).exclude(pk=self.instance.pk).exists():
             raise forms.ValidationError("Ya existe un usuario registrado con este correo.")
         return email
 
 
+class AdminCrearUsuarioForm(CorreoUnicoMixin, AdminUserCreationForm):
+    class Meta(AdminUserCreationForm.Meta):
+        fields = ("username", "email")
+
+
+class AdminUsuarioForm(CorreoUnicoMixin, UserChangeForm):
+    pass
+
+
 class UserLoginForm(AuthenticationForm):
     """
     Formulario de login con estilos Bootstrap.
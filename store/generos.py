@@ -0,0 +1,93 @@
+# store/generos.py
+"""
+Caché en memoria (por proceso) de la lista de géneros.
+
+Los géneros casi no cambian, pero el catálogo, el formulario de productos,
+la sincronización con Firestore y el filtro del admin los necesitan en cada
+request. Se cargan una vez con una sola consulta y se invalidan con las
+señales post_save/post_delete de Genero (ver store/signals.py).
+
+Las señales solo llegan al proceso que hizo el cambio: los demás procesos
+recargan como tarde a los GENEROS_CACHE_TTL segundos. Por eso la caché solo
+decide qué se muestra; ProductoForm valida los géneros enviados contra la BD
+(store.forms.GenerosField).
+"""
+import threading
+import time
+
+from .models import Genero, Producto
+
+GENEROS_CACHE_TTL = 300
+
+_lock = threading.Lock()
+_cache = None  # (expira_en, géneros ordenados por nombre, {id: nombre})
+
+
+def _estado():
+    global _cache
+    estado = _cache
+    if estado is None or estado[0] < time.monotonic():
+        with _lock:
+            estado = _cache
+            if estado is None or estado[0] < time.monotonic():
+                generos = tuple(Genero.objects.order_by("nombre"))
+                estado = (
+                    time.monotonic() + GENEROS_CACHE_TTL,
+                    generos,
+                    {g.id: g.nombre for g in generos},
+                )
+                _cache = estado
+    return estado
+
+
+def invalidar():
+    global _cache
+    _cache = None
+
+
+def todos():
+    """Géneros ordenados por nombre (instancias compartidas: solo lectura)."""
+    return _estado()[1]
+
+
+def nombres():
+    """Diccionario id -> nombre."""
+    return _estado()[2]
+
+
+def choices():
+    """Pares (id, nombre) para campos de formulario y filtros."""
+    return [(g.id, g.nombre) for g in todos()]
+
+
+def ids_por_producto(producto_ids):
+    """
+    {producto_id: [genero_id, ...]} con una sola consulta a la tabla
+    intermedia (sin JOIN a Genero: los nombres salen de la caché).
+    """
+    relaciones = Producto.generos.through.objects.filter(
+        producto_id__in=list(producto_ids)
+    ).values_list("producto_id", "genero_id")
+
+    resultado = {}
+    for producto_id, genero_id in relaciones:
+        resultado.setdefault(producto_id, []).append(genero_id)
+    return resultado
+
+
+def nombres_de(genero_ids):
+    """Nombres ordenados alfabéticamente de los géneros indicados."""
+    mapa = nombres()
+    return sorted(mapa[g] for g in genero_ids if g in mapa)
+
+
+def anotar_generos(productos):
+    """
+    Materializa `productos` y agrega a cada uno `nombres_generos` (lista de
+    nombres) para las plantillas y producto_to_doc.
+    """
+    productos = list(productos)
+    por_producto = ids_por_producto(p.id for p in productos)
+    for producto in productos:
+        producto.nombres_generos = nombres_de(por_producto.get(producto.id, ()))
+    return productos
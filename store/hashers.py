@@ -0,0 +1,50 @@
+# store/hashers.py
+"""
+Hashers de contraseñas con costo configurable (ver PASSWORD_HASHERS en
+settings).
+
+- PASSWORD_HASHER elige el algoritmo con el que se guardan las contraseñas
+  nuevas: "pbkdf2" (por defecto), "scrypt" o "argon2" (requiere
+  argon2-cffi). Los demás quedan en la lista solo para verificar.
+- Los parámetros de costo salen de settings (PBKDF2_ITERATIONS, SCRYPT_*,
+  ARGON2_*). Sin PBKDF2_ITERATIONS, PBKDF2 usa las iteraciones de Django.
+- Si un hash guardado usa otro algoritmo u otros parámetros, Django lo
+  vuelve a generar con el preferido la próxima vez que el usuario entra
+  (check_password + must_update), sin pedir nada al usuario.
+
+`python manage.py bench_hashers` mide logins/s por núcleo de cada opción.
+
+Las vistas async verifican contraseñas en `pool` (un hilo por núcleo) y no
+en el hilo único de sync_to_async: hashlib suelta el GIL, así que varios
+logins se calculan en paralelo sin frenar al resto de los requests.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="hash")
+
+
+class PBKDF2Hasher(PBKDF2PasswordHasher):
+    iterations = settings.PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class ScryptHasher(ScryptPasswordHasher):
+    work_factor = settings.SCRYPT_WORK_FACTOR
+    block_size = settings.SCRYPT_BLOCK_SIZE
+    parallelism = settings.SCRYPT_PARALLELISM
+    # El límite por defecto de OpenSSL (32 MiB) no alcanza desde N=2**15
+    maxmem = 256 * block_size * work_factor
+
+
+class Argon2Hasher(Argon2PasswordHasher):
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
@@ -0,0 +1,193 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import (
+    DateTimeField,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MovimientoStock, Producto, SnapshotStock
+
+# Fecha "desde siempre" para productos que aún no tienen snapshot
+_INICIO = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def stock_en(producto_id, fecha):
+    """
+    Stock de un producto en `fecha`: último snapshot anterior (o 0 si no hay)
+    más la suma de los movimientos entre ese snapshot y `fecha`.
+    Ambas consultas usan los índices (producto, fecha).
+    """
+    snapshot = (
+        SnapshotStock.objects.filter(producto_id=producto_id, tomado_en__lte=fecha)
+        .order_by("-tomado_en")
+        .values("stock", "tomado_en")
+        .first()
+    )
+
+    movimientos = MovimientoStock.objects.filter(producto_id=producto_id, creado_en__lte=fecha)
+    base = 0
+    if snapshot:
+        base = snapshot["stock"]
+        movimientos = movimientos.filter(creado_en__gt=snapshot["tomado_en"])
+
+    return base + (movimientos.aggregate(total=Sum("delta"))["total"] or 0)
+
+
+def anotar_stock_en(productos, fecha, campo="pk"):
+    """
+    Anota `stock_en_fecha` en cada fila del queryset; `campo` es la columna
+    con el id del producto ("pk" para Producto, "producto_id" para las BAJA
+    de productos ya borrados).
+
+    Por producto: último snapshot <= fecha (subconsulta con índice) + suma de
+    los movimientos posteriores a ese snapshot. Nunca se suma el libro
+    completo, solo la "cola" desde el último snapshot.
+    """
+    ultimo_snapshot = SnapshotStock.objects.filter(
+        producto_id=OuterRef(campo), tomado_en__lte=fecha
+    ).order_by("-tomado_en")
+
+    productos = productos.annotate(
+        snapshot_stock=Coalesce(
+            Subquery(ultimo_snapshot.values("stock")[:1]),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+        snapshot_desde=Coalesce(
+            Subquery(ultimo_snapshot.values("tomado_en")[:1]),
+            Value(_INICIO),
+            output_field=DateTimeField(),
+        ),
+    )
+
+    deltas = (
+        MovimientoStock.objects.filter(
+            producto_id=OuterRef(campo),
+            creado_en__gt=OuterRef("snapshot_desde"),
+            creado_en__lte=fecha,
+        )
+        .order_by()
+        .values("producto")
+        .annotate(total=Sum("delta"))
+        .values("total")
+    )
+
+    return productos.annotate(
+        stock_en_fecha=F("snapshot_stock")
+        + Coalesce(Subquery(deltas), Value(0), output_field=IntegerField())
+    )
+
+
+def tomar_snapshots(ahora=None):
+    """
+    Guarda un snapshot del stock actual de los productos que tuvieron
+    movimientos desde el último snapshot (o que nunca tuvieron uno).
+    Devuelve la cantidad de snapshots creados.
+    """
+    ahora = ahora or timezone.now()
+
+    with transaction.atomic():
+        ultimo = SnapshotStock.objects.order_by("-tomado_en").values_list("tomado_en", flat=True).first()
+
+        productos = Producto.objects.all()
+        if ultimo is not None:
+            productos = productos.filter(
+                Q(movimientos__creado_en__gt=ultimo) | Q(snapshots__isnull=True)
+            ).distinct()
+
+        creados = 0
+        lote = []
+        for producto_id, stock in productos.values_list("id", "stock").iterator(chunk_size=2000):
+            lote.append(SnapshotStock(producto_id=producto_id, stock=stock, tomado_en=ahora))
+            if len(lote) >= 2000:
+                SnapshotStock.objects.bulk_create(lote)
+                creados += len(lote)
+                lote = []
+        if lote:
+            SnapshotStock.objects.bulk_create(lote)
+            creados += len(lote)
+
+    return creados
+
+
+def reporte_sell_through(desde, hasta):
+    """
+    Sell-through por plataforma entre `desde` y `hasta`. Son cinco consultas
+    agrupadas por plataforma (movimientos del período y, para el stock
+    inicial y el final, productos vigentes y productos borrados después de
+    esa fecha), sin importar la cantidad de productos.
+
+    Todo se agrupa por la plataforma actual del producto o, si ya se borró,
+    por la copiada en el libro. Para cada plataforma devuelve:
+    - stock_inicial: stock total en `desde` (snapshot + movimientos).
+    - entradas / salidas: suma de deltas positivos / negativos del período,
+      sin contar las BAJA.
+    - vendidas: unidades con motivo VENTA.
+    - bajas: stock que salió al borrar productos en el período.
+    - stock_final: stock total en `hasta`
+      (= stock_inicial + entradas - salidas - bajas).
+    - sell_through: salidas / (stock_inicial + entradas), en %.
+    """
+    movimientos = (
+        MovimientoStock.objects.filter(creado_en__gt=desde, creado_en__lte=hasta)
+        # Plataforma actual del producto; la copiada si ya se borró
+        .values(plataforma_actual=Coalesce(F("producto__plataforma"), F("plataforma")))
+        .annotate(
+            entradas=Coalesce(Sum("delta", filter=Q(delta__gt=0)), 0),
+            salidas=Coalesce(-Sum("delta", filter=Q(delta__lt=0) & ~Q(motivo="BAJA")), 0),
+            vendidas=Coalesce(-Sum("delta", filter=Q(motivo="VENTA")), 0),
+            bajas=Coalesce(-Sum("delta", filter=Q(motivo="BAJA")), 0),
+        )
+        .order_by()
+    )
+    por_plataforma = {fila["plataforma_actual"]: fila for fila in movimientos}
+
+    def stock_total(fecha):
+        totales = {}
+        vigentes = anotar_stock_en(Producto.objects.filter(creado_en__lte=fecha), fecha)
+        # Un producto borrado después de `fecha` todavía tenía stock en esa
+        # fecha; su BAJA (una por producto) da el id y la última plataforma.
+        # Los borrados antes ya suman 0 gracias a la misma BAJA.
+        borrados = anotar_stock_en(
+            MovimientoStock.objects.filter(motivo="BAJA", creado_en__gt=fecha),
+            fecha,
+            campo="producto_id",
+        )
+        for filas in (vigentes, borrados):
+            filas = filas.values("plataforma").annotate(total=Sum("stock_en_fecha")).order_by()
+            for fila in filas:
+                totales[fila["plataforma"]] = totales.get(fila["plataforma"], 0) + (fila["total"] or 0)
+        return totales
+
+    iniciales = stock_total(desde)
+    finales = stock_total(hasta)
+
+    reporte = []
+    for plataforma in sorted(set(iniciales) | set(finales) | set(por_plataforma)):
+        mov = por_plataforma.get(plataforma, {})
+        stock_inicial = iniciales.get(plataforma, 0)
+        entradas = mov.get("entradas", 0)
+        salidas = mov.get("salidas", 0)
+        disponible = stock_inicial + entradas
+        reporte.append(
+            {
+                "plataforma": plataforma,
+                "stock_inicial": stock_inicial,
+                "entradas": entradas,
+                "salidas": salidas,
+                "vendidas": mov.get("vendidas", 0),
+                "bajas": mov.get("bajas", 0),
+                "stock_final": finales.get(plataforma, 0),
+                "sell_through": round(100 * salidas / disponible, 1) if disponible else 0,
+            }
+        )
+    return reporte
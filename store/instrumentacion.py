@@ -0,0 +1,297 @@
+# store/instrumentacion.py
+"""
+Medición por request: consultas SQL, tiempo de BD, de templates, de
+Firestore y hits/misses de caché.
+
+- InstrumentacionMiddleware abre una Medicion por request (en un ContextVar,
+  así también la ven los hilos de sync_to_async) y al final la entrega como
+  cabecera Server-Timing (INSTRUMENTACION_SERVER_TIMING) y como una línea
+  JSON en el logger "store.instrumentacion".
+- Las consultas se miden con un execute_wrapper instalado en cada conexión
+  al abrirse; los templates desde store.template_backends (backend
+  configurado en TEMPLATES); la caché desde store.cache_backends; Firestore
+  con ClienteMedido, que envuelve el cliente que entrega
+  firebase_app.get_db().
+- Las respuestas streaming (p. ej. la exportación CSV) se cierran cuando
+  termina de enviarse el cuerpo: lo que se consulta mientras se itera cuenta
+  para el request, y la línea de log lleva "streaming": true. No llevan
+  Server-Timing (las cabeceras ya salieron).
+- INSTRUMENTACION_PRESUPUESTO_CONSULTAS fija un máximo de consultas por
+  nombre de URL. Si se supera se registra un warning, o se lanza
+  PresupuestoConsultasExcedido con INSTRUMENTACION_ESTRICTA (tests).
+- Lo mismo se acumula en store.metricas (GET /metrics).
+- Si alguien pone una lista en Medicion.consultas_sql (store.perfiles), cada
+  consulta se agrega ahí como (sql, ms).
+- Fuera de un request no se mide nada.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+_medicion = ContextVar("instrumentacion_medicion", default=None)
+
+# Métodos del cliente de Firestore que hacen una llamada de red
+METODOS_FIRESTORE_RED = {"set", "update", "create", "delete", "get", "get_all", "stream", "commit"}
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    pass
+
+
+class Medicion:
+    __slots__ = (
+        "inicio",
+        "consultas",
+        "db_ms",
+        "plantillas_ms",
+        "firestore_llamadas",
+        "firestore_ms",
+        "cache_hits",
+        "cache_misses",
+        "consultas_sql",
+        "request",
+    )
+
+    def __init__(self, request=None):
+        self.request = request
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db_ms = 0.0
+        self.plantillas_ms = 0.0
+        self.firestore_llamadas = 0
+        self.firestore_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.consultas_sql = None
+
+
+def medicion_actual():
+    """Medicion del request en curso (None fuera de un request)."""
+    return _medicion.get()
+
+
+# ---------------------------------------------------------------------------
+#  Puntos de medición
+# ---------------------------------------------------------------------------
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        medicion.consultas += 1
+        medicion.db_ms += ms
+        if medicion.consultas_sql is not None:
+            medicion.consultas_sql.append((sql, ms))
+
+
+def _instalar_en_conexion(sender, connection, **kwargs):
+    metricas.contar("db_conexiones_creadas_total", alias=connection.alias)
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_sql)
+
+
+connection_created.connect(_instalar_en_conexion)
+for _conexion in connections.all(initialized_only=True):
+    if _medir_sql not in _conexion.execute_wrappers:
+        _conexion.execute_wrappers.append(_medir_sql)
+
+
+def registrar_plantilla(ms):
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.plantillas_ms += ms
+
+
+def registrar_cache(hits, misses):
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.cache_hits += hits
+        medicion.cache_misses += misses
+
+
+def _desenvolver(valor):
+    return valor._objetivo if isinstance(valor, ClienteMedido) else valor
+
+
+class ClienteMedido:
+    """
+    Envuelve un objeto del cliente de Firestore (cliente, colección,
+    documento, batch) y suma al request el tiempo de cada llamada. Lo que
+    devuelve otro objeto de Firestore sale envuelto también.
+    """
+
+    __slots__ = ("_objetivo",)
+
+    def __init__(self, objetivo):
+        self._objetivo = objetivo
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objetivo, nombre)
+        if not callable(atributo):
+            return atributo
+
+        def llamada(*args, **kwargs):
+            args = [_desenvolver(a) for a in args]
+            kwargs = {k: _desenvolver(v) for k, v in kwargs.items()}
+            medicion = _medicion.get()
+            inicio = time.perf_counter()
+            try:
+                resultado = atributo(*args, **kwargs)
+            finally:
+                if medicion is not None:
+                    medicion.firestore_ms += (time.perf_counter() - inicio) * 1000
+                    medicion.firestore_llamadas += nombre in METODOS_FIRESTORE_RED
+            if type(resultado).__module__.startswith("google.cloud.firestore"):
+                return ClienteMedido(resultado)
+            return resultado
+
+        return llamada
+
+
+# ---------------------------------------------------------------------------
+#  Middleware
+# ---------------------------------------------------------------------------
+def _server_timing(medicion, total_ms):
+    return ", ".join(
+        [
+            f'db;dur={medicion.db_ms:.1f};desc="{medicion.consultas} consultas"',
+            f"tpl;dur={medicion.plantillas_ms:.1f}",
+            f'fs;dur={medicion.firestore_ms:.1f};desc="{medicion.firestore_llamadas} llamadas"',
+            f'cache;desc="{medicion.cache_hits} hits {medicion.cache_misses} misses"',
+            f"total;dur={total_ms:.1f}",
+        ]
+    )
+
+
+class InstrumentacionMiddleware:
+    """Mide cada request (sync y async). Va primero en MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _fin(self, request, response, medicion):
+        if response.streaming:
+            # El cuerpo todavía no se generó: se mide al terminar de enviarlo
+            if response.is_async:
+                response.streaming_content = self._cuerpo_async(
+                    response.streaming_content, request, response, medicion
+                )
+            else:
+                response.streaming_content = self._cuerpo(
+                    response.streaming_content, request, response, medicion
+                )
+            return response
+        total_ms = self._registrar(request, response, medicion)
+        if settings.INSTRUMENTACION_SERVER_TIMING:
+            response["Server-Timing"] = _server_timing(medicion, total_ms)
+        return response
+
+    def _cuerpo(self, contenido, request, response, medicion):
+        iterador = iter(contenido)
+        try:
+            while True:
+                token = _medicion.set(medicion)
+                try:
+                    trozo = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    _medicion.reset(token)
+                yield trozo
+        finally:
+            self._registrar(request, response, medicion)
+
+    async def _cuerpo_async(self, contenido, request, response, medicion):
+        iterador = aiter(contenido)
+        try:
+            while True:
+                token = _medicion.set(medicion)
+                try:
+                    trozo = await anext(iterador)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _medicion.reset(token)
+                yield trozo
+        finally:
+            self._registrar(request, response, medicion)
+
+    def _registrar(self, request, response, medicion):
+        """Log, métricas y presupuesto de consultas. Devuelve el total en ms."""
+        total_ms = (time.perf_counter() - medicion.inicio) * 1000
+        match = getattr(request, "resolver_match", None)
+        vista = match.view_name if match else None
+
+        logger.info(
+            json.dumps(
+                {
+                    "vista": vista,
+                    "metodo": request.method,
+                    "ruta": request.path,
+                    "status": response.status_code,
+                    "streaming": response.streaming,
+                    "total_ms": round(total_ms, 1),
+                    "consultas": medicion.consultas,
+                    "db_ms": round(medicion.db_ms, 1),
+                    "plantillas_ms": round(medicion.plantillas_ms, 1),
+                    "firestore_llamadas": medicion.firestore_llamadas,
+                    "firestore_ms": round(medicion.firestore_ms, 1),
+                    "cache_hits": medicion.cache_hits,
+                    "cache_misses": medicion.cache_misses,
+                }
+            )
+        )
+        # Métricas agregadas (/metrics). Solo nombres de URL conocidos como
+        # etiqueta, para no crear una serie por cada ruta inexistente.
+        etiqueta = (match.url_name or match.view_name) if match else "sin_ruta"
+        metricas.observar("http_request_duration_seconds", total_ms / 1000, vista=etiqueta)
+        metricas.contar("http_requests_total", vista=etiqueta, status=response.status_code)
+        metricas.contar("db_consultas_total", medicion.consultas, vista=etiqueta)
+        metricas.contar("db_segundos_total", medicion.db_ms / 1000, vista=etiqueta)
+
+        presupuesto = settings.INSTRUMENTACION_PRESUPUESTO_CONSULTAS.get(match.url_name if match else None)
+        if presupuesto is not None and medicion.consultas > presupuesto:
+            mensaje = f"{vista}: {medicion.consultas} consultas (presupuesto {presupuesto})"
+            if settings.INSTRUMENTACION_ESTRICTA:
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(mensaje)
+        return total_ms
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion(request)
+        token = _medicion.set(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._fin(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion(request)
+        token = _medicion.set(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._fin(request, response, medicion)
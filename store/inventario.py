@@ -0,0 +1,195 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Producto, ResumenStock
+
+# Si hay más agotados que esto, "ocultar agotados" filtra con stock > 0
+# (también usa índice) en vez de mandar un IN gigante a la BD.
+MAX_IDS_EXCLUIR = 1000
+
+
+def _categoria(stock):
+    if stock <= 0:
+        return "sin_stock"
+    if stock <= settings.STOCK_BAJO_UMBRAL:
+        return "bajo_stock"
+    return None
+
+
+def registrar_cambios(cambios):
+    """
+    Actualiza el resumen de forma incremental.
+
+    `cambios` es una lista de pares (antes, despues), donde cada lado es una
+    tupla (producto_id, plataforma, formato, stock) o None (producto creado /
+    borrado). Los contadores se acumulan por fila y se aplican con F() para
+    que dos procesos no se pisen. Si un producto entra o sale de "sin stock"
+    o "bajo stock", la fila se bloquea (select_for_update) para actualizar
+    también el conjunto de IDs.
+    """
+    deltas = Counter()
+    # (plataforma, formato) -> {categoria: (ids a quitar, ids a agregar)}
+    movidos = {}
+    for antes, despues in cambios:
+        cat_antes = antes and (antes[1], antes[2], _categoria(antes[3]))
+        cat_despues = despues and (despues[1], despues[2], _categoria(despues[3]))
+        for lado, signo in ((antes, -1), (despues, +1)):
+            if lado is None:
+                continue
+            producto_id, plataforma, formato, stock = lado
+            deltas[(plataforma, formato, "total")] += signo
+            categoria = _categoria(stock)
+            if categoria and cat_antes != cat_despues:
+                deltas[(plataforma, formato, categoria)] += signo
+                quitar, agregar = movidos.setdefault((plataforma, formato), {}).setdefault(
+                    categoria, (set(), set())
+                )
+                (agregar if signo > 0 else quitar).add(producto_id)
+
+    por_fila = {fila: {} for fila in movidos}
+    for (plataforma, formato, campo), delta in deltas.items():
+        if delta:
+            por_fila.setdefault((plataforma, formato), {})[campo] = delta
+    if not por_fila:
+        return
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        for (plataforma, formato), campos in por_fila.items():
+            filas = ResumenStock.objects.filter(plataforma=plataforma, formato=formato)
+            if (plataforma, formato) not in movidos:
+                actualizadas = filas.update(
+                    actualizado_en=ahora,
+                    **{campo: F(campo) + delta for campo, delta in campos.items()},
+                )
+            else:
+                fila = filas.select_for_update().first()
+                actualizadas = fila is not None
+                if fila is not None:
+                    for campo, delta in campos.items():
+                        setattr(fila, campo, getattr(fila, campo) + delta)
+                    for categoria, (quitar, agregar) in movidos[(plataforma, formato)].items():
+                        campo_ids = f"ids_{categoria}"
+                        ids = (set(getattr(fila, campo_ids)) - quitar) | agregar
+                        setattr(fila, campo_ids, sorted(ids))
+                    fila.actualizado_en = ahora
+                    fila.save()
+            if not actualizadas:
+                # Primera vez que aparece esta combinación: se calcula desde cero
+                reconstruir(plataforma=plataforma, formato=formato)
+
+
+def reconstruir(plataforma=None, formato=None):
+    """
+    Recalcula el resumen desde Producto con consultas agrupadas.
+    Se usa al migrar (si cambió STOCK_BAJO_UMBRAL, ver al_migrar), desde el
+    comando reconstruir_resumen_stock o si falta una fila.
+    """
+    umbral = settings.STOCK_BAJO_UMBRAL
+    productos = Producto.objects.all()
+    if plataforma is not None:
+        productos = productos.filter(plataforma=plataforma, formato=formato)
+
+    filas = (
+        productos.values("plataforma", "formato")
+        .annotate(
+            total=Count("id"),
+            sin_stock=Count("id", filter=Q(stock=0)),
+            bajo_stock=Count("id", filter=Q(stock__gt=0, stock__lte=umbral)),
+        )
+        .order_by()
+    )
+    ids = {}
+    for plat, form, producto_id, stock in (
+        productos.filter(stock__lte=umbral)
+        .order_by("id")
+        .values_list("plataforma", "formato", "id", "stock")
+        .iterator(chunk_size=2000)
+    ):
+        ids.setdefault((plat, form, _categoria(stock)), []).append(producto_id)
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        if plataforma is None:
+            ResumenStock.objects.all().delete()
+        for fila in filas:
+            clave = (fila["plataforma"], fila["formato"])
+            ResumenStock.objects.update_or_create(
+                plataforma=fila["plataforma"],
+                formato=fila["formato"],
+                defaults={
+                    "total": fila["total"],
+                    "sin_stock": fila["sin_stock"],
+                    "bajo_stock": fila["bajo_stock"],
+                    "ids_sin_stock": ids.get(clave + ("sin_stock",), []),
+                    "ids_bajo_stock": ids.get(clave + ("bajo_stock",), []),
+                    "umbral": umbral,
+                    "actualizado_en": ahora,
+                },
+            )
+
+
+def al_migrar(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: si el resumen se calculó con otro STOCK_BAJO_UMBRAL se
+    reconstruye (cambiar el umbral en un deploy no requiere nada más).
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    if ResumenStock.objects.exclude(umbral=settings.STOCK_BAJO_UMBRAL).exists():
+        reconstruir()
+
+
+# ---------------------------------------------------------------------------
+#  Lectura (dashboards / catálogo)
+# ---------------------------------------------------------------------------
+def resumen():
+    """
+    Devuelve el resumen completo: filas por plataforma/formato y totales.
+    Es una consulta sobre una tabla de pocas filas (sin los conjuntos de IDs).
+
+    Si el resumen se calculó con otro umbral, `desactualizado` es True: no se
+    reconstruye acá (es un GET); lo hacen migrate y reconstruir_resumen_stock.
+    """
+    filas = list(ResumenStock.objects.defer("ids_sin_stock", "ids_bajo_stock"))
+    umbral = settings.STOCK_BAJO_UMBRAL
+
+    return {
+        "filas": filas,
+        "umbral": umbral,
+        "desactualizado": any(f.umbral != umbral for f in filas),
+        "total": sum(f.total for f in filas),
+        "sin_stock": sum(f.sin_stock for f in filas),
+        "bajo_stock": sum(f.bajo_stock for f in filas),
+    }
+
+
+def _ids(campo):
+    """Unión de los conjuntos de IDs de todas las filas (una consulta)."""
+    ids = set()
+    for lista in ResumenStock.objects.values_list(campo, flat=True):
+        ids.update(lista)
+    return frozenset(ids)
+
+
+def ids_sin_stock():
+    return _ids("ids_sin_stock")
+
+
+def ids_bajo_stock():
+    """Con el umbral con el que se calculó el resumen (ver resumen())."""
+    return _ids("ids_bajo_stock")
+
+
+def ocultar_agotados(productos):
+    """Excluye del queryset los productos sin stock usando el resumen."""
+    agotados = ids_sin_stock()
+    if not agotados:
+        return productos
+    if len(agotados) > MAX_IDS_EXCLUIR:
+        return productos.filter(stock__gt=0)
+    return productos.exclude(id__in=agotados)
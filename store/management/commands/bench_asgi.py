@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from store.benchmarks import resumen
+from store.models import Producto
+
+ESCENARIOS = ("home", "carrito")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de las vistas sync bajo WSGI contra las vistas "
+        "async bajo ASGI (en proceso, con el cliente de pruebas de Django) "
+        "para el catálogo y el carrito, con alta concurrencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests por modo y escenario.")
+        parser.add_argument("--concurrencia", type=int, default=50)
+        parser.add_argument("--escenario", choices=ESCENARIOS, action="append")
+        # Uso interno: cada modo corre en su propio proceso, porque las URLs
+        # eligen vistas sync/async al importarse.
+        parser.add_argument("--modo", choices=("wsgi", "asgi"), help="(interno)")
+
+    def handle(self, *args, **options):
+        escenarios = options["escenario"] or list(ESCENARIOS)
+        if options["modo"]:
+            resultado = self._medir(options["modo"], escenarios, options)
+            self.stdout.write(json.dumps(resultado))
+            return
+
+        resultados = {}
+        for modo, async_views in (("wsgi", "0"), ("asgi", "1")):
+            cmd = [
+                sys.executable, sys.argv[0], "bench_asgi",
+                "--modo", modo,
+                "--requests", str(options["requests"]),
+                "--concurrencia", str(options["concurrencia"]),
+            ]
+            for escenario in escenarios:
+                cmd += ["--escenario", escenario]
+            env = {**os.environ, "STORE_ASYNC_VIEWS": async_views}
+            salida = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            if salida.returncode != 0:
+                raise CommandError(f"Falló el modo {modo}:\n{salida.stderr}")
+            resultados[modo] = json.loads(salida.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f"{'escenario':<10} {'modo':<5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8}"
+        )
+        for escenario in escenarios:
+            for modo in ("wsgi", "asgi"):
+                r = resultados[modo][escenario]
+                self.stdout.write(
+                    f"{escenario:<10} {modo:<5} {r['req_por_s']:>8} {r['p50_ms']:>8} "
+                    f"{r['p95_ms']:>8} {r['errores']:>8}"
+                )
+
+    # ------------------------------------------------------------------
+    def _medir(self, modo, escenarios, options):
+        if (modo == "asgi") != settings.STORE_ASYNC_VIEWS:
+            raise CommandError("STORE_ASYNC_VIEWS no coincide con el modo pedido.")
+
+        producto_id = (
+            Producto.objects.filter(stock__gt=0).values_list("id", flat=True).first()
+        )
+        if producto_id is None:
+            raise CommandError("Se necesita al menos un producto con stock.")
+
+        total = options["requests"]
+        concurrencia = options["concurrencia"]
+        resultado = {}
+        # Los clientes de prueba usan el host "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for escenario in escenarios:
+                if modo == "wsgi":
+                    resultado[escenario] = self._medir_wsgi(escenario, producto_id, total, concurrencia)
+                else:
+                    resultado[escenario] = asyncio.run(
+                        self._medir_asgi(escenario, producto_id, total, concurrencia)
+                    )
+        return resultado
+
+    def _medir_wsgi(self, escenario, producto_id, total, concurrencia):
+        por_worker = max(1, total // concurrencia)
+
+        def worker(_):
+            client = Client()
+            latencias, errores = [], 0
+            for _ in range(por_worker):
+                inicio = time.perf_counter()
+                if escenario == "home":
+                    r = client.get("/")
+                else:
+                    client.post(f"/carrito/agregar/{producto_id}/")
+                    r = client.get("/carrito/")
+                latencias.append(time.perf_counter() - inicio)
+                errores += r.status_code >= 400
+            connections.close_all()
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            partes = list(pool.map(worker, range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+        latencias = [l for parte, _ in partes for l in parte]
+        return resumen(latencias, sum(e for _, e in partes), duracion)
+
+    async def _medir_asgi(self, escenario, producto_id, total, concurrencia):
+        por_worker = max(1, total // concurrencia)
+
+        async def worker():
+            client = AsyncClient()
+            latencias, errores = [], 0
+            for _ in range(por_worker):
+                inicio = time.perf_counter()
+                if escenario == "home":
+                    r = await client.get("/")
+                else:
+                    await client.post(f"/carrito/agregar/{producto_id}/")
+                    r = await client.get("/carrito/")
+                latencias.append(time.perf_counter() - inicio)
+                errores += r.status_code >= 400
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        partes = await asyncio.gather(*(worker() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+        latencias = [l for parte, _ in partes for l in parte]
+        return resumen(latencias, sum(e for _, e in partes), duracion)
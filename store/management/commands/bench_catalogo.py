@@ -0,0 +1,147 @@
+import datetime
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory
+
+from store import catalogo, generos
+from store.filtros import filtrar_catalogo
+from store.models import Producto, Genero
+from store.views import home
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la carga del catálogo (más los datos de cada tarjeta) con "
+        "instancias de Producto contra la proyección ProductoVista leída con "
+        "values(). "
+        "Completa el catálogo hasta --productos con datos sintéticos dentro "
+        "de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=10000)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._completar(options["productos"])
+                self._medir(options["repeticiones"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _completar(self, objetivo):
+        faltan = objetivo - Producto.objects.count()
+        if faltan <= 0:
+            return
+        self.stdout.write(f"Creando {faltan} productos sintéticos (se revierten al final)...")
+
+        genero_ids = list(Genero.objects.values_list("id", flat=True))
+        plataformas = ("PS3", "PS4", "PS5")
+        nuevos = Producto.objects.bulk_create(
+            [
+                Producto(
+                    nombre=f"Bench {i}",
+                    nombre_minusculas=f"bench {i}",
+                    anio_lanzamiento=datetime.date(2000 + i % 25, 1, 1),
+                    plataforma=plataformas[i % 3],
+                    formato="FISICO",
+                    estado="NUEVO",
+                    descripcion=f"Producto sintético número {i} para el benchmark.",
+                    valor=1000 + i,
+                    stock=i % 20,
+                )
+                for i in range(faltan)
+            ],
+            batch_size=1000,
+        )
+        if genero_ids:
+            through = Producto.generos.through
+            through.objects.bulk_create(
+                [
+                    through(producto_id=p.id, genero_id=genero_ids[j % len(genero_ids)])
+                    for n, p in enumerate(nuevos)
+                    for j in range(n, n + 1 + n % 3)
+                ],
+                batch_size=2000,
+                ignore_conflicts=True,
+            )
+
+        inicio = time.perf_counter()
+        catalogo.refrescar(p.id for p in nuevos)
+        self.stdout.write(f"Proyección de {faltan} productos: {time.perf_counter() - inicio:.2f}s")
+
+    def _medir(self, repeticiones):
+        base, _ = filtrar_catalogo(
+            Producto.objects.all().order_by("-creado_en"), QueryDict()
+        )
+        generos.todos()  # la caché de géneros ya está caliente en ambos casos
+
+        # Los mismos datos de la tarjeta de home.html, antes y después
+        tarjeta_orm = Template(
+            "{% for p in productos %}{{ p.id }}{{ p.nombre }}"
+            "{{ p.anio_lanzamiento|date:'Y' }}{{ p.plataforma }}"
+            "{{ p.get_formato_display }}{{ p.get_estado_display }}"
+            "{{ p.nombres_generos|join:', ' }}"
+            "{{ p.descripcion|default:'Sin descripción.'|truncatechars:90 }}"
+            "{{ p.valor }}{% if p.imagen %}{{ p.imagen.url }}{% endif %}{% endfor %}"
+        )
+        tarjeta_vista = Template(
+            "{% for p in productos %}{{ p.id }}{{ p.nombre }}"
+            "{{ p.anio }}{{ p.plataforma }}"
+            "{{ p.formato_display }}{{ p.estado_display }}"
+            "{{ p.generos_texto }}"
+            "{{ p.descripcion_corta }}"
+            "{{ p.valor }}{% if p.imagen_url %}{{ p.imagen_url }}{% endif %}{% endfor %}"
+        )
+
+        def orm():
+            # .all(): queryset nuevo en cada vuelta (sin la caché de resultados)
+            productos = generos.anotar_generos(base.all())
+            return tarjeta_orm.render(Context({"productos": productos}))
+
+        def vista():
+            productos = list(catalogo.listar(base.all()))
+            return tarjeta_vista.render(Context({"productos": productos}))
+
+        factory = RequestFactory()
+
+        def vista_home():
+            request = factory.get("/")
+            request.session = SessionStore()
+            request.user = AnonymousUser()
+            return home(request)
+
+        casos = (
+            ("ORM + géneros", orm),
+            ("ProductoVista", vista),
+            ("home completo", vista_home),
+        )
+        filas = []
+        for nombre, fn in casos:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                fn()
+                tiempos.append(time.perf_counter() - inicio)
+            filas.append((nombre, statistics.median(tiempos)))
+
+        total = base.count()
+        self.stdout.write(f"{'carga + tarjetas (' + str(total) + ')':<28} {'mediana ms':>12}")
+        for nombre, mediana in filas:
+            self.stdout.write(f"{nombre:<28} {mediana * 1000:>12.1f}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Aceleración (ORM -> ProductoVista): {filas[0][1] / filas[1][1]:.1f}x")
+        )
@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+
+from store.benchmarks import resumen
+from store.models import Producto
+
+# modo -> variables de entorno para el proceso hijo
+MODOS = {
+    "sqlite-default": {"DB_ENGINE": "sqlite", "DB_SQLITE_TUNING": "0"},
+    "sqlite-wal": {"DB_ENGINE": "sqlite", "DB_SQLITE_TUNING": "1"},
+    "postgres-persistente": {"DB_ENGINE": "postgres", "DB_POOL": "0"},
+    "postgres-pool": {"DB_ENGINE": "postgres", "DB_POOL": "1"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de escritores concurrentes sobre cart_update (cada uno con "
+        "su propia sesión en BD) para cada configuración de base de datos. "
+        "Los modos SQLite trabajan sobre una copia temporal de la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modo",
+            choices=MODOS,
+            action="append",
+            help="Modos a medir (por defecto, los de SQLite).",
+        )
+        parser.add_argument("--escritores", type=int, default=16)
+        parser.add_argument("--updates", type=int, default=50, help="Updates por escritor.")
+        parser.add_argument("--interno", action="store_true", help="(interno)")
+
+    def handle(self, *args, **options):
+        if options["interno"]:
+            self.stdout.write(json.dumps(self._medir(options)))
+            return
+
+        modos = options["modo"] or ["sqlite-default", "sqlite-wal"]
+        resultados = {}
+        for modo in modos:
+            env = {**os.environ, **MODOS[modo]}
+            copia = None
+            if modo.startswith("sqlite"):
+                copia = self._copiar_sqlite(journal_wal=modo == "sqlite-wal")
+                env["DB_NAME"] = copia
+            try:
+                cmd = [
+                    sys.executable, sys.argv[0], "bench_db", "--interno",
+                    "--escritores", str(options["escritores"]),
+                    "--updates", str(options["updates"]),
+                ]
+                salida = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            finally:
+                if copia:
+                    shutil.rmtree(os.path.dirname(copia), ignore_errors=True)
+            if salida.returncode != 0:
+                raise CommandError(f"Falló el modo {modo}:\n{salida.stderr}")
+            resultados[modo] = json.loads(salida.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f"{'modo':<22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8} {'locked':>8}"
+        )
+        for modo, r in resultados.items():
+            self.stdout.write(
+                f"{modo:<22} {r['req_por_s']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                f"{r['errores']:>8} {r['locked']:>8}"
+            )
+
+    def _copiar_sqlite(self, journal_wal):
+        origen = str(settings.DATABASES["default"]["NAME"])
+        if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Los modos SQLite necesitan una BD SQLite de origen.")
+        connections.close_all()
+
+        destino = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "db.sqlite3")
+        with sqlite3.connect(origen) as src, sqlite3.connect(destino) as dst:
+            src.backup(dst)
+        # El modo de journal queda guardado en el archivo: lo dejamos explícito
+        with sqlite3.connect(destino) as conn:
+            conn.execute(f"PRAGMA journal_mode={'WAL' if journal_wal else 'DELETE'}")
+        return destino
+
+    # ------------------------------------------------------------------
+    def _medir(self, options):
+        productos = list(
+            Producto.objects.filter(stock__gt=1).values_list("id", flat=True)[:20]
+        )
+        if not productos:
+            raise CommandError("Se necesitan productos con stock > 1.")
+
+        def escritor(n):
+            client = Client(raise_request_exception=False)
+            latencias, errores, locked = [], 0, 0
+            for i in range(options["updates"]):
+                producto_id = productos[(n + i) % len(productos)]
+                inicio = time.perf_counter()
+                try:
+                    r = client.post(
+                        f"/carrito/actualizar/{producto_id}/", {"quantity": 1 + i % 2}
+                    )
+                    if r.status_code >= 400:
+                        errores += 1
+                        locked += b"database is locked" in r.content
+                except OperationalError as e:
+                    errores += 1
+                    locked += "locked" in str(e)
+                latencias.append(time.perf_counter() - inicio)
+            connections.close_all()
+            return latencias, errores, locked
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["escritores"]) as pool:
+                partes = list(pool.map(escritor, range(options["escritores"])))
+            duracion = time.perf_counter() - inicio
+
+        latencias = [l for parte, _, _ in partes for l in parte]
+        resultado = resumen(latencias, sum(p[1] for p in partes), duracion)
+        resultado["locked"] = sum(p[2] for p in partes)
+        return resultado
@@ -0,0 +1,84 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+from django.core.management.base import BaseCommand
+
+from store.hashers import Argon2Hasher, PBKDF2Hasher, ScryptHasher
+
+
+def _con(clase, **parametros):
+    """Subclase de `clase` con otros parámetros de costo."""
+    return type(clase.__name__, (clase,), parametros)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántas verificaciones de contraseña (logins) por segundo y por "
+        "núcleo permite cada configuración de hash, más el rendimiento con "
+        "--hilos verificaciones en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=10)
+        parser.add_argument("--hilos", type=int, default=os.cpu_count() or 1)
+
+    def _configuraciones(self):
+        configs = [
+            ("pbkdf2 (Django)", PBKDF2PasswordHasher),
+            (f"pbkdf2 ({PBKDF2Hasher.iterations} it.)", PBKDF2Hasher),
+            ("pbkdf2 (600000 it., OWASP)", _con(PBKDF2PasswordHasher, iterations=600_000)),
+            ("scrypt (Django, p=5)", ScryptPasswordHasher),
+            (
+                f"scrypt (N={settings.SCRYPT_WORK_FACTOR}, r={settings.SCRYPT_BLOCK_SIZE}, "
+                f"p={settings.SCRYPT_PARALLELISM})",
+                ScryptHasher,
+            ),
+            ("argon2 (Django)", Argon2PasswordHasher),
+            (
+                f"argon2 (t={settings.ARGON2_TIME_COST}, m={settings.ARGON2_MEMORY_COST} KiB, "
+                f"p={settings.ARGON2_PARALLELISM})",
+                Argon2Hasher,
+            ),
+        ]
+        return configs
+
+    def handle(self, *args, **options):
+        repeticiones, hilos = options["repeticiones"], options["hilos"]
+        self.stdout.write(f"Hasher preferido: {settings.PASSWORD_HASHERS[0]}")
+        self.stdout.write(
+            f"{'configuración':<40} {'ms/login':>10} {'logins/s/núcleo':>16} {f'logins/s ({hilos} hilos)':>20}"
+        )
+
+        for nombre, clase in self._configuraciones():
+            hasher = clase()
+            try:
+                encoded = hasher.encode("contraseña-de-prueba", hasher.salt())
+            except ValueError as e:
+                # argon2-cffi no instalado
+                self.stdout.write(f"{nombre:<40} {'-':>10} {'-':>16} {'-':>20}  ({e})")
+                continue
+
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                hasher.verify("contraseña-de-prueba", encoded)
+                tiempos.append(time.perf_counter() - inicio)
+            mediana = statistics.median(tiempos)
+
+            total = repeticiones * hilos
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                inicio = time.perf_counter()
+                list(pool.map(lambda _: hasher.verify("contraseña-de-prueba", encoded), range(total)))
+                paralelo = total / (time.perf_counter() - inicio)
+
+            self.stdout.write(
+                f"{nombre:<40} {mediana * 1000:>10.1f} {1 / mediana:>16.1f} {paralelo:>20.1f}"
+            )
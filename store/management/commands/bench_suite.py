@@ -0,0 +1,242 @@
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+
+from store import datos_sinteticos, sincronizacion
+from store.benchmarks import percentil
+from store.cart import CART_SESSION_ID
+from store.models import Genero, Producto
+
+BASELINE = Path(settings.BASE_DIR) / "bench" / "baseline.json"
+
+# Filtros del catálogo que se combinan en los escenarios de home
+FILTROS_HOME = {
+    "plataforma": {"plataforma": "PS4"},
+    "tipo": {"tipo": "DIGITAL"},
+    "generos": {},  # se completa con el primer género creado
+    "precio": {"precio_min": "10000", "precio_max": "50000"},
+    "disponibles": {"disponibles": "1"},
+}
+CARRITOS = (1, 10, 100)
+# Diferencia de p95 que no cuenta como regresión aunque supere el umbral
+# (en escenarios de pocos ms es solo ruido)
+MARGEN_MS = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Suite de benchmarks repetible: crea una BD de prueba con un catálogo "
+        "sintético (misma semilla, mismos datos) y mide p50/p95, consultas y "
+        "pico de memoria de home con cada combinación de filtros, la búsqueda, "
+        "el panel de productos, el carrito con 1 a 100 productos y el guardado "
+        "de un producto (Firestore simulado). Guarda el resultado en JSON y lo "
+        "compara con un baseline: termina con error si algún escenario empeora "
+        "más que --umbral. El baseline depende de la máquina: generarlo con "
+        "--guardar-baseline en la misma máquina donde se compara."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=2000)
+        parser.add_argument("--generos", type=int, default=12)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--repeticiones", type=int, default=10)
+        parser.add_argument(
+            "--escenario", action="append",
+            help="Solo los escenarios cuyo nombre empieza así (se puede repetir).",
+        )
+        parser.add_argument("--salida", help="Archivo JSON donde escribir el resultado.")
+        parser.add_argument("--baseline", default=str(BASELINE))
+        parser.add_argument("--guardar-baseline", action="store_true")
+        parser.add_argument(
+            "--umbral", type=float, default=0.25,
+            help="Empeoramiento tolerado de p95 y memoria (0.25 = 25 %%).",
+        )
+
+    def handle(self, *args, **options):
+        # BD y caché propias: nada de la tienda real entra en la medición
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            # Firestore simulado: se mide solo el trabajo local de las señales
+            with mock.patch("store.signals.get_db"), mock.patch(
+                "store.sincronizacion.get_db"
+            ), override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": "bench_suite",
+                    }
+                },
+                INSTRUMENTACION_SERVER_TIMING=False,
+                INSTRUMENTACION_ESTRICTA=False,
+            ):
+                inicio = time.perf_counter()
+                datos_sinteticos.generar(
+                    options["productos"], options["generos"], options["semilla"]
+                )
+                datos_sinteticos.preparar()
+                self.stdout.write(
+                    f"Catálogo sintético: {options['productos']} productos, "
+                    f"{options['generos']} géneros ({time.perf_counter() - inicio:.1f}s)"
+                )
+                escenarios = self._escenarios()
+                if options["escenario"]:
+                    escenarios = {
+                        nombre: fn
+                        for nombre, fn in escenarios.items()
+                        if nombre.startswith(tuple(options["escenario"]))
+                    }
+                resultados = {
+                    nombre: self._medir(fn, options["repeticiones"])
+                    for nombre, fn in escenarios.items()
+                }
+                sincronizacion.enviar_last_login()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        documento = {
+            "parametros": {
+                k: options[k] for k in ("productos", "generos", "semilla", "repeticiones")
+            },
+            "escenarios": resultados,
+        }
+        self._mostrar(resultados)
+        if options["salida"]:
+            Path(options["salida"]).write_text(json.dumps(documento, indent=2))
+
+        baseline = Path(options["baseline"])
+        if options["guardar_baseline"]:
+            baseline.parent.mkdir(parents=True, exist_ok=True)
+            baseline.write_text(json.dumps(documento, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {baseline}"))
+            return
+        if not baseline.exists():
+            self.stdout.write(f"Sin baseline en {baseline} (usar --guardar-baseline).")
+            return
+        self._comparar(documento, json.loads(baseline.read_text()), options["umbral"])
+
+    # ------------------------------------------------------------------
+    def _escenarios(self):
+        anonimo = Client()
+        staff = Client()
+        staff.force_login(
+            User.objects.create_user("bench", password="bench", is_staff=True)
+        )
+        filtros = {
+            **FILTROS_HOME,
+            "generos": {"generos": str(Genero.objects.values_list("id", flat=True).first())},
+        }
+
+        escenarios = {}
+        for n in range(len(filtros) + 1):
+            for combinacion in itertools.combinations(filtros, n):
+                params = {}
+                for filtro in combinacion:
+                    params.update(filtros[filtro])
+                nombre = "home[" + ("+".join(combinacion) or "sin filtros") + "]"
+                escenarios[nombre] = lambda params=params: anonimo.get("/", params)
+
+        producto = Producto.objects.order_by("id").first()
+        palabra = producto.nombre.split()[0]
+        escenarios.update(
+            {
+                "busqueda[exacta]": lambda: anonimo.get("/", {"q": palabra}),
+                # Sin coincidencias con icontains: usa el índice de trigramas
+                "busqueda[aproximada]": lambda: anonimo.get("/", {"q": palabra[:-1] + "x" + palabra[-1]}),
+                "busqueda[sugerencias]": lambda: anonimo.get("/buscar/sugerencias/", {"q": palabra[:3]}),
+                "product_list": lambda: staff.get("/panel/productos/"),
+                "product_list[búsqueda+orden]": lambda: staff.get(
+                    "/panel/productos/", {"q": palabra, "orden": "stock"}
+                ),
+                "product_list[bajo stock]": lambda: staff.get("/panel/productos/", {"bajo_stock": "1"}),
+            }
+        )
+
+        ids = list(Producto.objects.filter(stock__gt=0).order_by("id").values_list("id", "valor")[:max(CARRITOS)])
+        for cantidad in CARRITOS:
+            cliente = Client()
+            sesion = cliente.session
+            sesion[CART_SESSION_ID] = {
+                str(pid): {"quantity": 1, "price": str(valor)} for pid, valor in ids[:cantidad]
+            }
+            sesion.save()
+            escenarios[f"carrito[{cantidad}]"] = lambda cliente=cliente: cliente.get("/carrito/")
+
+        def guardar():
+            producto.stock = producto.stock % 50 + 1
+            producto.save()
+
+        escenarios["guardar_producto"] = guardar
+        return escenarios
+
+    def _medir(self, fn, repeticiones):
+        fn()  # calentamiento (cachés, plantillas compiladas)
+        tiempos, consultas = [], []
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = fn()
+                tiempos.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            if respuesta is not None and respuesta.status_code >= 400:
+                raise CommandError(f"Respuesta {respuesta.status_code} en un escenario")
+
+        # Memoria aparte: tracemalloc hace más lento todo lo que mide
+        tracemalloc.start()
+        try:
+            fn()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentil(tiempos, 50) * 1000, 2),
+            "p95_ms": round(percentil(tiempos, 95) * 1000, 2),
+            "media_ms": round(statistics.fmean(tiempos) * 1000, 2),
+            "consultas": max(consultas),
+            "pico_kb": round(pico / 1024, 1),
+        }
+
+    def _mostrar(self, resultados):
+        self.stdout.write(
+            f"{'escenario':<50} {'p50 ms':>8} {'p95 ms':>8} {'consultas':>10} {'pico KB':>10}"
+        )
+        for nombre, r in resultados.items():
+            self.stdout.write(
+                f"{nombre:<50} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['consultas']:>10} {r['pico_kb']:>10}"
+            )
+
+    def _comparar(self, actual, baseline, umbral):
+        if actual["parametros"] != baseline["parametros"]:
+            raise CommandError(
+                f"El baseline se generó con otros parámetros: {baseline['parametros']}"
+            )
+        regresiones = []
+        for nombre, r in actual["escenarios"].items():
+            base = baseline["escenarios"].get(nombre)
+            if base is None:
+                continue
+            # Las consultas no dependen de la máquina: cualquier aumento cuenta
+            if r["consultas"] > base["consultas"]:
+                regresiones.append(f"{nombre}: consultas {base['consultas']} -> {r['consultas']}")
+            if r["p95_ms"] > max(base["p95_ms"] * (1 + umbral), base["p95_ms"] + MARGEN_MS):
+                regresiones.append(f"{nombre}: p95_ms {base['p95_ms']} -> {r['p95_ms']}")
+            if r["pico_kb"] > base["pico_kb"] * (1 + umbral):
+                regresiones.append(f"{nombre}: pico_kb {base['pico_kb']} -> {r['pico_kb']}")
+
+        if regresiones:
+            raise CommandError(
+                "Regresiones respecto del baseline:\n  " + "\n  ".join(regresiones)
+            )
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto del baseline."))
@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from store.exportacion import exportar, FORMATOS_EXPORTACION
+from store.filtros import filtrar_catalogo
+from store.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo (módulo de stock) en CSV o JSONL, leyendo la BD "
+        "por bloques. Acepta los mismos filtros que la página principal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=FORMATOS_EXPORTACION, default="csv")
+        parser.add_argument(
+            "--salida",
+            help="Archivo de destino. Si se omite, se escribe en la salida estándar.",
+        )
+        parser.add_argument("--q", default="", help="Texto a buscar en nombre / descripción.")
+        parser.add_argument("--plataforma", default="")
+        parser.add_argument("--tipo", default="", help="Formato del producto (FISICO / DIGITAL).")
+        parser.add_argument(
+            "--genero",
+            action="append",
+            default=[],
+            help="ID de género. Se puede repetir.",
+        )
+        parser.add_argument("--precio-min", default="")
+        parser.add_argument("--precio-max", default="")
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        params["q"] = options["q"]
+        params["plataforma"] = options["plataforma"]
+        params["tipo"] = options["tipo"]
+        params.setlist("generos", options["genero"])
+        params["precio_min"] = options["precio_min"]
+        params["precio_max"] = options["precio_max"]
+
+        productos, _ = filtrar_catalogo(Producto.objects.all(), params)
+        lineas = exportar(options["formato"], productos)
+
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8", newline="") as f:
+                for linea in lineas:
+                    f.write(linea)
+            self.stdout.write(self.style.SUCCESS(f"Catálogo exportado en {options['salida']}"))
+        else:
+            for linea in lineas:
+                sys.stdout.write(linea)
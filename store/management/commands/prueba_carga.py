@@ -0,0 +1,397 @@
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmarks import percentil
+from store.models import FORMATO_CHOICES, PLATAFORMA_CHOICES, Genero, Producto
+
+MEZCLA = "home=60,carrito=15,cantidad=12,login=8,staff=5"
+PREFIJO_USUARIOS = "carga_"
+# Productos sobre los que el staff ajusta stock: pocos, para que haya
+# ajustes concurrentes sobre las mismas filas
+PRODUCTOS_STAFF = 5
+
+
+class _Http:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio: una conexión keep-alive y un
+    tarro de cookies por usuario virtual, sin seguir redirecciones.
+    """
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.cookies = {}
+        self._lector = self._escritor = None
+
+    async def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._lector = self._escritor = None
+
+    async def pedir(self, metodo, ruta, cuerpo=b"", tipo=None, cabeceras=None):
+        for intento in (1, 2):
+            nueva = self._escritor is None
+            if nueva:
+                self._lector, self._escritor = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._intercambio(metodo, ruta, cuerpo, tipo, cabeceras or {})
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.cerrar()
+                # El servidor puede cerrar una conexión keep-alive inactiva
+                if nueva or intento == 2:
+                    raise
+
+    async def _intercambio(self, metodo, ruta, cuerpo, tipo, cabeceras):
+        lineas = [
+            f"{metodo} {ruta} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            f"Content-Length: {len(cuerpo)}",
+        ]
+        if tipo:
+            lineas.append(f"Content-Type: {tipo}")
+        if self.cookies:
+            lineas.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        lineas += [f"{k}: {v}" for k, v in cabeceras.items()]
+        self._escritor.write(("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo)
+        await self._escritor.drain()
+
+        estado = await self._lector.readline()
+        if not estado:
+            raise ConnectionResetError("conexión cerrada por el servidor")
+        status = int(estado.split()[1])
+        headers = {}
+        while (linea := await self._lector.readline()) not in (b"\r\n", b"\n", b""):
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            nombre, valor = nombre.strip().lower(), valor.strip()
+            if nombre == "set-cookie":
+                self._guardar_cookie(valor)
+            else:
+                headers[nombre] = valor
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            partes = []
+            while tamano := int((await self._lector.readline()).split(b";")[0], 16):
+                partes.append(await self._lector.readexactly(tamano))
+                await self._lector.readline()
+            await self._lector.readline()
+            body = b"".join(partes)
+        elif "content-length" in headers:
+            body = await self._lector.readexactly(int(headers["content-length"]))
+        else:
+            body = await self._lector.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            await self.cerrar()
+        return status, headers, body
+
+    def _guardar_cookie(self, valor):
+        nombre, _, resto = valor.partition("=")
+        contenido, _, atributos = resto.partition(";")
+        if not contenido.strip('"') or "max-age=0" in atributos.lower():
+            self.cookies.pop(nombre, None)
+        else:
+            self.cookies[nombre] = contenido
+
+
+class _Usuario:
+    """Un cliente de la tienda (o del staff) con su propia sesión."""
+
+    def __init__(self, http, username, password):
+        self.http = http
+        self.username, self.password = username, password
+        self.logueado = False
+        self.csrf = None
+
+    async def actualizar_csrf(self):
+        status, _, body = await self.http.pedir("GET", "/carrito/resumen/")
+        if status != 200:
+            raise CommandError(f"/carrito/resumen/ respondió {status}")
+        self.csrf = json.loads(body)["csrf_token"]
+
+    async def post(self, ruta, datos=None, json_=None):
+        if self.csrf is None:
+            await self.actualizar_csrf()
+        if json_ is not None:
+            return await self.http.pedir(
+                "POST", ruta, json.dumps(json_).encode(), "application/json",
+                {"X-CSRFToken": self.csrf},
+            )
+        datos = {**(datos or {}), "csrfmiddlewaretoken": self.csrf}
+        return await self.http.pedir(
+            "POST", ruta, urlencode(datos).encode(), "application/x-www-form-urlencoded"
+        )
+
+    async def login(self):
+        if self.logueado:
+            await self.post("/accounts/logout/")
+            self.logueado = False
+        status, headers, body = await self.post(
+            "/accounts/login/", {"username": self.username, "password": self.password}
+        )
+        self.logueado = status == 302
+        # Django rota el token CSRF al iniciar sesión
+        self.csrf = None
+        return status, headers, body
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga local: usuarios virtuales (asyncio, sin servicios "
+        "externos) recorren el proyecto ya levantado en --url con una mezcla "
+        "de acciones: navegar home con filtros al azar, agregar al carrito, "
+        "cambiar cantidades, iniciar sesión y ajustes de stock del staff. "
+        "Informa throughput, percentiles de latencia y errores, incluidos "
+        "'database is locked' y sobreventas (stock negativo o ajustes que no "
+        "cuadran con el stock final). Debe correr con la misma configuración "
+        "de BD que el servidor: lee de ahí productos y stock y crea los "
+        "usuarios de prueba con --preparar-usuarios."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--usuarios", type=int, default=50, help="Usuarios virtuales concurrentes.")
+        parser.add_argument("--duracion", type=float, default=60, help="Segundos de carga.")
+        parser.add_argument("--rampa", type=float, default=5, help="Segundos para arrancar a todos los usuarios.")
+        parser.add_argument("--pausa", type=float, default=0.0, help="Pausa media entre acciones (s).")
+        parser.add_argument(
+            "--mezcla", default=MEZCLA,
+            help=f"Pesos de cada acción (por defecto {MEZCLA}).",
+        )
+        parser.add_argument("--password", default="carga-1234")
+        parser.add_argument(
+            "--preparar-usuarios", action="store_true",
+            help=f"Crea (o actualiza) los usuarios {PREFIJO_USUARIOS}* con --password.",
+        )
+        parser.add_argument("--semilla", type=int)
+        parser.add_argument("--salida", help="Archivo JSON donde escribir el resultado.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("--url debe ser http://host[:puerto]")
+        mezcla = self._mezcla(options["mezcla"])
+        if options["preparar_usuarios"]:
+            self._preparar_usuarios(options["usuarios"], options["password"])
+
+        productos = list(
+            Producto.objects.filter(stock__gt=0).order_by("?").values_list("id", flat=True)[:200]
+        )
+        if not productos:
+            raise CommandError("Se necesitan productos con stock.")
+        staff_ids = productos[:PRODUCTOS_STAFF]
+        stock_inicial = dict(Producto.objects.filter(id__in=staff_ids).values_list("id", "stock"))
+        self.contexto = {
+            "productos": productos,
+            "staff_ids": staff_ids,
+            "generos": list(Genero.objects.values_list("id", flat=True)),
+            "azar": random.Random(options["semilla"]),
+        }
+
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.locked = 0
+        self.rechazos_stock = 0
+        self.sobreventas = 0
+        self.ajustes = defaultdict(int)  # producto -> suma de deltas aplicados
+
+        inicio = time.perf_counter()
+        asyncio.run(self._correr(url.hostname, url.port or 80, mezcla, options))
+        duracion = time.perf_counter() - inicio
+
+        # Libro de stock: el stock final debe ser el inicial más lo aplicado
+        finales = dict(Producto.objects.filter(id__in=staff_ids).values_list("id", "stock"))
+        descuadres = {
+            pid: (stock_inicial[pid] + self.ajustes[pid], finales.get(pid))
+            for pid in staff_ids
+            if finales.get(pid) != stock_inicial[pid] + self.ajustes[pid]
+        }
+        self.sobreventas += len(descuadres)
+
+        resultado = self._resumen(duracion)
+        resultado["descuadres_stock"] = {str(k): v for k, v in descuadres.items()}
+        self._mostrar(resultado)
+        if options["salida"]:
+            with open(options["salida"], "w") as f:
+                json.dump(resultado, f, indent=2)
+
+    # ------------------------------------------------------------------
+    def _mezcla(self, texto):
+        acciones = {"home", "carrito", "cantidad", "login", "staff"}
+        mezcla = {}
+        for parte in texto.split(","):
+            nombre, _, peso = parte.partition("=")
+            if nombre.strip() not in acciones:
+                raise CommandError(f"Acción desconocida en --mezcla: {nombre!r}")
+            try:
+                mezcla[nombre.strip()] = float(peso)
+            except ValueError:
+                raise CommandError(f"Peso inválido en --mezcla: {parte!r}")
+        if not any(mezcla.values()):
+            raise CommandError("--mezcla no tiene ninguna acción con peso.")
+        return mezcla
+
+    def _preparar_usuarios(self, cantidad, password):
+        # Un solo hash para todos: con el costo de producción serían minutos
+        hash_ = make_password(password)
+        nombres = [f"{PREFIJO_USUARIOS}{i}" for i in range(cantidad)] + [f"{PREFIJO_USUARIOS}staff"]
+        User.objects.bulk_create(
+            [User(username=n, password=hash_) for n in nombres], ignore_conflicts=True
+        )
+        User.objects.filter(username__in=nombres).update(password=hash_, is_active=True)
+        User.objects.filter(username=f"{PREFIJO_USUARIOS}staff").update(is_staff=True)
+        self.stdout.write(f"Usuarios de prueba listos ({len(nombres)}).")
+
+    async def _correr(self, host, port, mezcla, options):
+        fin = time.monotonic() + options["rampa"] + options["duracion"]
+        usuarios = options["usuarios"]
+        await asyncio.gather(
+            *(
+                self._usuario(n, host, port, mezcla, options, options["rampa"] * n / usuarios, fin)
+                for n in range(usuarios)
+            )
+        )
+
+    async def _usuario(self, n, host, port, mezcla, options, espera, fin):
+        await asyncio.sleep(espera)
+        azar = random.Random(None if options["semilla"] is None else options["semilla"] + n)
+        cliente = _Usuario(_Http(host, port), f"{PREFIJO_USUARIOS}{n}", options["password"])
+        staff = None
+        acciones, pesos = list(mezcla), list(mezcla.values())
+        try:
+            while time.monotonic() < fin:
+                accion = azar.choices(acciones, pesos)[0]
+                if accion == "staff" and staff is None:
+                    staff = _Usuario(_Http(host, port), f"{PREFIJO_USUARIOS}staff", options["password"])
+                    await staff.login()
+                inicio = time.perf_counter()
+                try:
+                    status, body = await self._accion(accion, cliente, staff, azar)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    self.latencias[accion].append(time.perf_counter() - inicio)
+                    self.errores[accion] += 1
+                    continue
+                self.latencias[accion].append(time.perf_counter() - inicio)
+                if b"database is locked" in body:
+                    self.locked += 1
+                if status >= 400 and not (accion == "staff" and status == 400):
+                    self.errores[accion] += 1
+                if options["pausa"]:
+                    await asyncio.sleep(azar.expovariate(1 / options["pausa"]))
+        finally:
+            await cliente.http.cerrar()
+            if staff is not None:
+                await staff.http.cerrar()
+
+    async def _accion(self, accion, cliente, staff, azar):
+        productos = self.contexto["productos"]
+        if accion == "home":
+            params = {}
+            if azar.random() < 0.4:
+                params["plataforma"] = azar.choice(PLATAFORMA_CHOICES)[0]
+            if azar.random() < 0.3:
+                params["tipo"] = azar.choice(FORMATO_CHOICES)[0]
+            if self.contexto["generos"] and azar.random() < 0.3:
+                params["generos"] = azar.choice(self.contexto["generos"])
+            if azar.random() < 0.2:
+                minimo = azar.randrange(1000, 50000, 1000)
+                params.update(precio_min=minimo, precio_max=minimo + 20000)
+            if azar.random() < 0.2:
+                params["disponibles"] = "1"
+            ruta = "/?" + urlencode(params) if params else "/"
+            status, _, body = await cliente.http.pedir("GET", ruta)
+            return status, body
+
+        if accion == "carrito":
+            status, _, body = await cliente.post(f"/carrito/agregar/{azar.choice(productos)}/")
+            return status, body
+
+        if accion == "cantidad":
+            status, _, body = await cliente.post(
+                f"/carrito/actualizar/{azar.choice(productos)}/",
+                {"quantity": azar.randint(1, 10)},
+            )
+            return status, body
+
+        if accion == "login":
+            status, _, body = await cliente.login()
+            # El formulario vuelve con 200 si las credenciales no sirven
+            return (status if status == 302 else 400), body
+
+        # Ventas y reposiciones sobre pocas filas: compiten por los mismos productos
+        ajustes = [
+            {"id": pid, "delta": azar.choice((-3, -2, -1, -1, 1, 2))}
+            for pid in azar.sample(self.contexto["staff_ids"], azar.randint(1, 2))
+        ]
+        status, _, body = await staff.post("/panel/productos/stock/api/", json_={"ajustes": ajustes})
+        if status == 200:
+            for fila in json.loads(body)["productos"]:
+                self.ajustes[fila["id"]] += fila["stock"] - fila["stock_anterior"]
+                self.sobreventas += fila["stock"] < 0
+        elif status == 400 and b"quedar" in body:
+            # Venta rechazada por falta de stock: es lo esperado, no un error
+            self.rechazos_stock += 1
+        elif status == 400:
+            self.errores["staff"] += 1
+        return status, body
+
+    def _resumen(self, duracion):
+        total = sum(len(v) for v in self.latencias.values())
+        acciones = {}
+        for accion, latencias in sorted(self.latencias.items()):
+            acciones[accion] = {
+                "requests": len(latencias),
+                "errores": self.errores[accion],
+                "tasa_error": round(self.errores[accion] / len(latencias), 4),
+                "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+                "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+                "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+            }
+        todas = [l for v in self.latencias.values() for l in v]
+        errores = sum(self.errores.values())
+        return {
+            "duracion_s": round(duracion, 1),
+            "requests": total,
+            "req_por_s": round(total / duracion, 1) if duracion else 0,
+            "errores": errores,
+            "tasa_error": round(errores / total, 4) if total else 0,
+            "p50_ms": round(percentil(todas, 50) * 1000, 2),
+            "p95_ms": round(percentil(todas, 95) * 1000, 2),
+            "p99_ms": round(percentil(todas, 99) * 1000, 2),
+            "database_locked": self.locked,
+            "ventas_rechazadas_sin_stock": self.rechazos_stock,
+            "sobreventas": self.sobreventas,
+            "acciones": acciones,
+        }
+
+    def _mostrar(self, r):
+        self.stdout.write(
+            f"{'acción':<10} {'requests':>9} {'errores':>8} {'% error':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for accion, a in r["acciones"].items():
+            self.stdout.write(
+                f"{accion:<10} {a['requests']:>9} {a['errores']:>8} {a['tasa_error'] * 100:>8.2f} "
+                f"{a['p50_ms']:>8} {a['p95_ms']:>8} {a['p99_ms']:>8}"
+            )
+        self.stdout.write(
+            f"{'total':<10} {r['requests']:>9} {r['errores']:>8} {r['tasa_error'] * 100:>8.2f} "
+            f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}"
+        )
+        self.stdout.write(f"Throughput: {r['req_por_s']} req/s en {r['duracion_s']}s")
+        self.stdout.write(
+            f"database is locked: {r['database_locked']}  "
+            f"ventas rechazadas sin stock: {r['ventas_rechazadas_sin_stock']}"
+        )
+        estilo = self.style.ERROR if r["sobreventas"] else self.style.SUCCESS
+        self.stdout.write(estilo(f"Sobreventas / descuadres de stock: {r['sobreventas']}"))
+        for pid, (esperado, final) in r["descuadres_stock"].items():
+            self.stdout.write(f"  producto {pid}: esperado {esperado}, final {final}")
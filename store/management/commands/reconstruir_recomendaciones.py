@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store import recomendaciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los productos relacionados de todo el catálogo "
+        "(ProductoVista.relacionados), p. ej. después de migrar o de cargar "
+        "productos con bulk_create o SQL directo."
+    )
+
+    def handle(self, *args, **options):
+        total = recomendaciones.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Recomendaciones recalculadas: {total} productos."))
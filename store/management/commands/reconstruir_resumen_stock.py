@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from store import inventario
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero el resumen de stock (sin stock / bajo stock)."
+
+    def handle(self, *args, **options):
+        inventario.reconstruir()
+        datos = inventario.resumen()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resumen reconstruido: {datos['sin_stock']} sin stock, "
+                f"{datos['bajo_stock']} con stock <= {datos['umbral']} "
+                f"de {datos['total']} productos."
+            )
+        )
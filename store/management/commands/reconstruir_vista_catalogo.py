@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store import catalogo
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cero la proyección del catálogo (ProductoVista), "
+        "p. ej. después de cargar productos con bulk_create o SQL directo."
+    )
+
+    def handle(self, *args, **options):
+        total = catalogo.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Vista del catálogo reconstruida: {total} productos."))
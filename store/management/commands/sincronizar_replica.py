@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la BD SQLite primaria sobre las réplicas configuradas en "
+        "DB_REPLICAS. Sirve para probar el enrutamiento de lecturas en "
+        "desarrollo; en Postgres la replicación la hace el servidor."
+    )
+
+    def handle(self, *args, **options):
+        primaria = settings.DATABASES["default"]
+        if primaria["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Solo aplica a SQLite; en Postgres usa replicación nativa.")
+        if not settings.DB_REPLICAS:
+            raise CommandError("No hay réplicas configuradas (DB_REPLICAS).")
+
+        with sqlite3.connect(str(primaria["NAME"])) as origen:
+            for ruta in settings.DB_REPLICAS:
+                with sqlite3.connect(ruta) as destino:
+                    # backup() copia página a página con la BD en uso
+                    origen.backup(destino)
+                self.stdout.write(self.style.SUCCESS(f"Réplica actualizada: {ruta}"))
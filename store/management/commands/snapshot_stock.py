@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.historial import tomar_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda un snapshot del stock de los productos con movimientos desde "
+        "el último snapshot. Pensado para ejecutarse periódicamente (cron)."
+    )
+
+    def handle(self, *args, **options):
+        creados = tomar_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Snapshots creados: {creados}"))
@@ -0,0 +1,310 @@
+# store/metricas.py
+"""
+Métricas de la tienda en formato de texto de Prometheus (GET /metrics).
+
+- Cada proceso acumula sus contadores e histogramas en memoria (un lock
+  local, sin coordinación entre procesos). Los procesos del servidor
+  (JRBStore2/wsgi.py / asgi.py llaman a habilitar_volcado()) además los
+  escriben cada METRICAS_VOLCADO_SEGUNDOS en METRICAS_DIR/<pid>-<inicio>.json
+  (escritura atómica con rename). Tests, benchmarks y comandos de gestión
+  quedan solo en memoria: no suman a los totales de producción.
+- /metrics suma los archivos de todos los workers (también lo de procesos
+  ya terminados, para que los contadores no retrocedan) más el estado en
+  memoria del proceso que responde. El directorio se vacía en cada deploy.
+- Al arrancar, cada proceso junta en historico.json los archivos de los
+  PIDs que ya no existen, así el directorio no crece con cada reinicio de
+  worker. Por eso METRICAS_DIR es local a la máquina. La compactación toma
+  un flock exclusivo y la lectura de /metrics uno compartido: nunca se lee
+  el histórico nuevo junto con los archivos que ya se sumaron en él.
+- Si el proceso se bifurca (gunicorn --preload), el hijo empieza de cero.
+
+Qué se mide (prefijo jrbstore_):
+- http_request_duration_seconds / http_requests_total por nombre de URL
+  (store.instrumentacion);
+- db_consultas_total, db_segundos_total por vista y
+  db_conexiones_creadas_total por alias;
+- carrito_operaciones_total por operación y stock_agotado_total (cart_add
+  sin stock);
+- firestore_sync_total por tipo y resultado y firestore_sync_seconds.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = "jrbstore_"
+HISTORICO = "historico.json"
+LOCK = ".compactar.lock"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nombre -> (tipo, ayuda)
+METRICAS = {
+    "http_request_duration_seconds": ("histogram", "Duración de los requests por nombre de URL."),
+    "http_requests_total": ("counter", "Requests por nombre de URL y status."),
+    "db_consultas_total": ("counter", "Consultas SQL por vista."),
+    "db_segundos_total": ("counter", "Tiempo en la BD por vista."),
+    "db_conexiones_creadas_total": ("counter", "Conexiones a la BD abiertas, por alias."),
+    "carrito_operaciones_total": ("counter", "Operaciones sobre el carrito."),
+    "stock_agotado_total": ("counter", "Intentos de agregar al carrito un producto sin stock."),
+    "firestore_sync_total": ("counter", "Sincronizaciones con Firestore por tipo y resultado."),
+    "firestore_sync_seconds": ("histogram", "Duración de las sincronizaciones con Firestore."),
+}
+
+_lock = threading.Lock()
+_pid = None
+_archivo = None  # None: el proceso no vuelca a METRICAS_DIR
+_volcado_habilitado = False
+# (nombre, etiquetas) -> valor  /  [cuentas por bucket..., +Inf, suma]
+_contadores = {}
+_histogramas = {}
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _proceso():
+    """Inicializa el estado del proceso actual (la primera vez o tras un fork)."""
+    global _pid, _archivo
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        _contadores.clear()
+        _histogramas.clear()
+        _pid = os.getpid()
+        _archivo = None
+        if _volcado_habilitado:
+            _iniciar_volcado()
+
+
+def _iniciar_volcado():
+    """Archivo del proceso e hilo de volcado (llamar con _lock tomado)."""
+    global _archivo
+    _archivo = Path(settings.METRICAS_DIR) / f"{_pid}-{int(time.time())}.json"
+    threading.Thread(target=_volcar_periodicamente, daemon=True).start()
+
+
+def habilitar_volcado():
+    """Vuelca las métricas de este proceso (y de sus hijos) a METRICAS_DIR."""
+    global _volcado_habilitado
+    _proceso()
+    with _lock:
+        _volcado_habilitado = True
+        if _archivo is None:
+            _iniciar_volcado()
+
+
+def contar(nombre, valor=1, **etiquetas):
+    _proceso()
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def observar(nombre, valor, **etiquetas):
+    _proceso()
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        cuentas = _histogramas.get(clave)
+        if cuentas is None:
+            cuentas = _histogramas[clave] = [0] * (len(BUCKETS) + 2)
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                cuentas[i] += 1
+                break
+        else:
+            cuentas[len(BUCKETS)] += 1
+        cuentas[-1] += valor
+
+
+@contextmanager
+def sync_firestore(tipo):
+    """Cuenta y mide una sincronización con Firestore (deja pasar el error)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        contar("firestore_sync_total", tipo=tipo, resultado="error")
+        raise
+    else:
+        contar("firestore_sync_total", tipo=tipo, resultado="ok")
+    finally:
+        observar("firestore_sync_seconds", time.perf_counter() - inicio, tipo=tipo)
+
+
+# ---------------------------------------------------------------------------
+#  Volcado a archivo y lectura
+# ---------------------------------------------------------------------------
+def _serializar(contadores, histogramas):
+    return {
+        "contadores": [[n, list(e), v] for (n, e), v in contadores.items()],
+        "histogramas": [[n, list(e), list(c)] for (n, e), c in histogramas.items()],
+    }
+
+
+def _estado():
+    with _lock:
+        return _serializar(_contadores, _histogramas)
+
+
+def _escribir(archivo, estado):
+    """Escritura atómica (archivo temporal + rename)."""
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=archivo.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(estado, f)
+    os.replace(temporal, archivo)
+
+
+def volcar():
+    """Escribe el estado de este proceso en su archivo."""
+    if _archivo is not None:
+        _escribir(_archivo, _estado())
+
+
+def _terminado(archivo):
+    """¿El proceso que escribió `archivo` (<pid>-<inicio>.json) ya no existe?"""
+    try:
+        pid = int(archivo.stem.split("-", 1)[0])
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def compactar():
+    """
+    Suma en HISTORICO los archivos de procesos terminados y los borra.
+    Devuelve cuántos se juntaron.
+    """
+    directorio = Path(settings.METRICAS_DIR)
+    if not directorio.is_dir():
+        return 0
+    historico = directorio / HISTORICO
+    with open(directorio / LOCK, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        terminados = []
+        total = {"contadores": {}, "histogramas": {}}
+        for archivo in directorio.glob("*.json"):
+            if archivo in (historico, _archivo) or not _terminado(archivo):
+                continue
+            try:
+                _sumar(total, json.loads(archivo.read_text()))
+            except (OSError, ValueError):
+                logger.warning("Métricas ilegibles en %s: no se compactan", archivo)
+                continue
+            terminados.append(archivo)
+        if not terminados:
+            return 0
+        if historico.exists():
+            _sumar(total, json.loads(historico.read_text()))
+        _escribir(historico, _serializar(total["contadores"], total["histogramas"]))
+        for archivo in terminados:
+            archivo.unlink(missing_ok=True)
+    return len(terminados)
+
+
+def _volcar_periodicamente():
+    pid = os.getpid()
+    try:
+        compactar()
+    except (OSError, ValueError):
+        logger.exception("No se pudieron compactar las métricas de procesos terminados")
+    while _pid == pid:
+        time.sleep(settings.METRICAS_VOLCADO_SEGUNDOS)
+        try:
+            volcar()
+        except OSError:
+            logger.exception("No se pudieron volcar las métricas")
+
+
+def _sumar(total, estado):
+    for nombre, etiquetas, valor in estado["contadores"]:
+        clave = (nombre, tuple(map(tuple, etiquetas)))
+        total["contadores"][clave] = total["contadores"].get(clave, 0) + valor
+    for nombre, etiquetas, cuentas in estado["histogramas"]:
+        clave = (nombre, tuple(map(tuple, etiquetas)))
+        acumulado = total["histogramas"].setdefault(clave, [0] * len(cuentas))
+        for i, c in enumerate(cuentas):
+            acumulado[i] += c
+
+
+def agregado():
+    """
+    Suma de todos los procesos (archivos + memoria de este proceso). Sin
+    volcado habilitado (tests, comandos) es solo la memoria del proceso.
+    """
+    _proceso()
+    total = {"contadores": {}, "histogramas": {}}
+    directorio = Path(settings.METRICAS_DIR)
+    if _archivo is not None and directorio.is_dir():
+        # Compartido con otros lectores, excluyente con compactar()
+        with open(directorio / LOCK, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            for archivo in directorio.glob("*.json"):
+                if archivo == _archivo:
+                    continue
+                try:
+                    _sumar(total, json.loads(archivo.read_text()))
+                except (OSError, ValueError):
+                    continue  # archivo ilegible: se saltea, como en compactar()
+    _sumar(total, _estado())
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formato_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def exposicion():
+    """Texto en el formato de exposición de Prometheus."""
+    total = agregado()
+    lineas = []
+    for nombre, (tipo, ayuda) in METRICAS.items():
+        completo = PREFIJO + nombre
+        lineas.append(f"# HELP {completo} {ayuda}")
+        lineas.append(f"# TYPE {completo} {tipo}")
+        if tipo == "counter":
+            for (n, etiquetas), valor in sorted(total["contadores"].items()):
+                if n == nombre:
+                    lineas.append(f"{completo}{_formato_etiquetas(etiquetas)} {valor}")
+            continue
+        for (n, etiquetas), cuentas in sorted(total["histogramas"].items()):
+            if n != nombre:
+                continue
+            acumulado = 0
+            for limite, c in zip(BUCKETS + ("+Inf",), cuentas):
+                acumulado += c
+                lineas.append(
+                    f"{completo}_bucket{_formato_etiquetas(etiquetas, [('le', limite)])} {acumulado}"
+                )
+            lineas.append(f"{completo}_sum{_formato_etiquetas(etiquetas)} {cuentas[-1]}")
+            lineas.append(f"{completo}_count{_formato_etiquetas(etiquetas)} {acumulado}")
+    return "\n".join(lineas) + "\n"
+
+
+atexit.register(volcar)
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 04:57
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_alter_producto_plataforma'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='producto_nombre_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock', 'id'], name='producto_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['valor', 'id'], name='producto_valor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['plataforma', 'id'], name='producto_plataforma_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-19 05:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_inicial(apps, schema_editor):
+    """Punto de partida del historial: el stock actual de cada producto."""
+    Producto = apps.get_model("store", "Producto")
+    SnapshotStock = apps.get_model("store", "SnapshotStock")
+    ahora = django.utils.timezone.now()
+    SnapshotStock.objects.bulk_create(
+        [
+            SnapshotStock(producto_id=producto_id, stock=stock, tomado_en=ahora)
+            for producto_id, stock in Producto.objects.values_list("id", "stock")
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_producto_indices_panel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('CREACION', 'Creación'), ('EDICION', 'Edición'), ('AJUSTE', 'Ajuste masivo'), ('VENTA', 'Venta'), ('IMPORTACION', 'Importación')], max_length=12)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='store.producto')),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['producto', 'creado_en'], name='movimiento_producto_fecha_idx'), models.Index(fields=['creado_en'], name='movimiento_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('tomado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='store.producto')),
+            ],
+            options={
+                'ordering': ['-tomado_en'],
+                'indexes': [models.Index(fields=['producto', 'tomado_en'], name='snapshot_producto_fecha_idx'), models.Index(fields=['tomado_en'], name='snapshot_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-19 05:30
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def construir_resumen(apps, schema_editor):
+    Producto = apps.get_model("store", "Producto")
+    ResumenStock = apps.get_model("store", "ResumenStock")
+    umbral = settings.STOCK_BAJO_UMBRAL
+    filas = (
+        Producto.objects.values("plataforma", "formato")
+        .annotate(
+            total=Count("id"),
+            sin_stock=Count("id", filter=Q(stock=0)),
+            bajo_stock=Count("id", filter=Q(stock__gt=0, stock__lte=umbral)),
+        )
+        .order_by()
+    )
+    ResumenStock.objects.bulk_create(
+        [ResumenStock(umbral=umbral, **fila) for fila in filas]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_historial_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plataforma', models.CharField(choices=[('PS3', 'PS3'), ('PS4', 'PS4'), ('PS5', 'PS5')], max_length=10)),
+                ('formato', models.CharField(choices=[('FISICO', 'Físico'), ('DIGITAL', 'Digital')], max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('sin_stock', models.IntegerField(default=0)),
+                ('bajo_stock', models.IntegerField(default=0)),
+                ('umbral', models.PositiveIntegerField()),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['plataforma', 'formato'],
+                'constraints': [models.UniqueConstraint(fields=('plataforma', 'formato'), name='unique_resumen_stock_plataforma_formato')],
+            },
+        ),
+        migrations.RunPython(construir_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-19 05:45
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+from store.models import FORMATO_CHOICES, ESTADO_CHOICES
+
+
+def construir_vista(apps, schema_editor):
+    Producto = apps.get_model("store", "Producto")
+    Genero = apps.get_model("store", "Genero")
+    ProductoVista = apps.get_model("store", "ProductoVista")
+
+    formatos = dict(FORMATO_CHOICES)
+    estados = dict(ESTADO_CHOICES)
+    nombres = dict(Genero.objects.values_list("id", "nombre"))
+    generos_por_producto = {}
+    for producto_id, genero_id in Producto.generos.through.objects.values_list(
+        "producto_id", "genero_id"
+    ):
+        generos_por_producto.setdefault(producto_id, []).append(nombres[genero_id])
+
+    def fila(p):
+        nombres_generos = sorted(generos_por_producto.get(p.id, []))
+        return ProductoVista(
+            producto_id=p.id,
+            nombre=p.nombre,
+            anio_lanzamiento=p.anio_lanzamiento,
+            anio=p.anio_lanzamiento.year,
+            plataforma=p.plataforma,
+            formato=p.formato,
+            formato_display=formatos.get(p.formato, p.formato),
+            estado=p.estado,
+            estado_display=estados.get(p.estado, p.estado),
+            generos=nombres_generos,
+            generos_texto=", ".join(nombres_generos),
+            descripcion=p.descripcion,
+            descripcion_corta=Truncator(p.descripcion or "Sin descripción.").chars(90),
+            valor=p.valor,
+            stock=p.stock,
+            imagen_url=default_storage.url(p.imagen.name) if p.imagen else "",
+            creado_en=p.creado_en,
+            actualizado_en=p.actualizado_en,
+        )
+
+    ProductoVista.objects.bulk_create(
+        (fila(p) for p in Producto.objects.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_resumen_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoVista',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vista', serialize=False, to='store.producto')),
+                ('nombre', models.CharField(max_length=150)),
+                ('anio_lanzamiento', models.DateField()),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('plataforma', models.CharField(max_length=10)),
+                ('formato', models.CharField(max_length=10)),
+                ('formato_display', models.CharField(max_length=20)),
+                ('estado', models.CharField(max_length=10)),
+                ('estado_display', models.CharField(max_length=20)),
+                ('generos', models.JSONField(default=list)),
+                ('generos_texto', models.TextField(blank=True)),
+                ('descripcion', models.TextField(blank=True)),
+                ('descripcion_corta', models.CharField(max_length=100)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.PositiveIntegerField()),
+                ('imagen_url', models.CharField(blank=True, max_length=255)),
+                ('creado_en', models.DateTimeField()),
+                ('actualizado_en', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['-creado_en'], name='vista_creado_idx')],
+            },
+        ),
+        migrations.RunPython(construir_vista, migrations.RunPython.noop),
+    ]
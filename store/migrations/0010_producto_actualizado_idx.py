@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_producto_vista'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['actualizado_en'], name='producto_actualizado_idx'),
+        ),
+    ]
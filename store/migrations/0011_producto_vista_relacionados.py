@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_producto_actualizado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productovista',
+            name='relacionados',
+            field=models.JSONField(default=list),
+        ),
+    ]
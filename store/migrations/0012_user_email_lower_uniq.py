@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-19 07:40
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def comprobar_correos_duplicados(apps, schema_editor):
+    """
+    El índice no se puede crear si ya hay correos repetidos (sin distinguir
+    mayúsculas). Aquí no se puede elegir qué cuenta conservar: se detiene
+    la migración con la lista para corregirlos a mano.
+    """
+    User = apps.get_model("auth", "User")
+    repetidos = (
+        User.objects.exclude(email="")
+        .values(correo=Lower("email"))
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .order_by("correo")
+    )
+    if not repetidos:
+        return
+    detalle = []
+    for fila in repetidos:
+        ids = (
+            User.objects.alias(correo=Lower("email"))
+            .filter(correo=fila["correo"])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        detalle.append(f"  {fila['correo']}: usuarios {', '.join(str(i) for i in ids)}")
+    raise RuntimeError(
+        "Hay usuarios que comparten correo (sin distinguir mayúsculas) y no se "
+        "puede crear el índice único auth_user_email_lower_uniq. Cambia o vacía "
+        "el correo de las cuentas sobrantes y vuelve a ejecutar migrate:\n"
+        + "\n".join(detalle)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('store', '0011_producto_vista_relacionados'),
+    ]
+
+    operations = [
+        migrations.RunPython(comprobar_correos_duplicados, migrations.RunPython.noop),
+        # Índice funcional sobre la tabla de contrib.auth: el correo es único
+        # sin distinguir mayúsculas y se busca por índice (ver
+        # store/autenticacion.py). NULLIF deja fuera a los usuarios sin correo.
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_lower_uniq ON auth_user (NULLIF(LOWER(email), ''))",
+            "DROP INDEX auth_user_email_lower_uniq",
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 09:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_user_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilSolicitud',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vista', models.CharField(blank=True, max_length=100)),
+                ('metodo', models.CharField(max_length=10)),
+                ('ruta', models.CharField(max_length=500)),
+                ('parametros', models.JSONField(default=dict)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('duracion_ms', models.FloatField()),
+                ('consultas', models.PositiveIntegerField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('modo', models.CharField(choices=[('cprofile', 'cProfile'), ('muestreo', 'Muestreo de pila')], max_length=10)),
+                ('funciones', models.JSONField(default=list)),
+                ('consultas_sql', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-duracion_ms'],
+                'indexes': [models.Index(fields=['-duracion_ms'], name='perfil_duracion_idx'), models.Index(fields=['vista', '-duracion_ms'], name='perfil_vista_duracion_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 10:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_perfilsolicitud'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=40, unique=True)),
+                ('sql', models.TextField()),
+                ('alias', models.CharField(max_length=50)),
+                ('plan', models.TextField(blank=True)),
+                ('veces', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('sql_ejemplo', models.TextField()),
+                ('parametros', models.JSONField(default=list)),
+                ('vista', models.CharField(blank=True, max_length=100)),
+                ('pila', models.TextField(blank=True)),
+                ('primera_vez', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultima_vez', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-total_ms'],
+                'indexes': [models.Index(fields=['-total_ms'], name='consulta_lenta_total_idx')],
+            },
+        ),
+    ]
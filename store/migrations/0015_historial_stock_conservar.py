@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-19 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_datos_producto(apps, schema_editor):
+    """Completa nombre y plataforma de los movimientos ya registrados."""
+    MovimientoStock = apps.get_model("store", "MovimientoStock")
+    Producto = apps.get_model("store", "Producto")
+    producto = Producto.objects.filter(pk=OuterRef("producto_id"))
+    MovimientoStock.objects.update(
+        producto_nombre=Subquery(producto.values("nombre")[:1]),
+        plataforma=Subquery(producto.values("plataforma")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_consultalenta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientostock',
+            name='plataforma',
+            field=models.CharField(choices=[('PS3', 'PS3'), ('PS4', 'PS4'), ('PS5', 'PS5')], default='', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='movimientostock',
+            name='producto_nombre',
+            field=models.CharField(default='', max_length=150),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_datos_producto, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='producto',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='store.producto'),
+        ),
+        migrations.AlterField(
+            model_name='snapshotstock',
+            name='producto',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots', to='store.producto'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+def cargar_ids(apps, schema_editor):
+    Producto = apps.get_model("store", "Producto")
+    ResumenStock = apps.get_model("store", "ResumenStock")
+    for fila in ResumenStock.objects.all():
+        productos = Producto.objects.filter(plataforma=fila.plataforma, formato=fila.formato).order_by("id")
+        fila.ids_sin_stock = list(productos.filter(stock=0).values_list("id", flat=True))
+        fila.ids_bajo_stock = list(
+            productos.filter(stock__gt=0, stock__lte=fila.umbral).values_list("id", flat=True)
+        )
+        fila.save(update_fields=["ids_sin_stock", "ids_bajo_stock"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_historial_stock_conservar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumenstock',
+            name='ids_bajo_stock',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='resumenstock',
+            name='ids_sin_stock',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(cargar_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_resumen_stock_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='motivo',
+            field=models.CharField(choices=[('CREACION', 'Creación'), ('EDICION', 'Edición'), ('AJUSTE', 'Ajuste masivo'), ('VENTA', 'Venta'), ('IMPORTACION', 'Importación'), ('BAJA', 'Baja del producto')], max_length=12),
+        ),
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='producto',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='store.producto'),
+        ),
+        migrations.AlterField(
+            model_name='snapshotstock',
+            name='producto',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='snapshots', to='store.producto'),
+        ),
+    ]
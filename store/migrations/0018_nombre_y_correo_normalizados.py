@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+def llenar_nombre_minusculas(apps, schema_editor):
+    """Pasa los nombres a minúsculas en Python (LOWER() de SQLite solo cambia ASCII)."""
+    Producto = apps.get_model("store", "Producto")
+    lote = []
+    for producto in Producto.objects.only("id", "nombre").iterator(chunk_size=2000):
+        producto.nombre_minusculas = producto.nombre.lower()
+        lote.append(producto)
+        if len(lote) >= 2000:
+            Producto.objects.bulk_update(lote, ["nombre_minusculas"])
+            lote = []
+    if lote:
+        Producto.objects.bulk_update(lote, ["nombre_minusculas"])
+
+
+def normalizar_correos(apps, schema_editor):
+    """
+    Guarda los correos ya normalizados (store.autenticacion.normalizar_correo).
+    Si dos cuentas quedarían con el mismo correo (p. ej. "ÑANDÚ@x.cl" y
+    "ñandú@x.cl", distintos para el LOWER() de SQLite) se detiene la
+    migración con la lista, como en 0012.
+    """
+    User = apps.get_model("auth", "User")
+    por_correo = {}
+    cambios = []
+    for user_id, email in User.objects.exclude(email="").order_by("id").values_list("id", "email"):
+        normalizado = email.strip().lower()
+        por_correo.setdefault(normalizado, []).append(user_id)
+        if normalizado != email:
+            cambios.append((user_id, normalizado))
+
+    repetidos = {correo: ids for correo, ids in por_correo.items() if len(ids) > 1}
+    if repetidos:
+        detalle = [
+            f"  {correo}: usuarios {', '.join(str(i) for i in ids)}"
+            for correo, ids in sorted(repetidos.items())
+        ]
+        raise RuntimeError(
+            "Hay usuarios que comparten correo (sin distinguir mayúsculas) y no se "
+            "pueden normalizar. Cambia o vacía el correo de las cuentas sobrantes y "
+            "vuelve a ejecutar migrate:\n" + "\n".join(detalle)
+        )
+    for user_id, normalizado in cambios:
+        User.objects.filter(pk=user_id).update(email=normalizado)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('store', '0017_historial_stock_baja'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='producto_nombre_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='nombre_minusculas',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(llenar_nombre_minusculas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre_minusculas'], name='producto_nombre_min_idx'),
+        ),
+        migrations.RunPython(normalizar_correos, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ import datetime
 from decimal import Decimal
 
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -43,6 +44,11 @@ class Producto(models.Model):
         verbose_name="Nombre del juego",
     )
 
+    # Nombre en minúsculas para la búsqueda por prefijo del panel. Se calcula
+    # en Python al guardar: LOWER() de SQLite solo cambia letras ASCII
+    # ("Ñandú" quedaría igual). Quien use bulk_create tiene que llenarlo.
+    nombre_minusculas = models.CharField(max_length=150, editable=False, default="")
+
     # Usamos DateField pero solo nos importa el año
     anio_lanzamiento = models.DateField(
         verbose_name="Año de lanzamiento",
@@ -117,10 +123,46 @@ class Producto(models.Model):
                 name="unique_producto_por_plataforma_formato_estado",
             )
         ]
+        # Índices para búsqueda / orden / filtro "bajo stock" en el panel.
+        # El id al final mantiene el orden estable al paginar.
+        indexes = [
+            models.Index(fields=["nombre_minusculas"], name="producto_nombre_min_idx"),
+            models.Index(fields=["stock", "id"], name="producto_stock_idx"),
+            models.Index(fields=["valor", "id"], name="producto_valor_idx"),
+            models.Index(fields=["plataforma", "id"], name="producto_plataforma_idx"),
+            # Max(actualizado_en) para el ETag del catálogo
+            models.Index(fields=["actualizado_en"], name="producto_actualizado_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.nombre} ({self.plataforma})"
 
+    def save(self, *args, **kwargs):
+        self.nombre_minusculas = self.nombre.lower()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "nombre" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "nombre_minusculas"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stock / clasificación tal como se leyeron de la BD: permiten registrar
+        # el movimiento y actualizar el resumen de stock al guardar sin volver
+        # a consultar la fila.
+        instance._stock_cargado = instance.__dict__.get("stock")
+        instance._clasificacion_cargada = (
+            instance.__dict__.get("plataforma"),
+            instance.__dict__.get("formato"),
+        )
+        # Lo que usan las recomendaciones (ver store.recomendaciones)
+        instance._recomendacion_cargada = (
+            instance.__dict__.get("nombre"),
+            instance.__dict__.get("plataforma"),
+            instance.__dict__.get("valor"),
+        )
+        return instance
+
     # ---- Validación de negocio extra (a nivel de modelo) ----
     def clean(self):
         """
@@ -167,3 +209,244 @@ class Producto(models.Model):
 
             raise ValidationError({"valor": "El precio debe ser mayor a 0."})
 
+
+
+# ---------------------------------------------------------------------------
+#  Historial de stock (libro de movimientos + snapshots)
+# ---------------------------------------------------------------------------
+MOTIVO_MOVIMIENTO_CHOICES = [
+    ("CREACION", "Creación"),
+    ("EDICION", "Edición"),
+    ("AJUSTE", "Ajuste masivo"),
+    ("VENTA", "Venta"),
+    ("IMPORTACION", "Importación"),
+    ("BAJA", "Baja del producto"),
+]
+
+
+class MovimientoStock(models.Model):
+    """
+    Movimiento de stock (solo se agregan filas, nunca se modifican).
+    `delta` es positivo para entradas y negativo para salidas.
+
+    Borrar un producto no borra sus movimientos: se registra una BAJA por el
+    stock que tenía y `producto_id` se conserva (sin restricción en la BD),
+    así los reportes siguen sumando su historial con el nombre y la
+    plataforma copiados al registrar cada movimiento.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="movimientos",
+    )
+    producto_nombre = models.CharField(max_length=150)
+    plataforma = models.CharField(max_length=10, choices=PLATAFORMA_CHOICES)
+    delta = models.IntegerField()
+    motivo = models.CharField(max_length=12, choices=MOTIVO_MOVIMIENTO_CHOICES)
+    creado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["producto", "creado_en"], name="movimiento_producto_fecha_idx"),
+            models.Index(fields=["creado_en"], name="movimiento_fecha_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.producto_id}: {self.delta:+d} ({self.motivo})"
+
+
+class SnapshotStock(models.Model):
+    """
+    Stock de un producto en un instante. Sirve de punto de partida para
+    calcular el stock histórico sin sumar todo el libro de movimientos:
+    stock(fecha) = último snapshot <= fecha + movimientos posteriores.
+    Como los movimientos, se conservan (con su `producto_id`) al borrar el
+    producto.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="snapshots",
+    )
+    stock = models.PositiveIntegerField()
+    tomado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-tomado_en"]
+        indexes = [
+            models.Index(fields=["producto", "tomado_en"], name="snapshot_producto_fecha_idx"),
+            models.Index(fields=["tomado_en"], name="snapshot_fecha_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.producto_id}: {self.stock} @ {self.tomado_en:%Y-%m-%d %H:%M}"
+
+
+class ResumenStock(models.Model):
+    """
+    Resumen de disponibilidad por plataforma/formato, mantenido de forma
+    incremental en cada cambio de stock (ver store.inventario).
+
+    - sin_stock: productos con stock 0.
+    - bajo_stock: productos con 0 < stock <= umbral.
+
+    ids_sin_stock / ids_bajo_stock guardan los IDs de esos productos (los
+    usa "ocultar agotados" del catálogo).
+    """
+
+    plataforma = models.CharField(max_length=10, choices=PLATAFORMA_CHOICES)
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    total = models.IntegerField(default=0)
+    sin_stock = models.IntegerField(default=0)
+    bajo_stock = models.IntegerField(default=0)
+    ids_sin_stock = models.JSONField(default=list)
+    ids_bajo_stock = models.JSONField(default=list)
+    umbral = models.PositiveIntegerField()
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["plataforma", "formato"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["plataforma", "formato"],
+                name="unique_resumen_stock_plataforma_formato",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.plataforma} / {self.formato}: {self.sin_stock} sin stock, {self.bajo_stock} bajo"
+
+
+class ProductoVista(models.Model):
+    """
+    Proyección plana de Producto para el catálogo (modelo de lectura).
+
+    Guarda exactamente lo que muestran las tarjetas de home.html y lo que se
+    envía a Firestore, ya resuelto (nombres de géneros, textos de los
+    choices, URL de la imagen). Se mantiene al escribir (ver store.catalogo
+    y store/signals.py) y el catálogo la lee con .values(), sin instanciar
+    modelos ni consultar géneros.
+
+    Las columnas de la tarjeta (anio, generos_texto, descripcion_corta) van
+    ya formateadas: convertir fechas y JSON por fila es lo que más cuesta
+    al leer miles de filas.
+    """
+
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="vista",
+    )
+    nombre = models.CharField(max_length=150)
+    anio_lanzamiento = models.DateField()
+    anio = models.PositiveSmallIntegerField()
+    plataforma = models.CharField(max_length=10)
+    formato = models.CharField(max_length=10)
+    formato_display = models.CharField(max_length=20)
+    estado = models.CharField(max_length=10)
+    estado_display = models.CharField(max_length=20)
+    generos = models.JSONField(default=list)
+    generos_texto = models.TextField(blank=True)
+    descripcion = models.TextField(blank=True)
+    descripcion_corta = models.CharField(max_length=100)
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.PositiveIntegerField()
+    imagen_url = models.CharField(max_length=255, blank=True)
+    creado_en = models.DateTimeField()
+    actualizado_en = models.DateTimeField()
+    # [{id, nombre}] precalculados por store.recomendaciones
+    relacionados = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["-creado_en"], name="vista_creado_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.nombre} ({self.plataforma})"
+
+
+class PerfilSolicitud(models.Model):
+    """
+    Perfil de un request lento o muestreado (ver store.perfiles): qué
+    funciones ocuparon el tiempo y qué consultas hizo.
+
+    funciones: [{funcion, llamadas, propio_ms, acumulado_ms}] de mayor a
+    menor tiempo acumulado (llamadas es None en el modo "muestreo", donde
+    los tiempos se estiman contando muestras de la pila).
+    consultas_sql: [{sql, ms}] en el orden en que se ejecutaron.
+    """
+
+    MODO_CHOICES = [
+        ("cprofile", "cProfile"),
+        ("muestreo", "Muestreo de pila"),
+    ]
+
+    creado_en = models.DateTimeField(default=timezone.now)
+    vista = models.CharField(max_length=100, blank=True)
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=500)
+    parametros = models.JSONField(default=dict)
+    status = models.PositiveSmallIntegerField()
+    duracion_ms = models.FloatField()
+    consultas = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    modo = models.CharField(max_length=10, choices=MODO_CHOICES)
+    funciones = models.JSONField(default=list)
+    consultas_sql = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ["-duracion_ms"]
+        indexes = [
+            models.Index(fields=["-duracion_ms"], name="perfil_duracion_idx"),
+            models.Index(fields=["vista", "-duracion_ms"], name="perfil_vista_duracion_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.metodo} {self.ruta} ({self.duracion_ms:.0f} ms)"
+
+
+class ConsultaLenta(models.Model):
+    """
+    Consultas que superaron CONSULTAS_LENTAS_UMBRAL_MS, agrupadas por huella
+    (SQL normalizado). Ver store.consultas_lentas.
+
+    El plan se captura la primera vez que aparece la huella; sql_ejemplo,
+    parametros, vista y pila son los de la última vez.
+    """
+
+    huella = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    alias = models.CharField(max_length=50)
+    plan = models.TextField(blank=True)
+    veces = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    sql_ejemplo = models.TextField()
+    parametros = models.JSONField(default=list)
+    vista = models.CharField(max_length=100, blank=True)
+    pila = models.TextField(blank=True)
+    primera_vez = models.DateTimeField(default=timezone.now)
+    ultima_vez = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-total_ms"]
+        indexes = [
+            models.Index(fields=["-total_ms"], name="consulta_lenta_total_idx"),
+        ]
+
+    @property
+    def promedio_ms(self):
+        return self.total_ms / self.veces if self.veces else 0
+
+    def __str__(self) -> str:
+        return f"{self.sql[:80]} ({self.veces} veces)"
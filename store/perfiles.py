@@ -0,0 +1,270 @@
+# store/perfiles.py
+"""
+Perfiles de requests lentos, opt-in (panel/perfiles/).
+
+Dos modos, que se pueden activar juntos:
+
+- PERFILES_MUESTREO (fracción, p. ej. 0.01): ese porcentaje de requests
+  corre con cProfile y se guarda siempre. Perfil exacto, pero cProfile
+  frena bastante el request medido.
+- PERFILES_UMBRAL_MS: todos los requests se muestrean con un hilo que mira
+  la pila del hilo del request cada PERFILES_INTERVALO_MS (costo casi nulo)
+  y se guardan solo los que tardan más que el umbral. Los tiempos por
+  función son estimados (muestras x intervalo).
+
+Con cada perfil se guardan la URL, los parámetros GET (los filtros del
+catálogo), el status y el log de consultas (store.instrumentacion), en
+PerfilSolicitud. Se escribe en un hilo aparte, fuera del request, y se
+conservan los últimos PERFILES_MAXIMO. PERFILES_VISTAS limita los nombres de
+URL que se guardan (vacío = todas).
+
+Bajo ASGI las vistas async corren en el hilo del event loop: el perfil de un
+request incluye lo que hicieron en ese lapso los otros requests del loop, y
+no incluye lo que corrió en hilos de sync_to_async.
+"""
+import cProfile
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from . import instrumentacion
+from .models import PerfilSolicitud
+
+logger = logging.getLogger(__name__)
+
+FUNCIONES_MAXIMO = 40
+CONSULTAS_MAXIMO = 200
+SQL_LARGO_MAXIMO = 2000
+PROFUNDIDAD_MAXIMA = 60
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="perfiles")
+
+
+# ---------------------------------------------------------------------------
+#  Muestreo de pila
+# ---------------------------------------------------------------------------
+class Muestreador:
+    """
+    Un solo hilo para todo el proceso: cada intervalo toma la pila de los
+    hilos con un request registrado y la suma a la Counter de ese request.
+    Sin requests registrados el hilo duerme en una condición (no se
+    despierta cada intervalo) hasta que llega el próximo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hay_activos = threading.Condition(self._lock)
+        self._activos = {}  # id(muestras) -> (thread_id, Counter de pilas)
+        self._hilo = None
+
+    def registrar(self):
+        muestras = Counter()
+        with self._lock:
+            self._activos[id(muestras)] = (threading.get_ident(), muestras)
+            self._hay_activos.notify()
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._correr, daemon=True, name="perfiles-muestreo")
+                self._hilo.start()
+        return muestras
+
+    def quitar(self, muestras):
+        with self._lock:
+            self._activos.pop(id(muestras), None)
+
+    def _correr(self):
+        while True:
+            with self._hay_activos:
+                self._hay_activos.wait_for(lambda: self._activos)
+            time.sleep(settings.PERFILES_INTERVALO_MS / 1000)
+            with self._lock:
+                activos = list(self._activos.values())
+            if not activos:
+                continue
+            frames = sys._current_frames()
+            for thread_id, muestras in activos:
+                frame = frames.get(thread_id)
+                pila = []
+                while frame is not None and len(pila) < PROFUNDIDAD_MAXIMA:
+                    codigo = frame.f_code
+                    pila.append(f"{codigo.co_filename}:{codigo.co_firstlineno}({codigo.co_name})")
+                    frame = frame.f_back
+                if pila:
+                    muestras[tuple(pila)] += 1
+
+
+muestreador = Muestreador()
+
+
+def funciones_de_muestras(muestras):
+    """Top de funciones a partir de las pilas muestreadas (la primera es la interna)."""
+    intervalo = settings.PERFILES_INTERVALO_MS
+    propio, acumulado = Counter(), Counter()
+    # El hilo de muestreo puede sumar una muestra más mientras se copia
+    for pila, n in list(muestras.items()):
+        propio[pila[0]] += n
+        for funcion in set(pila):
+            acumulado[funcion] += n
+    return [
+        {
+            "funcion": funcion,
+            "llamadas": None,
+            "propio_ms": propio[funcion] * intervalo,
+            "acumulado_ms": n * intervalo,
+        }
+        for funcion, n in acumulado.most_common(FUNCIONES_MAXIMO)
+    ]
+
+
+def funciones_de_cprofile(perfil):
+    stats = pstats.Stats(perfil).stats
+    filas = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "funcion": f"{archivo}:{linea}({nombre})",
+            "llamadas": llamadas,
+            "propio_ms": round(propio * 1000, 3),
+            "acumulado_ms": round(acumulado * 1000, 3),
+        }
+        for (archivo, linea, nombre), (_, llamadas, propio, acumulado, _) in filas[:FUNCIONES_MAXIMO]
+    ]
+
+
+# ---------------------------------------------------------------------------
+#  Guardado
+# ---------------------------------------------------------------------------
+def _guardar(datos):
+    try:
+        PerfilSolicitud.objects.create(**datos)
+        sobrantes = PerfilSolicitud.objects.order_by("-creado_en").values_list("id", flat=True)[
+            settings.PERFILES_MAXIMO:
+        ]
+        PerfilSolicitud.objects.filter(id__in=list(sobrantes)).delete()
+    except Exception:
+        logger.exception("No se pudo guardar el perfil de %s", datos.get("ruta"))
+    finally:
+        connection.close()
+
+
+class _Perfil:
+    """Lo que se mide de un request mientras corre."""
+
+    __slots__ = ("inicio", "perfil", "muestras", "medicion")
+
+    def __init__(self, muestrear, umbral):
+        self.inicio = time.perf_counter()
+        self.perfil = self.muestras = None
+        self.medicion = instrumentacion.medicion_actual()
+        if self.medicion is not None:
+            self.medicion.consultas_sql = []
+        if muestrear:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+                self.perfil = perfil
+            except ValueError:
+                pass  # otro perfil activo en este hilo (requests async concurrentes)
+        if self.perfil is None and umbral:
+            self.muestras = muestreador.registrar()
+
+    def detener(self):
+        if self.perfil is not None:
+            self.perfil.disable()
+        if self.muestras is not None:
+            muestreador.quitar(self.muestras)
+        consultas_sql = None
+        if self.medicion is not None:
+            consultas_sql, self.medicion.consultas_sql = self.medicion.consultas_sql, None
+        return consultas_sql
+
+    def terminar(self, request, response):
+        consultas_sql = self.detener()
+        duracion_ms = (time.perf_counter() - self.inicio) * 1000
+        match = getattr(request, "resolver_match", None)
+        vista = (match.url_name or match.view_name) if match else ""
+        if settings.PERFILES_VISTAS and vista not in settings.PERFILES_VISTAS:
+            return
+        if self.perfil is None and (self.muestras is None or duracion_ms < settings.PERFILES_UMBRAL_MS):
+            return
+
+        datos = {
+            "vista": vista,
+            "metodo": request.method,
+            "ruta": request.path[:500],
+            "parametros": {k: request.GET.getlist(k) for k in request.GET},
+            "status": response.status_code,
+            "duracion_ms": round(duracion_ms, 1),
+            "modo": "cprofile" if self.perfil is not None else "muestreo",
+            "funciones": (
+                funciones_de_cprofile(self.perfil)
+                if self.perfil is not None
+                else funciones_de_muestras(self.muestras)
+            ),
+        }
+        if consultas_sql is not None:
+            datos["consultas"] = self.medicion.consultas
+            datos["db_ms"] = round(self.medicion.db_ms, 1)
+            datos["consultas_sql"] = [
+                {"sql": sql[:SQL_LARGO_MAXIMO], "ms": round(ms, 2)}
+                for sql, ms in consultas_sql[:CONSULTAS_MAXIMO]
+            ]
+        _pool.submit(_guardar, datos)
+
+
+# ---------------------------------------------------------------------------
+#  Middleware
+# ---------------------------------------------------------------------------
+class PerfilesMiddleware:
+    """
+    Perfila los requests según PERFILES_MUESTREO / PERFILES_UMBRAL_MS. Va
+    justo después de InstrumentacionMiddleware (usa su log de consultas).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _iniciar(self):
+        muestreo, umbral = settings.PERFILES_MUESTREO, settings.PERFILES_UMBRAL_MS
+        muestrear = muestreo > 0 and random.random() < muestreo
+        if not muestrear and not umbral:
+            return None
+        return _Perfil(muestrear, umbral)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        perfil = self._iniciar()
+        if perfil is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            perfil.detener()
+            raise
+        perfil.terminar(request, response)
+        return response
+
+    async def __acall__(self, request):
+        perfil = self._iniciar()
+        if perfil is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            perfil.detener()
+            raise
+        perfil.terminar(request, response)
+        return response
@@ -0,0 +1,250 @@
+# store/recomendaciones.py
+"""
+Productos relacionados ("también te puede gustar") para las tarjetas del
+catálogo.
+
+Se precalculan y se guardan en ProductoVista.relacionados ([{id, nombre}]),
+así el catálogo los lee en la misma fila que el resto de la tarjeta.
+
+Similitud entre dos productos:
+- géneros compartidos: coseno entre sus filas de la matriz producto × género
+  (binaria y dispersa: cada producto guarda su conjunto de géneros y cada
+  género la lista de sus productos);
+- misma plataforma;
+- cercanía de precio (1 - diferencia / precio mayor).
+
+Para no comparar todos contra todos, los candidatos de un producto son los
+CANDIDATOS_POR_GENERO vecinos por precio a cada lado en cada una de sus
+columnas (las columnas van ordenadas por valor).
+
+La matriz vive en memoria (por proceso). Se carga completa en un hilo
+aparte: al arrancar (JRBStore2/wsgi.py / asgi.py) o con el primer cambio, y
+de nuevo cuando pasaron MATRIZ_TTL segundos (para ver lo que cambiaron otros
+procesos). Las señales de Producto solo hacen la parte incremental
+(refrescar(), al confirmar la transacción): actualizan la matriz y recalculan el producto que cambió y
+sus candidatos, antes y después del cambio. Si la matriz todavía no está
+cargada, esos productos se recalculan cuando termina la carga.
+reconstruir() recalcula todo (comando reconstruir_recomendaciones).
+"""
+import bisect
+import heapq
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connections
+
+from .models import Producto, ProductoVista
+
+logger = logging.getLogger(__name__)
+
+RECOMENDACIONES_N = 4
+CANDIDATOS_POR_GENERO = 25
+PESO_GENEROS = 0.6
+PESO_PLATAFORMA = 0.25
+PESO_PRECIO = 0.15
+MATRIZ_TTL = 300
+GUARDAR_LOTE = 1000
+
+
+class Matriz:
+    def __init__(self):
+        self.datos = {}  # producto_id -> (nombre, plataforma, valor)
+        self.filas = {}  # producto_id -> frozenset(genero_ids)
+        self.columnas = {}  # genero_id -> [(valor, producto_id)] ordenada
+
+    @classmethod
+    def cargar(cls, producto_ids=None):
+        """Matriz de todos los productos, o solo de `producto_ids`."""
+        productos = Producto.objects.all()
+        pares = Producto.generos.through.objects.all()
+        if producto_ids is not None:
+            productos = productos.filter(id__in=producto_ids)
+            pares = pares.filter(producto_id__in=producto_ids)
+
+        matriz = cls()
+        generos_de = {}
+        for producto_id, genero_id in pares.values_list("producto_id", "genero_id").iterator(chunk_size=5000):
+            generos_de.setdefault(producto_id, set()).add(genero_id)
+        for producto_id, nombre, plataforma, valor in productos.values_list(
+            "id", "nombre", "plataforma", "valor"
+        ).iterator(chunk_size=5000):
+            matriz.datos[producto_id] = (nombre, plataforma, float(valor))
+            matriz.filas[producto_id] = frozenset(generos_de.get(producto_id, ()))
+        for producto_id, generos in matriz.filas.items():
+            valor = matriz.datos[producto_id][2]
+            for genero_id in generos:
+                matriz.columnas.setdefault(genero_id, []).append((valor, producto_id))
+        for columna in matriz.columnas.values():
+            columna.sort()
+        return matriz
+
+    def poner(self, producto_id, datos, generos):
+        self.quitar(producto_id)
+        self.datos[producto_id] = datos
+        self.filas[producto_id] = generos
+        for genero_id in generos:
+            bisect.insort(self.columnas.setdefault(genero_id, []), (datos[2], producto_id))
+
+    def quitar(self, producto_id):
+        datos = self.datos.pop(producto_id, None)
+        if datos is None:
+            return
+        for genero_id in self.filas.pop(producto_id):
+            columna = self.columnas[genero_id]
+            i = bisect.bisect_left(columna, (datos[2], producto_id))
+            if i < len(columna) and columna[i][1] == producto_id:
+                del columna[i]
+
+    def candidatos(self, producto_id):
+        """Vecinos por precio en cada columna de géneros del producto."""
+        datos = self.datos.get(producto_id)
+        if datos is None:
+            return set()
+        encontrados = set()
+        for genero_id in self.filas[producto_id]:
+            columna = self.columnas[genero_id]
+            i = bisect.bisect_left(columna, (datos[2], producto_id))
+            inicio = max(0, i - CANDIDATOS_POR_GENERO)
+            encontrados.update(pid for _, pid in columna[inicio:i + CANDIDATOS_POR_GENERO + 1])
+        encontrados.discard(producto_id)
+        return encontrados
+
+    def puntajes(self, producto_id, candidatos):
+        """Similitud de `producto_id` con cada candidato, en un solo recorrido."""
+        generos = self.filas[producto_id]
+        _, plataforma, valor = self.datos[producto_id]
+        filas, datos = self.filas, self.datos
+        norma = math.sqrt(len(generos))
+        for pid in candidatos:
+            generos_b = filas[pid]
+            _, plataforma_b, valor_b = datos[pid]
+            mayor = max(valor, valor_b)
+            yield (
+                PESO_GENEROS * len(generos & generos_b) / (norma * math.sqrt(len(generos_b)))
+                + PESO_PLATAFORMA * (plataforma == plataforma_b)
+                + PESO_PRECIO * (1 - abs(valor - valor_b) / mayor if mayor else 1),
+                -pid,
+            )
+
+    def relacionados(self, producto_id, n=RECOMENDACIONES_N):
+        """Los `n` productos más parecidos, listos para la tarjeta."""
+        mejores = heapq.nlargest(n, self.puntajes(producto_id, self.candidatos(producto_id)))
+        return [{"id": -menos_pid, "nombre": self.datos[-menos_pid][0]} for _, menos_pid in mejores]
+
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recomendaciones")
+
+_lock = threading.Lock()
+_matriz = None  # Matriz cargada, o None si todavía no se cargó en este proceso
+_cargada_en = 0.0
+_cargando = False
+_tocados = set()  # ids refrescados mientras se carga la matriz
+
+
+def _programar_carga():
+    """Encola la carga completa (llamar con _lock tomado)."""
+    global _cargando
+    if _cargando:
+        return
+    _cargando = True
+    _tocados.clear()
+    _pool.submit(_cargar)
+
+
+def cargar_en_segundo_plano():
+    """Carga la matriz en un hilo aparte (warm-up al arrancar)."""
+    with _lock:
+        _programar_carga()
+
+
+def _cargar():
+    global _matriz, _cargada_en, _cargando
+    try:
+        matriz = Matriz.cargar()
+        # Lo que cambió mientras se leía: se vuelve a leer y, si la matriz no
+        # estaba cargada, se calculan sus relacionados ahora. Se repite hasta
+        # que no quede nada tocado y recién ahí se publica.
+        while True:
+            with _lock:
+                tocados = set(_tocados)
+                _tocados.clear()
+                if not tocados:
+                    _matriz, _cargada_en = matriz, time.monotonic()
+                    break
+            _aplicar(matriz, tocados)
+    except Exception:
+        logger.exception("No se pudo cargar la matriz de recomendaciones")
+    finally:
+        with _lock:
+            _cargando = False
+        connections.close_all()
+
+
+def _aplicar(matriz, producto_ids):
+    """
+    Pone en la matriz el estado actual de `producto_ids` y guarda los
+    relacionados de los afectados. Las consultas van fuera de _lock: el lock
+    solo cubre los cambios en memoria y el cálculo sobre la matriz.
+    """
+    nuevos = Matriz.cargar(producto_ids)
+    with _lock:
+        afectados = set(producto_ids)
+        for producto_id in producto_ids:
+            afectados |= matriz.candidatos(producto_id)
+        for producto_id in producto_ids:
+            if producto_id in nuevos.datos:
+                matriz.poner(producto_id, nuevos.datos[producto_id], nuevos.filas[producto_id])
+            else:
+                matriz.quitar(producto_id)
+            afectados |= matriz.candidatos(producto_id)
+        filas = _relacionados(matriz, afectados)
+    _guardar(filas)
+
+
+def _relacionados(matriz, producto_ids):
+    """[(producto_id, relacionados)] de los que siguen en la matriz."""
+    return [(pid, matriz.relacionados(pid)) for pid in sorted(producto_ids) if pid in matriz.datos]
+
+
+def _guardar(filas):
+    filas = iter(filas)
+    while lote := list(islice(filas, GUARDAR_LOTE)):
+        ProductoVista.objects.bulk_update(
+            [ProductoVista(producto_id=pid, relacionados=relacionados) for pid, relacionados in lote],
+            ["relacionados"],
+        )
+
+
+def refrescar(producto_ids):
+    """
+    Actualiza la matriz con el estado actual de `producto_ids` (o los quita
+    si ya no existen) y recalcula sus relacionados y los de sus candidatos.
+    Nunca carga la matriz completa: si falta o venció, la carga se programa
+    en segundo plano.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return
+    with _lock:
+        if _matriz is None or time.monotonic() - _cargada_en > MATRIZ_TTL:
+            _programar_carga()
+        if _cargando:
+            _tocados.update(producto_ids)
+        matriz = _matriz
+    if matriz is not None:
+        _aplicar(matriz, producto_ids)
+
+
+def reconstruir():
+    """Recalcula los relacionados de todo el catálogo. Devuelve cuántos."""
+    global _matriz, _cargada_en
+    matriz = Matriz.cargar()
+    with _lock:
+        _matriz, _cargada_en = matriz, time.monotonic()
+        filas = _relacionados(matriz, matriz.datos)
+    _guardar(filas)
+    return len(filas)
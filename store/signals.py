@@ -1,7 +1,11 @@
 import logging
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Producto
+from .models import Producto, MovimientoStock, Genero
+from . import inventario, generos, catalogo, busqueda, recomendaciones, sincronizacion, metricas
+from .autenticacion import normalizar_correo
+import firebase_app
 from firebase_app import get_db
 from django.contrib.auth.models import User
 
@@ -10,40 +14,47 @@ logger = logging.getLogger(__name__)
 
 
 def producto_to_doc(producto: Producto) -> dict:
-    generos = list(producto.generos.values_list("nombre", flat=True))
-    fecha_lanzamiento = (
-        producto.anio_lanzamiento.isoformat()
-        if producto.anio_lanzamiento
-        else None
-    )
-    imagen_url = producto.imagen.url if producto.imagen else None
+    # Los nombres salen de la caché de géneros; si el producto no viene
+    # anotado (anotar_generos) solo se consulta la tabla intermedia.
+    nombres_generos = getattr(producto, "nombres_generos", None)
+    if nombres_generos is None:
+        ids = generos.ids_por_producto([producto.pk]).get(producto.pk, ())
+        nombres_generos = generos.nombres_de(ids)
 
+    # Misma fila que la proyección del catálogo (ProductoVista)
+    fila = catalogo.fila_vista(producto, nombres_generos)
     return {
-        "nombre": producto.nombre,
-        "anio_lanzamiento": fecha_lanzamiento,
-        "plataforma": producto.plataforma,
-        "formato": producto.formato,
-        "estado": producto.estado,
-        "generos": generos,
-        "descripcion": producto.descripcion,
-        "valor": float(producto.valor),
-        "stock": producto.stock,
-        "imagen_url": imagen_url,
-        "creado_en": producto.creado_en.isoformat()
-        if producto.creado_en
+        "nombre": fila["nombre"],
+        "anio_lanzamiento": fila["anio_lanzamiento"].isoformat()
+        if fila["anio_lanzamiento"]
+        else None,
+        "plataforma": fila["plataforma"],
+        "formato": fila["formato"],
+        "estado": fila["estado"],
+        "generos": fila["generos"],
+        "descripcion": fila["descripcion"],
+        "valor": float(fila["valor"]),
+        "stock": fila["stock"],
+        "imagen_url": fila["imagen_url"] or None,
+        "creado_en": fila["creado_en"].isoformat()
+        if fila["creado_en"]
         else None,
-        "actualizado_en": producto.actualizado_en.isoformat()
-        if producto.actualizado_en
+        "actualizado_en": fila["actualizado_en"].isoformat()
+        if fila["actualizado_en"]
         else None,
     }
 
 
 @receiver(post_save, sender=Producto)
 def sync_producto_firestore(sender, instance: Producto, **kwargs):
+    # Sin Firebase (desactivado o circuito abierto) ni siquiera se arma el documento
+    if not firebase_app.disponible():
+        return
     try:
-        db = get_db()
-        doc_ref = db.collection("productos").document(str(instance.id))
-        doc_ref.set(producto_to_doc(instance), merge=True)
+        with metricas.sync_firestore("producto"), firebase_app.llamada():
+            db = get_db()
+            doc_ref = db.collection("productos").document(str(instance.id))
+            doc_ref.set(producto_to_doc(instance), merge=True)
     except Exception as e:
         # No rompemos la app, solo dejamos log
         logger.error(
@@ -53,11 +64,146 @@ def sync_producto_firestore(sender, instance: Producto, **kwargs):
         )
 
 
+@receiver(pre_save, sender=Producto)
+def cargar_stock_anterior(sender, instance: Producto, raw=False, **kwargs):
+    """
+    Instancia que no se leyó de la BD (o con el stock diferido): se lee el
+    estado previo de la fila para registrar el movimiento y el cambio en el
+    resumen. Es una consulta por clave primaria.
+    """
+    if raw or instance.pk is None:
+        return
+    if (
+        getattr(instance, "_stock_cargado", None) is not None
+        and None not in getattr(instance, "_clasificacion_cargada", (None, None))
+    ):
+        return
+    fila = (
+        Producto.objects.filter(pk=instance.pk)
+        .values_list("stock", "plataforma", "formato")
+        .first()
+    )
+    if fila is not None:
+        instance._stock_cargado = fila[0]
+        instance._clasificacion_cargada = fila[1:]
+
+
+@receiver(post_save, sender=Producto)
+def registrar_cambio_stock(sender, instance: Producto, created, raw=False, **kwargs):
+    """
+    En cada guardado (creación o edición):
+    - agrega al libro de movimientos la diferencia de stock;
+    - actualiza el resumen de stock (sin stock / bajo stock) de forma incremental.
+
+    Los ajustes masivos hacen lo mismo por su cuenta porque bulk_update no
+    dispara post_save.
+    """
+    if raw or not isinstance(instance.stock, int):
+        return
+
+    despues = (instance.pk, instance.plataforma, instance.formato, instance.stock)
+    if created:
+        anterior, antes = 0, None
+    else:
+        anterior = getattr(instance, "_stock_cargado", None)
+        plataforma, formato = getattr(instance, "_clasificacion_cargada", (None, None))
+        antes = (instance.pk, plataforma, formato, anterior)
+
+    if not created and (anterior is None or plataforma is None or formato is None):
+        # No se pudo leer el estado previo (cargar_stock_anterior): no hay
+        # movimiento que registrar y el resumen queda para
+        # reconstruir_resumen_stock.
+        logger.warning(
+            "Producto %s guardado sin estado previo: no se registra el movimiento de stock.",
+            instance.pk,
+        )
+    else:
+        delta = instance.stock - anterior
+        if delta:
+            MovimientoStock.objects.create(
+                producto=instance,
+                producto_nombre=instance.nombre,
+                plataforma=instance.plataforma,
+                delta=delta,
+                motivo="CREACION" if created else "EDICION",
+            )
+        inventario.registrar_cambios([(antes, despues)])
+
+    instance._stock_cargado = instance.stock
+    instance._clasificacion_cargada = (instance.plataforma, instance.formato)
+
+
+@receiver(post_delete, sender=Producto)
+def registrar_baja_stock(sender, instance: Producto, **kwargs):
+    """
+    Al borrar un producto su stock sale del libro con una BAJA, así el
+    historial sigue cuadrando (stock_en da 0 desde el borrado) y el reporte
+    de sell-through lo cuenta hasta esa fecha. Se registra aunque el stock
+    sea 0: es la marca de que el producto existió hasta ese momento.
+    """
+    if isinstance(instance.stock, int):
+        MovimientoStock.objects.create(
+            producto_id=instance.pk,
+            producto_nombre=instance.nombre,
+            plataforma=instance.plataforma,
+            delta=-instance.stock,
+            motivo="BAJA",
+        )
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_de_resumen_stock(sender, instance: Producto, **kwargs):
+    inventario.registrar_cambios(
+        [((instance.pk, instance.plataforma, instance.formato, instance.stock), None)]
+    )
+
+
+# Firestore admite como máximo 500 escrituras por batch
+FIRESTORE_BATCH_SIZE = 500
+
+
+def sync_productos_firestore(producto_ids):
+    """
+    Sincroniza varios productos con Firestore usando escrituras en batch
+    (una escritura por producto). Se usa en las actualizaciones masivas, que
+    no disparan post_save.
+    """
+    ids = list(dict.fromkeys(producto_ids))  # sin duplicados, mismo orden
+    if not ids or not firebase_app.disponible():
+        return
+
+    try:
+        with metricas.sync_firestore("productos_lote"), firebase_app.llamada():
+            db = get_db()
+            productos = generos.anotar_generos(Producto.objects.filter(id__in=ids))
+            batch = db.batch()
+            pendientes = 0
+            for producto in productos:
+                doc_ref = db.collection("productos").document(str(producto.id))
+                batch.set(doc_ref, producto_to_doc(producto), merge=True)
+                pendientes += 1
+                if pendientes == FIRESTORE_BATCH_SIZE:
+                    batch.commit()
+                    batch = db.batch()
+                    pendientes = 0
+            if pendientes:
+                batch.commit()
+    except Exception as e:
+        logger.error(
+            "Error al sincronizar %s productos con Firebase: %s",
+            len(ids),
+            str(e),
+        )
+
+
 @receiver(post_delete, sender=Producto)
 def delete_producto_firestore(sender, instance: Producto, **kwargs):
+    if not firebase_app.disponible():
+        return
     try:
-        db = get_db()
-        db.collection("productos").document(str(instance.id)).delete()
+        with metricas.sync_firestore("producto_borrado"), firebase_app.llamada():
+            db = get_db()
+            db.collection("productos").document(str(instance.id)).delete()
     except Exception as e:
         logger.error(
             "Error al eliminar producto %s de Firebase: %s",
@@ -65,26 +211,125 @@ def delete_producto_firestore(sender, instance: Producto, **kwargs):
             str(e),
         )
 
+
+@receiver(post_save, sender=Producto)
+def refrescar_vista_producto(sender, instance: Producto, raw=False, **kwargs):
+    if not raw:
+        catalogo.guardar([instance])
+
+
+def _refrescar_recomendaciones(producto_ids):
+    """
+    recomendaciones.refrescar al confirmar la transacción: si hay rollback la
+    matriz en memoria no se entera de un cambio que no quedó en la BD.
+    """
+    producto_ids = list(producto_ids)
+    transaction.on_commit(lambda: recomendaciones.refrescar(producto_ids))
+
+
+@receiver(post_save, sender=Producto)
+def refrescar_recomendaciones(sender, instance: Producto, created, raw=False, **kwargs):
+    # Después de refrescar_vista_producto: la fila de ProductoVista ya existe
+    if raw:
+        return
+    actual = (instance.nombre, instance.plataforma, instance.valor)
+    if created or getattr(instance, "_recomendacion_cargada", None) != actual:
+        _refrescar_recomendaciones([instance.pk])
+    instance._recomendacion_cargada = actual
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_de_recomendaciones(sender, instance: Producto, **kwargs):
+    _refrescar_recomendaciones([instance.pk])
+
+
+# Los índices de búsqueda se tocan al confirmar la transacción: si hay
+# rollback no quedan nombres que no existen en la BD.
+@receiver(post_save, sender=Producto)
+def actualizar_indice_busqueda(sender, instance: Producto, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: busqueda.actualizar(instance))
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_de_indice_busqueda(sender, instance: Producto, **kwargs):
+    producto_id = instance.pk  # delete() lo deja en None al terminar
+    transaction.on_commit(lambda: busqueda.quitar(producto_id))
+
+
+@receiver(m2m_changed, sender=Producto.generos.through)
+def refrescar_vista_generos(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # genero.producto_set.clear(): después ya no se sabe a qué productos afecta
+        instance._productos_afectados = list(
+            Producto.generos.through.objects.filter(genero_id=instance.pk)
+            .values_list("producto_id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        catalogo.refrescar([instance.pk])
+        _refrescar_recomendaciones([instance.pk])
+    else:
+        # genero.producto_set.add/remove/clear(...): instance es el género
+        if action == "post_clear":
+            afectados = instance.__dict__.pop("_productos_afectados", ())
+        else:
+            afectados = pk_set or ()
+        catalogo.refrescar(afectados)
+        _refrescar_recomendaciones(afectados)
+
+
+@receiver(pre_delete, sender=Genero)
+def recordar_productos_genero(sender, instance: Genero, **kwargs):
+    # Las filas de la tabla intermedia se borran en cascada sin m2m_changed
+    instance._productos_afectados = list(
+        Producto.generos.through.objects.filter(genero_id=instance.pk)
+        .values_list("producto_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def invalidar_cache_generos(sender, instance: Genero, created=False, **kwargs):
+    generos.invalidar()
+    # Un género nuevo no aparece en ningún producto todavía
+    if created:
+        return
+    afectados = getattr(instance, "_productos_afectados", None)
+    if afectados is None:
+        afectados = Producto.generos.through.objects.filter(
+            genero_id=instance.pk
+        ).values_list("producto_id", flat=True)
+    catalogo.refrescar(afectados)
+
+
+@receiver(post_delete, sender=Genero)
+def refrescar_recomendaciones_genero(sender, instance: Genero, **kwargs):
+    # Los productos del género borrado tienen una columna menos en la matriz
+    _refrescar_recomendaciones(getattr(instance, "_productos_afectados", ()))
+
+
+@receiver(pre_save, sender=User)
+def normalizar_correo_usuario(sender, instance, raw=False, **kwargs):
+    # Minúsculas en Python: el índice único usa LOWER(), que en SQLite no
+    # cambia las letras no ASCII (ver store/autenticacion.py)
+    if not raw:
+        instance.email = normalizar_correo(instance.email)
+
+
 @receiver(post_save, sender=User)
-def sync_user_to_firestore(sender, instance, created, **kwargs):
+def sync_user_to_firestore(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
     Cada vez que un User se crea o se actualiza, guardamos/actualizamos
-    un documento en Firestore.
+    un documento en Firestore, fuera del request (ver store.sincronizacion).
+    Los guardados del login (solo last_login) se envían en batch cada cierto
+    tiempo.
     """
-    db = get_db()
-    doc_ref = db.collection("usuarios").document(str(instance.id))
-
-    data = {
-        "username": instance.username,
-        "email": instance.email or None,
-        "first_name": instance.first_name or "",
-        "last_name": instance.last_name or "",
-        "is_staff": instance.is_staff,
-        "is_superuser": instance.is_superuser,
-        "is_active": instance.is_active,
-        "date_joined": instance.date_joined.isoformat(),
-        "last_login": instance.last_login.isoformat() if instance.last_login else None,
-    }
-
-    # Si es nuevo o se actualiza, usamos set con merge
-    doc_ref.set(data, merge=True)
\ No newline at end of file
+    if raw or not firebase_app.disponible():
+        return
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        sincronizacion.registrar_last_login(instance)
+    else:
+        sincronizacion.sincronizar_usuario(instance)
@@ -0,0 +1,118 @@
+# store/sincronizacion.py
+"""
+Sincronización de usuarios con Firestore fuera del request.
+
+- Los cambios de un User (registro, perfil, permisos) se encolan en un pool
+  de hilos al confirmar la transacción: el request no espera a Firestore y
+  un error de Firestore solo queda en el log.
+- Django guarda el usuario en cada login solo para actualizar last_login
+  (update_fields=["last_login"]). Esos guardados no escriben al momento: se
+  acumulan y se envían juntos en un batch cada LAST_LOGIN_INTERVALO
+  segundos (y al terminar el proceso).
+"""
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+import firebase_app
+from firebase_app import get_db
+
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+LAST_LOGIN_INTERVALO = 60
+# Firestore admite como máximo 500 escrituras por batch
+FIRESTORE_BATCH_SIZE = 500
+
+# Un solo hilo: las escrituras de un mismo usuario llegan a Firestore en el
+# orden en que se confirmaron (con dos, un documento viejo podía pisar al nuevo)
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="firestore")
+
+_lock = threading.Lock()
+_last_login_pendientes = {}  # user_id -> last_login (isoformat)
+_temporizador = None
+
+
+def usuario_to_doc(user) -> dict:
+    return {
+        "username": user.username,
+        "email": user.email or None,
+        "first_name": user.first_name or "",
+        "last_name": user.last_name or "",
+        "is_staff": user.is_staff,
+        "is_superuser": user.is_superuser,
+        "is_active": user.is_active,
+        "date_joined": user.date_joined.isoformat(),
+        "last_login": user.last_login.isoformat() if user.last_login else None,
+    }
+
+
+def _escribir_usuario(user_id, data):
+    try:
+        with metricas.sync_firestore("usuario"), firebase_app.llamada():
+            get_db().collection("usuarios").document(str(user_id)).set(data, merge=True)
+    except Exception as e:
+        logger.error("Error al sincronizar usuario %s con Firebase: %s", user_id, str(e))
+
+
+def sincronizar_usuario(user):
+    """Encola la escritura del documento completo del usuario."""
+    # Los datos se toman ahora: la instancia puede cambiar antes de que corra
+    data = usuario_to_doc(user)
+    transaction.on_commit(lambda: _pool.submit(_escribir_usuario, user.pk, data))
+
+
+def _programar_envio():
+    """Arranca el temporizador del próximo envío (llamar con _lock tomado)."""
+    global _temporizador
+    if _temporizador is None:
+        _temporizador = threading.Timer(LAST_LOGIN_INTERVALO, enviar_last_login)
+        _temporizador.daemon = True
+        _temporizador.start()
+
+
+def registrar_last_login(user):
+    """Acumula el last_login para el próximo envío en batch."""
+    with _lock:
+        _last_login_pendientes[user.pk] = user.last_login.isoformat() if user.last_login else None
+        _programar_envio()
+
+
+def enviar_last_login():
+    """Envía a Firestore los last_login acumulados (batches de 500)."""
+    global _last_login_pendientes, _temporizador
+    with _lock:
+        _temporizador = None
+        # Con el circuito abierto se guardan para el próximo envío, que se
+        # programa ya: si no, esperarían al próximo login
+        if not firebase_app.disponible():
+            if _last_login_pendientes:
+                _programar_envio()
+            return
+        pendientes, _last_login_pendientes = _last_login_pendientes, {}
+    if not pendientes:
+        return
+
+    try:
+        with metricas.sync_firestore("last_login"), firebase_app.llamada():
+            db = get_db()
+            items = list(pendientes.items())
+            for inicio in range(0, len(items), FIRESTORE_BATCH_SIZE):
+                batch = db.batch()
+                for user_id, last_login in items[inicio:inicio + FIRESTORE_BATCH_SIZE]:
+                    doc_ref = db.collection("usuarios").document(str(user_id))
+                    batch.set(doc_ref, {"last_login": last_login}, merge=True)
+                batch.commit()
+    except Exception as e:
+        logger.error(
+            "Error al sincronizar last_login de %s usuarios con Firebase: %s",
+            len(pendientes),
+            str(e),
+        )
+
+
+atexit.register(enviar_last_login)
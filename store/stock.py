@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Producto, MovimientoStock
+from .signals import sync_productos_firestore
+from . import inventario, catalogo
+
+STOCK_MAXIMO = 100000
+
+
+class AjusteStockError(ValueError):
+    """Error de validación en un ajuste masivo de stock (no se aplica nada)."""
+
+
+def _entero(valor):
+    """
+    int(valor) sin truncar: acepta enteros y texto con un entero ("+3",
+    "-2"); rechaza decimales (1.5) y booleanos.
+    """
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(valor)
+    return int(valor)
+
+
+def _normalizar(ajustes):
+    """
+    Agrupa los ajustes por producto, respetando el orden en que llegaron.
+
+    Cada ajuste es un dict con "id" y, o bien "delta" (suma/resta), o bien
+    "stock" (valor absoluto). Devuelve {id: (absoluto | None, delta)}: si hay
+    un absoluto, los deltas posteriores se suman sobre él.
+    """
+    resultado = {}
+    for ajuste in ajustes:
+        try:
+            producto_id = _entero(ajuste["id"])
+        except (KeyError, TypeError, ValueError):
+            raise AjusteStockError("Cada ajuste debe indicar un 'id' de producto válido.")
+
+        tiene_delta = ajuste.get("delta") is not None
+        tiene_stock = ajuste.get("stock") is not None
+        if tiene_delta == tiene_stock:
+            raise AjusteStockError(
+                f"El ajuste del producto {producto_id} debe tener 'delta' o 'stock' (solo uno)."
+            )
+
+        try:
+            valor = _entero(ajuste["delta"] if tiene_delta else ajuste["stock"])
+        except (TypeError, ValueError):
+            raise AjusteStockError(f"El ajuste del producto {producto_id} no es un número entero.")
+
+        absoluto, delta = resultado.get(producto_id, (None, 0))
+        if tiene_stock:
+            absoluto, delta = valor, 0
+        else:
+            delta += valor
+        resultado[producto_id] = (absoluto, delta)
+    return resultado
+
+
+def ajustar_stock(ajustes):
+    """
+    Aplica un lote de ajustes de stock en una sola transacción.
+
+    - Bloquea las filas afectadas (select_for_update) y valida que el stock
+      final quede entre 0 y STOCK_MAXIMO; si algún ajuste es inválido no se
+      aplica ninguno.
+    - Escribe todo con un único bulk_update (los deltas como F("stock") + n)
+      y registra los movimientos en el historial con un bulk_create.
+    - Actualiza el resumen de stock (store.inventario) en la misma transacción.
+    - Al confirmar la transacción, sincroniza con Firestore una sola vez por
+      producto afectado.
+
+    Devuelve una lista de dicts {"id", "stock_anterior", "stock"}.
+    """
+    por_producto = _normalizar(ajustes)
+    if not por_producto:
+        return []
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        productos = list(
+            Producto.objects.select_for_update()
+            .filter(id__in=por_producto.keys())
+            .only("id", "nombre", "plataforma", "formato", "stock", "actualizado_en")
+        )
+
+        encontrados = {p.id for p in productos}
+        faltantes = sorted(set(por_producto) - encontrados)
+        if faltantes:
+            raise AjusteStockError(
+                "No existen los productos: " + ", ".join(str(i) for i in faltantes)
+            )
+
+        resultado = []
+        cambios = []
+        por_id = {p.id: p for p in productos}
+        for producto in productos:
+            absoluto, delta = por_producto[producto.id]
+            anterior = producto.stock
+            nuevo = (absoluto if absoluto is not None else anterior) + delta
+
+            if nuevo < 0 or nuevo > STOCK_MAXIMO:
+                raise AjusteStockError(
+                    f"El stock del producto {producto.id} quedaría en {nuevo} "
+                    f"(debe estar entre 0 y {STOCK_MAXIMO})."
+                )
+
+            if absoluto is not None:
+                producto.stock = nuevo
+            else:
+                producto.stock = F("stock") + delta
+            producto.actualizado_en = ahora
+            resultado.append({"id": producto.id, "stock_anterior": anterior, "stock": nuevo})
+            cambios.append(
+                (
+                    (producto.id, producto.plataforma, producto.formato, anterior),
+                    (producto.id, producto.plataforma, producto.formato, nuevo),
+                )
+            )
+
+        Producto.objects.bulk_update(productos, ["stock", "actualizado_en"])
+        MovimientoStock.objects.bulk_create(
+            [
+                MovimientoStock(
+                    producto_id=r["id"],
+                    producto_nombre=por_id[r["id"]].nombre,
+                    plataforma=por_id[r["id"]].plataforma,
+                    delta=r["stock"] - r["stock_anterior"],
+                    motivo="AJUSTE",
+                    creado_en=ahora,
+                )
+                for r in resultado
+                if r["stock"] != r["stock_anterior"]
+            ]
+        )
+
+        inventario.registrar_cambios(cambios)
+        catalogo.refrescar(r["id"] for r in resultado)
+
+        ids = [r["id"] for r in resultado]
+        transaction.on_commit(lambda: sync_productos_firestore(ids))
+
+    return resultado
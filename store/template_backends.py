@@ -0,0 +1,30 @@
+# store/template_backends.py
+"""
+Backend de templates de Django que mide el tiempo de render.
+
+Es DjangoTemplates con una clase Template que suma lo que tarda cada render
+al request en curso (store.instrumentacion.registrar_plantilla). Se activa
+en TEMPLATES (settings); con el backend estándar no se mide nada.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .instrumentacion import registrar_plantilla
+
+
+class PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            registrar_plantilla((time.perf_counter() - inicio) * 1000)
+
+
+class DjangoTemplatesMedido(DjangoTemplates):
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name).template, self)
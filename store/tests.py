@@ -1,3 +1,827 @@
-from django.test import TestCase
+import datetime
+import fcntl
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import firebase_app
+from . import busqueda, datos_sinteticos, generos, metricas, perfiles, recomendaciones, sincronizacion
+from .benchmarks import percentil, resumen
+from .db_routers import COOKIE_PRIMARIA, CatalogoRouter, ReplicaMiddleware
+from .filtros import filtrar_panel
+from .forms import UserRegisterForm
+from .historial import reporte_sell_through, stock_en
+from .instrumentacion import PresupuestoConsultasExcedido
+from .management.commands.bench_suite import Command as BenchSuite
+from .models import (
+    ESTADO_CHOICES,
+    FORMATO_CHOICES,
+    PLATAFORMA_CHOICES,
+    Genero,
+    MovimientoStock,
+    Producto,
+    ProductoVista,
+    ResumenStock,
+    SnapshotStock,
+)
+from .stock import AjusteStockError, ajustar_stock
+
+
+def crear_producto(nombre="Juego", generos_=(), **campos):
+    datos = {
+        "anio_lanzamiento": datetime.date(2020, 1, 1),
+        "plataforma": "PS4",
+        "formato": "FISICO",
+        "estado": "NUEVO",
+        "valor": Decimal("19990"),
+        "stock": 10,
+        **campos,
+    }
+    producto = Producto.objects.create(nombre=nombre, **datos)
+    if generos_:
+        producto.generos.set(generos_)
+    return producto
+
+
+@override_settings(FIREBASE_HABILITADO=False)
+class TiendaTestCase(TestCase):
+    """
+    Estado por proceso (géneros, recomendaciones, caché) limpio en cada
+    prueba. La matriz de recomendaciones se carga acá, en el hilo del test:
+    sin ella refrescar() programaría la carga en segundo plano.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        recomendaciones.reconstruir()
+
+    def setUp(self):
+        generos.invalidar()
+        cache.clear()
+
+
+# ---------------------------------------------------------------------------
+#  Suite de benchmarks (datos sintéticos, estadísticas, baseline)
+# ---------------------------------------------------------------------------
+class DatosSinteticosTests(TiendaTestCase):
+    def test_combina_plataforma_formato_y_estado_con_la_misma_semilla(self):
+        creados = datos_sinteticos.generar(24, 4, semilla=7)
+
+        combinaciones = {(p.plataforma, p.formato, p.estado) for p in creados}
+        self.assertEqual(
+            len(combinaciones), len(PLATAFORMA_CHOICES) * len(FORMATO_CHOICES) * len(ESTADO_CHOICES)
+        )
+        for producto in Producto.objects.prefetch_related("generos"):
+            self.assertIn(producto.generos.count(), (1, 2, 3))
+
+        primera = list(Producto.objects.order_by("id").values_list("nombre", "valor", "stock"))
+        Producto.objects.all().delete()
+        datos_sinteticos.generar(24, 4, semilla=7)
+        self.assertEqual(
+            list(Producto.objects.order_by("id").values_list("nombre", "valor", "stock")), primera
+        )
+
+    def test_preparar_recalcula_lo_derivado(self):
+        datos_sinteticos.generar(12, 3)
+        datos_sinteticos.preparar()
+
+        self.assertEqual(ProductoVista.objects.count(), 12)
+        self.assertEqual(sum(ResumenStock.objects.values_list("total", flat=True)), 12)
+
+
+class EstadisticasBenchmarkTests(SimpleTestCase):
+    def test_percentil_por_rango_mas_cercano(self):
+        valores = [5, 1, 4, 2, 3]
+        self.assertEqual(percentil(valores, 50), 3)
+        self.assertEqual(percentil(valores, 95), 5)
+        self.assertEqual(percentil(valores, 0), 1)
+        self.assertEqual(percentil([], 95), 0.0)
+
+    def test_resumen_en_milisegundos(self):
+        r = resumen([0.010, 0.020, 0.030, 0.040], errores=1, duracion=2)
+        self.assertEqual(
+            (r["requests"], r["errores"], r["req_por_s"], r["p50_ms"], r["p95_ms"], r["media_ms"]),
+            (4, 1, 2.0, 30.0, 40.0, 25.0),
+        )
+
+
+class BaselineBenchSuiteTests(SimpleTestCase):
+    PARAMETROS = {"productos": 100, "generos": 4, "semilla": 0, "repeticiones": 5}
+
+    def setUp(self):
+        self.comando = BenchSuite(stdout=io.StringIO())
+
+    def _documento(self, **escenario):
+        base = {"p50_ms": 10.0, "p95_ms": 20.0, "media_ms": 12.0, "consultas": 4, "pico_kb": 100.0}
+        return {"parametros": self.PARAMETROS, "escenarios": {"home": {**base, **escenario}}}
+
+    def test_sin_regresiones(self):
+        # p95 dentro del umbral (25 %) y ruido de pocos ms (MARGEN_MS)
+        self.comando._comparar(self._documento(p95_ms=24.0), self._documento(), 0.25)
+        self.comando._comparar(self._documento(p95_ms=1.9), self._documento(p95_ms=0.5), 0.25)
+
+    def test_detecta_regresiones(self):
+        for cambio in ({"consultas": 5}, {"p95_ms": 30.0}, {"pico_kb": 130.0}):
+            with self.subTest(cambio=cambio), self.assertRaisesMessage(CommandError, "home"):
+                self.comando._comparar(self._documento(**cambio), self._documento(), 0.25)
+
+    def test_baseline_con_otros_parametros(self):
+        otro = {**self._documento(), "parametros": {**self.PARAMETROS, "productos": 200}}
+        with self.assertRaisesMessage(CommandError, "otros parámetros"):
+            self.comando._comparar(self._documento(), otro, 0.25)
+
+
+class MedirEscenarioTests(TiendaTestCase):
+    def test_mide_latencia_consultas_y_memoria(self):
+        crear_producto()
+
+        def escenario():
+            list(Producto.objects.all())
+            list(ProductoVista.objects.all())
+
+        r = BenchSuite(stdout=io.StringIO())._medir(escenario, repeticiones=3)
+        self.assertEqual(r["consultas"], 2)
+        self.assertGreater(r["pico_kb"], 0)
+        self.assertLessEqual(r["p50_ms"], r["p95_ms"])
+
+
+# ---------------------------------------------------------------------------
+#  Libro de movimientos e historial
+# ---------------------------------------------------------------------------
+class HistorialStockTests(TiendaTestCase):
+    def test_crear_y_editar_registran_movimientos(self):
+        producto = crear_producto(stock=10)
+        producto.stock = 4
+        producto.save()
+
+        movimientos = list(
+            MovimientoStock.objects.filter(producto=producto)
+            .order_by("id")
+            .values_list("motivo", "delta", "producto_nombre", "plataforma")
+        )
+        self.assertEqual(
+            movimientos,
+            [("CREACION", 10, "Juego", "PS4"), ("EDICION", -6, "Juego", "PS4")],
+        )
+
+    def test_instancia_sin_stock_cargado_lee_el_estado_previo(self):
+        producto = crear_producto(stock=10)
+        diferido = Producto.objects.defer("stock", "plataforma").get(pk=producto.pk)
+        diferido.stock = 7
+        diferido.save()
+
+        self.assertEqual(
+            MovimientoStock.objects.filter(producto=producto, motivo="EDICION").get().delta, -3
+        )
+
+    def test_stock_en_usa_el_ultimo_snapshot_y_los_movimientos_posteriores(self):
+        producto = crear_producto(stock=0)
+        dia = datetime.timedelta(days=1)
+        inicio = timezone.now() - 10 * dia
+        MovimientoStock.objects.create(
+            producto=producto, producto_nombre="Juego", plataforma="PS4",
+            delta=10, motivo="IMPORTACION", creado_en=inicio + dia,
+        )
+        # El snapshot manda aunque no coincida con la suma (p. ej. un recuento)
+        SnapshotStock.objects.create(producto=producto, stock=12, tomado_en=inicio + 2 * dia)
+        MovimientoStock.objects.create(
+            producto=producto, producto_nombre="Juego", plataforma="PS4",
+            delta=-3, motivo="VENTA", creado_en=inicio + 3 * dia,
+        )
+
+        self.assertEqual(stock_en(producto.pk, inicio), 0)
+        self.assertEqual(stock_en(producto.pk, inicio + dia), 10)
+        self.assertEqual(stock_en(producto.pk, inicio + 2 * dia), 12)
+        self.assertEqual(stock_en(producto.pk, inicio + 4 * dia), 9)
+
+    def test_borrar_el_producto_conserva_el_historial_y_registra_la_baja(self):
+        producto = crear_producto(nombre="Borrado", plataforma="PS5", stock=3)
+        SnapshotStock.objects.create(producto=producto, stock=3)
+        producto_id = producto.pk
+        producto.delete()
+
+        self.assertEqual(
+            list(
+                MovimientoStock.objects.filter(producto_id=producto_id)
+                .order_by("id")
+                .values_list("motivo", "delta", "plataforma")
+            ),
+            [("CREACION", 3, "PS5"), ("BAJA", -3, "PS5")],
+        )
+        self.assertEqual(SnapshotStock.objects.filter(producto_id=producto_id).count(), 1)
+        self.assertEqual(stock_en(producto_id, timezone.now()), 0)
+
+
+class ReporteSellThroughTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = crear_producto(nombre="A", stock=10)
+        self.b = crear_producto(nombre="B", stock=10)
+        # Productos y su alta quedan antes del período
+        hace_dos_dias = timezone.now() - datetime.timedelta(days=2)
+        Producto.objects.update(creado_en=hace_dos_dias)
+        MovimientoStock.objects.update(creado_en=hace_dos_dias)
+        self.desde = timezone.now() - datetime.timedelta(days=1)
+
+    def _vender(self, producto, unidades):
+        MovimientoStock.objects.create(
+            producto=producto, producto_nombre=producto.nombre, plataforma=producto.plataforma,
+            delta=-unidades, motivo="VENTA",
+        )
+        Producto.objects.filter(pk=producto.pk).update(stock=producto.stock - unidades)
+
+    def _fila(self, desde, hasta):
+        (fila,) = reporte_sell_through(desde, hasta)
+        return {k: fila[k] for k in ("stock_inicial", "salidas", "vendidas", "bajas", "stock_final", "sell_through")}
+
+    def test_producto_borrado_despues_del_periodo_sigue_contando(self):
+        self._vender(self.a, 8)
+        hasta = timezone.now()
+        Producto.objects.get(pk=self.a.pk).delete()
+
+        self.assertEqual(
+            self._fila(self.desde, hasta),
+            {"stock_inicial": 20, "salidas": 8, "vendidas": 8, "bajas": 0, "stock_final": 12, "sell_through": 40.0},
+        )
+
+    def test_producto_borrado_dentro_del_periodo(self):
+        self._vender(self.a, 8)
+        Producto.objects.get(pk=self.a.pk).delete()
+        hasta = timezone.now() + datetime.timedelta(seconds=1)
+
+        fila = self._fila(self.desde, hasta)
+        self.assertEqual(
+            fila,
+            {"stock_inicial": 20, "salidas": 8, "vendidas": 8, "bajas": 2, "stock_final": 10, "sell_through": 40.0},
+        )
+        self.assertEqual(fila["stock_inicial"] - fila["salidas"] - fila["bajas"], fila["stock_final"])
+
+    def test_producto_borrado_antes_del_periodo_no_cuenta(self):
+        Producto.objects.get(pk=self.a.pk).delete()
+        MovimientoStock.objects.filter(motivo="BAJA").update(
+            creado_en=self.desde - datetime.timedelta(hours=1)
+        )
+        self._vender(self.b, 5)
+
+        self.assertEqual(
+            self._fila(self.desde, timezone.now()),
+            {"stock_inicial": 10, "salidas": 5, "vendidas": 5, "bajas": 0, "stock_final": 5, "sell_through": 50.0},
+        )
+
+
+# ---------------------------------------------------------------------------
+#  Ajuste masivo de stock
+# ---------------------------------------------------------------------------
+class AjustarStockTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = crear_producto(nombre="A", stock=10)
+        self.b = crear_producto(nombre="B", stock=2)
+
+    def test_aplica_deltas_y_absolutos_en_un_lote(self):
+        resultado = ajustar_stock(
+            [{"id": self.a.pk, "delta": -10}, {"id": self.b.pk, "stock": 8}, {"id": self.b.pk, "delta": "+1"}]
+        )
+
+        self.assertEqual(
+            sorted((r["id"], r["stock_anterior"], r["stock"]) for r in resultado),
+            [(self.a.pk, 10, 0), (self.b.pk, 2, 9)],
+        )
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.stock, self.b.stock), (0, 9))
+        self.assertEqual(
+            dict(MovimientoStock.objects.filter(motivo="AJUSTE").values_list("producto_nombre", "delta")),
+            {"A": -10, "B": 7},
+        )
+        fila = ResumenStock.objects.get(plataforma="PS4", formato="FISICO")
+        self.assertEqual((fila.sin_stock, fila.bajo_stock), (1, 0))
+        self.assertEqual(fila.ids_sin_stock, [self.a.pk])
+        self.assertEqual(ProductoVista.objects.get(producto=self.b).stock, 9)
+
+    def test_un_ajuste_invalido_no_aplica_ninguno(self):
+        with self.assertRaises(AjusteStockError):
+            ajustar_stock([{"id": self.a.pk, "delta": -1}, {"id": self.b.pk, "delta": -3}])
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 10)
+        self.assertFalse(MovimientoStock.objects.filter(motivo="AJUSTE").exists())
+
+    def test_rechaza_valores_que_no_son_enteros(self):
+        for ajuste in (
+            {"id": self.a.pk, "delta": 1.5},
+            {"id": self.a.pk, "delta": True},
+            {"id": self.a.pk, "stock": "dos"},
+            {"id": 1.5, "delta": 1},
+            {"id": self.a.pk, "delta": 1, "stock": 3},
+        ):
+            with self.subTest(ajuste=ajuste), self.assertRaises(AjusteStockError):
+                ajustar_stock([ajuste])
+
+    def test_producto_inexistente(self):
+        with self.assertRaisesMessage(AjusteStockError, "No existen los productos: 999999"):
+            ajustar_stock([{"id": 999999, "delta": 1}])
+
+
+# ---------------------------------------------------------------------------
+#  Réplicas de lectura
+# ---------------------------------------------------------------------------
+class CatalogoRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = CatalogoRouter()
+        self.router.replicas = ["replica_1"]
+        self.factory = RequestFactory()
+
+    def _en_request(self, request, vista):
+        """Corre `vista()` dentro de ReplicaMiddleware y devuelve (resultado, respuesta)."""
+        resultado = {}
+
+        def get_response(request):
+            resultado["valor"] = vista()
+            return HttpResponse()
+
+        respuesta = ReplicaMiddleware(get_response)(request)
+        return resultado["valor"], respuesta
+
+    def test_fuera_de_un_request_todo_va_a_la_primaria(self):
+        self.assertEqual(self.router.db_for_read(Producto), "default")
+
+    def test_lecturas_del_catalogo_van_a_la_replica(self):
+        alias, respuesta = self._en_request(
+            self.factory.get("/"),
+            lambda: (self.router.db_for_read(Producto), self.router.db_for_read(User)),
+        )
+        self.assertEqual(alias, ("replica_1", "default"))
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_despues_de_escribir_se_lee_de_la_primaria(self):
+        def vista():
+            self.router.db_for_write(Producto)
+            return self.router.db_for_read(Producto)
+
+        alias, respuesta = self._en_request(self.factory.get("/"), vista)
+        self.assertEqual(alias, "default")
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_post_y_cookie_de_primaria_leen_de_la_primaria(self):
+        def leer():
+            return self.router.db_for_read(Producto)
+
+        self.assertEqual(self._en_request(self.factory.post("/"), leer)[0], "default")
+        request = self.factory.get("/")
+        request.COOKIES[COOKIE_PRIMARIA] = "1"
+        self.assertEqual(self._en_request(request, leer)[0], "default")
+
+    def test_las_replicas_no_se_migran(self):
+        self.assertTrue(self.router.allow_migrate("default", "store"))
+        self.assertFalse(self.router.allow_migrate("replica_1", "store"))
+
+
+# ---------------------------------------------------------------------------
+#  Catálogo: GET condicional
+# ---------------------------------------------------------------------------
+class CatalogoCondicionalTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.producto = crear_producto(nombre="Gran Turismo")
+
+    def test_responde_304_si_el_catalogo_no_cambio(self):
+        respuesta = self.client.get(reverse("home"))
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta["ETag"]
+
+        respuesta = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_el_etag_cambia_al_editar_o_borrar_un_producto(self):
+        etag = self.client.get(reverse("home"))["ETag"]
+
+        otro = crear_producto(nombre="Otro")
+        respuesta = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta["ETag"]
+
+        otro.delete()
+        respuesta = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_los_filtros_tienen_su_propio_etag(self):
+        etag = self.client.get(reverse("home"))["ETag"]
+        respuesta = self.client.get(reverse("home"), {"plataforma": "PS5"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+
+# ---------------------------------------------------------------------------
+#  Índices del buscador
+# ---------------------------------------------------------------------------
+class BusquedaTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gow = crear_producto(nombre="God of War Ragnarök", descripcion="Kratos y Atreus en los nueve reinos")
+        self.gt = crear_producto(nombre="Gran Turismo 7", descripcion="Simulador de carreras")
+        busqueda.construir()
+
+    def _sugeridos(self, prefijo):
+        return [s["nombre"] for s in busqueda.indice.sugerir(prefijo)]
+
+    def test_sugerencias_por_inicio_de_nombre_y_de_palabra(self):
+        self.assertEqual(self._sugeridos("gr"), ["Gran Turismo 7"])
+        self.assertEqual(self._sugeridos("g"), ["God of War Ragnarök", "Gran Turismo 7"])
+        self.assertEqual(self._sugeridos("ragnarok"), ["God of War Ragnarök"])
+        self.assertEqual(self._sugeridos("   "), [])
+
+    def test_los_indices_siguen_a_las_senales_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gt.nombre = "Gran Turismo Sport"
+            self.gt.save()
+            nuevo = crear_producto(nombre="Granblue Fantasy")
+            # Antes del commit el índice no cambia
+            self.assertEqual(self._sugeridos("gran"), ["Gran Turismo 7"])
+        self.assertEqual(self._sugeridos("gran"), ["Gran Turismo Sport", "Granblue Fantasy"])
+
+        nuevo_id = nuevo.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertEqual(self._sugeridos("gran"), ["Gran Turismo Sport"])
+        self.assertNotIn(nuevo_id, busqueda.indice_aproximado.buscar("granblue"))
+
+    def test_un_rollback_no_deja_el_nombre_en_las_sugerencias(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    crear_producto(nombre="Granblue Fantasy")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self._sugeridos("granb"), [])
+
+    def test_muchos_cambios_se_aplican_en_una_pasada(self):
+        for i in range(50):
+            busqueda.indice.actualizar(Producto(pk=1000 + i, nombre=f"Importado {i:02d}"))
+        busqueda.indice.quitar(1000)
+        busqueda.indice.quitar(self.gt.pk)
+
+        self.assertEqual(len(busqueda.indice._pendientes), 51)
+        self.assertEqual(self._sugeridos("importado 0"), [f"Importado {i:02d}" for i in range(1, 9)])
+        self.assertEqual(busqueda.indice._pendientes, {})
+        self.assertEqual(self._sugeridos("gran"), [])
+
+    def test_busqueda_aproximada_tolera_errores_e_iniciales(self):
+        self.assertEqual(busqueda.indice_aproximado.buscar("gran turimso")[:1], [self.gt.pk])
+        self.assertEqual(busqueda.indice_aproximado.buscar("gow")[:1], [self.gow.pk])
+        self.assertIn(self.gow.pk, busqueda.indice_aproximado.buscar("KRATOS"))
+        self.assertIn(self.gt.pk, busqueda.indice_aproximado.buscar("simuladro"))
+
+    def test_ids_de_64_bits(self):
+        grande = crear_producto(nombre="Gran Turismo 2", id=2**32 + 5)
+        busqueda.indice_aproximado.actualizar(grande)
+        self.assertIn(grande.pk, busqueda.indice_aproximado.buscar("gran turismo"))
+
+        busqueda.indice_aproximado.quitar(grande.pk)
+        self.assertNotIn(grande.pk, busqueda.indice_aproximado.buscar("gran turismo"))
+        busqueda.construir()
+        self.assertIn(grande.pk, busqueda.indice_aproximado.buscar("gran turismo"))
+
+
+# ---------------------------------------------------------------------------
+#  Recomendaciones
+# ---------------------------------------------------------------------------
+class RecomendacionesTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.accion = Genero.objects.create(nombre="Acción")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a = crear_producto(nombre="A", generos_=[self.accion], valor=Decimal("10000"))
+            self.b = crear_producto(nombre="B", generos_=[self.accion], valor=Decimal("11000"))
+            self.c = crear_producto(nombre="C", valor=Decimal("10000"), plataforma="PS3")
+
+    def _relacionados(self, producto):
+        return [r["nombre"] for r in ProductoVista.objects.get(producto=producto).relacionados]
+
+    def test_comparten_genero_y_plataforma(self):
+        self.assertEqual(self._relacionados(self.a), ["B"])
+        self.assertEqual(recomendaciones.reconstruir(), 3)
+        self.assertEqual(self._relacionados(self.b), ["A"])
+        self.assertEqual(self._relacionados(self.c), [])
+
+    def test_se_actualizan_al_cambiar_los_generos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.c.generos.add(self.accion)
+        self.assertIn("C", self._relacionados(self.a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.accion.producto_set.clear()
+        for producto in (self.a, self.b, self.c):
+            self.assertEqual(self._relacionados(producto), [])
+
+    def test_se_actualizan_al_borrar_un_producto(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.b.delete()
+        self.assertEqual(self._relacionados(self.a), [])
+
+    def test_un_rollback_no_cambia_la_matriz(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.c.generos.add(self.accion)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(recomendaciones._matriz.filas[self.c.pk], frozenset())
+        self.assertNotIn(self.c.pk, recomendaciones._matriz.candidatos(self.a.pk))
+
+
+# ---------------------------------------------------------------------------
+#  Sincronización de usuarios con Firestore
+# ---------------------------------------------------------------------------
+class LastLoginTests(SimpleTestCase):
+    def tearDown(self):
+        with sincronizacion._lock:
+            if sincronizacion._temporizador is not None:
+                sincronizacion._temporizador.cancel()
+            sincronizacion._temporizador = None
+            sincronizacion._last_login_pendientes.clear()
+
+    def test_con_el_circuito_abierto_se_reprograma_el_envio(self):
+        usuario = User(pk=7, last_login=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+        with mock.patch.object(sincronizacion, "LAST_LOGIN_INTERVALO", 3600), mock.patch(
+            "firebase_app.disponible", return_value=False
+        ):
+            sincronizacion.registrar_last_login(usuario)
+            primero = sincronizacion._temporizador
+            primero.cancel()
+            sincronizacion.enviar_last_login()
+
+        self.assertIsNotNone(sincronizacion._temporizador)
+        self.assertIsNot(sincronizacion._temporizador, primero)
+        self.assertEqual(sincronizacion._last_login_pendientes, {7: "2026-01-01T00:00:00+00:00"})
+
+
+# ---------------------------------------------------------------------------
+#  Login con usuario o correo
+# ---------------------------------------------------------------------------
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UsuarioOCorreoBackendTests(TiendaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user("ana", "Ana@Ejemplo.cl", "clave-segura")
+
+    def test_entra_con_nombre_de_usuario(self):
+        self.assertEqual(authenticate(None, username="ana", password="clave-segura"), self.usuario)
+
+    def test_entra_con_correo_sin_distinguir_mayusculas(self):
+        self.assertEqual(
+            authenticate(None, username=" ana@ejemplo.CL ", password="clave-segura"), self.usuario
+        )
+
+    def test_rechaza_clave_incorrecta_usuario_inactivo_y_correo_desconocido(self):
+        self.assertIsNone(authenticate(None, username="ana@ejemplo.cl", password="otra"))
+        self.assertIsNone(authenticate(None, username="nadie@ejemplo.cl", password="clave-segura"))
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertIsNone(authenticate(None, username="ana@ejemplo.cl", password="clave-segura"))
+
+    def test_correo_no_ascii_se_guarda_normalizado(self):
+        usuario = User.objects.create_user("nandu", "ÑANDÚ@x.cl", "clave-segura")
+        self.assertEqual(User.objects.get(pk=usuario.pk).email, "ñandú@x.cl")
+        self.assertEqual(authenticate(None, username="Ñandú@X.cl", password="clave-segura"), usuario)
+
+        form = UserRegisterForm(
+            data={
+                "username": "otro",
+                "email": "ñANDÚ@x.cl",
+                "password1": "Clave-Segura-123",
+                "password2": "Clave-Segura-123",
+            }
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("email", form.errors)
+
+
+# ---------------------------------------------------------------------------
+#  Panel de stock
+# ---------------------------------------------------------------------------
+class FiltrarPanelTests(TiendaTestCase):
+    def test_prefijo_sin_distinguir_mayusculas_no_ascii(self):
+        nandu = crear_producto(nombre="Ñandú Adventure")
+        crear_producto(nombre="Nba 2K")
+
+        def buscar(q):
+            productos, _ = filtrar_panel(Producto.objects.all(), {"q": q})
+            return [p.nombre for p in productos]
+
+        self.assertEqual(buscar("ñan"), ["Ñandú Adventure"])
+        self.assertEqual(buscar("ÑANDÚ a"), ["Ñandú Adventure"])
+
+        nandu.nombre = "Él Ñandú"
+        nandu.save(update_fields=["nombre"])
+        self.assertEqual(buscar("él"), ["Él Ñandú"])
+        self.assertEqual(buscar("ñan"), [])
+
+
+# ---------------------------------------------------------------------------
+#  Presupuesto de consultas
+# ---------------------------------------------------------------------------
+@override_settings(INSTRUMENTACION_ESTRICTA=True)
+class PresupuestoConsultasTests(TiendaTestCase):
+    """Con INSTRUMENTACION_ESTRICTA superar el presupuesto hace fallar el request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        accion, aventura = Genero.objects.create(nombre="Acción"), Genero.objects.create(nombre="Aventura")
+        cls.productos = [
+            crear_producto(nombre=f"Juego {i}", generos_=[accion, aventura][: i % 2 + 1], stock=i)
+            for i in range(12)
+        ]
+
+    def assertDentroDelPresupuesto(self, nombre_url, **kwargs):
+        presupuesto = settings.INSTRUMENTACION_PRESUPUESTO_CONSULTAS[nombre_url]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse(nombre_url), **kwargs)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertLessEqual(len(consultas), presupuesto)
+
+    def test_home(self):
+        self.assertDentroDelPresupuesto("home")
+        self.assertDentroDelPresupuesto("home", data={"q": "juego", "generos": ["1", "2"]})
+
+    def test_cart_detail(self):
+        for producto in self.productos[1:6]:
+            self.client.post(reverse("cart_add", args=[producto.pk]))
+        Producto.objects.filter(pk=self.productos[1].pk).delete()
+        self.assertDentroDelPresupuesto("cart_detail")
+
+    @override_settings(INSTRUMENTACION_PRESUPUESTO_CONSULTAS={"home": 0})
+    def test_superar_el_presupuesto_falla(self):
+        with self.assertRaises(PresupuestoConsultasExcedido):
+            self.client.get(reverse("home"))
+
+
+# ---------------------------------------------------------------------------
+#  Métricas (archivos por worker)
+# ---------------------------------------------------------------------------
+class MetricasArchivosTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = Path(directorio.name)
+        ajustes = override_settings(METRICAS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        metricas._proceso()
+
+    def _escribir(self, nombre, valor):
+        estado = {"contadores": [["prueba_total", [], valor]], "histogramas": []}
+        (self.directorio / nombre).write_text(json.dumps(estado))
+
+    def _total(self):
+        return metricas.agregado()["contadores"].get(("prueba_total", ()), 0)
+
+    def _con_volcado(self):
+        return mock.patch.object(metricas, "_archivo", self.directorio / f"{os.getpid()}-0.json")
+
+    def test_sin_volcado_solo_cuenta_la_memoria(self):
+        self._escribir("999999999-1.json", 3)
+        self.assertIsNone(metricas._archivo)
+        self.assertEqual(self._total(), 0)
+
+    def test_compactar_junta_los_procesos_terminados(self):
+        self._escribir("999999999-1.json", 3)
+        self._escribir(metricas.HISTORICO, 2)
+        with self._con_volcado():
+            self.assertEqual(metricas.compactar(), 1)
+            self.assertFalse((self.directorio / "999999999-1.json").exists())
+            self.assertEqual(self._total(), 5)
+
+    def test_la_lectura_espera_a_la_compactacion(self):
+        self._escribir("999999999-1.json", 3)
+        totales = []
+        with self._con_volcado(), open(self.directorio / metricas.LOCK, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            lector = threading.Thread(target=lambda: totales.append(self._total()))
+            lector.start()
+            lector.join(0.2)
+            self.assertTrue(lector.is_alive())
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lector.join()
+        self.assertEqual(totales, [3])
+
+
+# ---------------------------------------------------------------------------
+#  Perfiles por muestreo
+# ---------------------------------------------------------------------------
+@override_settings(PERFILES_INTERVALO_MS=1)
+class MuestreadorTests(SimpleTestCase):
+    def test_muestrea_solo_con_requests_registrados(self):
+        muestreador = perfiles.Muestreador()
+        with mock.patch("store.perfiles.time") as reloj:
+            reloj.sleep.side_effect = time.sleep
+            muestras = muestreador.registrar()
+            time.sleep(0.05)
+            muestreador.quitar(muestras)
+            self.assertTrue(muestras)
+
+            # Sin requests el hilo espera en la condición, sin despertarse
+            time.sleep(0.02)
+            despertares = reloj.sleep.call_count
+            time.sleep(0.05)
+            self.assertEqual(reloj.sleep.call_count, despertares)
+
+            otras = muestreador.registrar()
+            time.sleep(0.05)
+            muestreador.quitar(otras)
+            self.assertTrue(otras)
+
+
+# ---------------------------------------------------------------------------
+#  Circuito de Firebase
+# ---------------------------------------------------------------------------
+@override_settings(FIREBASE_HABILITADO=True, FIREBASE_FALLOS_MAXIMOS=2, FIREBASE_ENFRIAMIENTO_SEGUNDOS=60)
+class CircuitoFirebaseTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(self._cerrar)
+        self._cerrar()
+
+    def _cerrar(self):
+        firebase_app._fallos, firebase_app._abierto_hasta, firebase_app._sonda = 0, 0.0, None
+
+    def _fallar(self):
+        with self.assertRaises(OSError), firebase_app.llamada():
+            raise OSError("sin red")
+
+    def _enfriado(self):
+        firebase_app._abierto_hasta = time.monotonic() - 1
+
+    def test_se_abre_tras_los_fallos_seguidos(self):
+        self._fallar()
+        self.assertTrue(firebase_app.disponible())
+        self._fallar()
+        self.assertFalse(firebase_app.disponible())
+        with self.assertRaises(firebase_app.FirebaseNoDisponible), firebase_app.llamada():
+            self.fail("no debería llamar a Firestore con el circuito abierto")
+
+    def test_semiabierto_deja_pasar_una_sola_sonda(self):
+        self._fallar()
+        self._fallar()
+        self._enfriado()
+
+        dentro, salir, resultados = threading.Event(), threading.Event(), []
+
+        def sonda():
+            with firebase_app.llamada():
+                dentro.set()
+                salir.wait(5)
+
+        def otra():
+            try:
+                with firebase_app.llamada():
+                    resultados.append("pasó")
+            except firebase_app.FirebaseNoDisponible:
+                resultados.append("rechazada")
+
+        hilo_sonda = threading.Thread(target=sonda)
+        hilo_sonda.start()
+        self.assertTrue(dentro.wait(5))
+        otras = [threading.Thread(target=otra) for _ in range(3)]
+        for hilo in otras:
+            hilo.start()
+        for hilo in otras:
+            hilo.join()
+        salir.set()
+        hilo_sonda.join()
+
+        self.assertEqual(resultados, ["rechazada"] * 3)
+        self.assertEqual(firebase_app.estado()["fallos_seguidos"], 0)
+        self.assertTrue(firebase_app.disponible())
+
+    def test_si_la_sonda_falla_vuelve_a_abrirse(self):
+        self._fallar()
+        self._fallar()
+        self._enfriado()
+        self.assertTrue(firebase_app.estado()["circuito_semiabierto"])
+
+        self._fallar()
+        self.assertTrue(firebase_app.estado()["circuito_abierto"])
+        self.assertFalse(firebase_app.estado()["sonda_en_curso"])
+        self.assertFalse(firebase_app.disponible())
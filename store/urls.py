@@ -1,30 +1,59 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Con STORE_ASYNC_VIEWS activo, el catálogo, el carrito y el login usan las vistas async
+# (pensadas para correr bajo ASGI). El resto de las vistas es igual.
+if settings.STORE_ASYNC_VIEWS:
+    from . import async_views as tienda
+else:
+    tienda = views
+
 
 urlpatterns = [
     # Página principal / catálogo
-    path("", views.home, name="home"),
+    path("", tienda.home, name="home"),
+    path("buscar/sugerencias/", tienda.search_suggest, name="search_suggest"),
+
+    # Métricas (Prometheus)
+    path("metrics", views.metrics, name="metrics"),
 
     # Panel productos (stock)
     path("panel/productos/", views.producto_list, name="product_list"),
+    path("panel/productos/exportar/", views.producto_export, name="product_export"),
+    path("panel/productos/stock/", views.producto_stock_bulk, name="product_stock_bulk"),
+    path("panel/productos/stock/api/", views.producto_stock_api, name="product_stock_api"),
+    path("panel/productos/reporte/", views.producto_reporte, name="product_report"),
     path("panel/productos/crear/", views.producto_create, name="product_create"),
     path("panel/productos/<int:pk>/editar/", views.producto_edit, name="product_edit"),
     path("panel/productos/<int:pk>/eliminar/", views.producto_delete, name="product_delete"),
 
+    # Panel: requests perfilados (store.perfiles)
+    path("panel/perfiles/", views.perfiles_list, name="perfiles_list"),
+    path("panel/perfiles/<int:pk>/", views.perfil_detail, name="perfil_detail"),
+
+    # Panel: consultas lentas (store.consultas_lentas)
+    path("panel/consultas-lentas/", views.consultas_lentas_list, name="consultas_lentas_list"),
+    path(
+        "panel/consultas-lentas/<int:pk>/",
+        views.consulta_lenta_detail,
+        name="consulta_lenta_detail",
+    ),
+
     # Carrito
-    path("carrito/", views.cart_detail, name="cart_detail"),
-    path("carrito/agregar/<int:product_id>/", views.cart_add, name="cart_add"),
-    path("carrito/eliminar/<int:product_id>/", views.cart_remove, name="cart_remove"),
+    path("carrito/", tienda.cart_detail, name="cart_detail"),
+    path("carrito/resumen/", tienda.cart_summary, name="cart_summary"),
+    path("carrito/agregar/<int:product_id>/", tienda.cart_add, name="cart_add"),
+    path("carrito/eliminar/<int:product_id>/", tienda.cart_remove, name="cart_remove"),
     path(
         "carrito/eliminar-id/<int:product_id>/",
-        views.cart_remove_by_id,
+        tienda.cart_remove_by_id,
         name="cart_remove_by_id",
     ),
-    path("carrito/actualizar/<int:product_id>/", views.cart_update, name="cart_update"),
+    path("carrito/actualizar/<int:product_id>/", tienda.cart_update, name="cart_update"),
     
      # Autenticación / cuenta
-    path("accounts/login/", views.login_view, name="login"),
+    path("accounts/login/", tienda.login_view, name="login"),
     path("accounts/logout/", views.logout_view, name="logout"),
     path("accounts/registro/", views.register, name="register"),
     path("mi-cuenta/", views.account_dashboard, name="account_dashboard"),
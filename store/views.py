@@ -1,9 +1,24 @@
 # store/views.py
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from .models import Producto, Genero
+from .models import Producto, PerfilSolicitud, ConsultaLenta
 from .cart import Cart
+from .condicional import catalogo_condicional
+from .filtros import filtrar_catalogo, filtrar_panel
+from .exportacion import exportar, FORMATOS_EXPORTACION
+from .stock import ajustar_stock, AjusteStockError
+from .historial import reporte_sell_through
+from . import inventario, generos, catalogo, busqueda, metricas
 from .forms import ProductoForm
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
@@ -28,6 +43,7 @@ FORMATO_CHOICES = [
 # ---------------------------------------------------------------------------
 #  PÁGINA PRINCIPAL (CATÁLOGO + BÚSQUEDA + FILTROS)
 # ---------------------------------------------------------------------------
+@catalogo_condicional
 def home(request):
     """
     Página principal de la tienda.
@@ -38,106 +54,267 @@ def home(request):
     - Filtrar por tipo/formato (tipo).
     - Filtrar por uno o varios géneros (generos).
     - Filtrar por rango de precio (precio_min / precio_max).
-    """
-
-    productos = Producto.objects.all().order_by("-creado_en")
-
-    # -------------------- Leer parámetros GET --------------------
-    q = request.GET.get("q", "").strip()
-    plataforma = request.GET.get("plataforma", "").strip()
-    tipo = request.GET.get("tipo", "").strip()
-    genero_ids_raw = request.GET.getlist("generos")
-    precio_min_raw = request.GET.get("precio_min", "").strip()
-    precio_max_raw = request.GET.get("precio_max", "").strip()
 
-    # -------------------- Búsqueda (texto libre) --------------------
-    if q:
-        productos = productos.filter(
-            Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-        )
-
-    # -------------------- Filtro: plataforma --------------------
-    valid_plataformas = {code for code, _ in PLATAFORMA_CHOICES}
-    if plataforma and plataforma in valid_plataformas:
-        productos = productos.filter(plataforma=plataforma)
-    else:
-        plataforma = ""  # valor limpio para el template
-
-    # -------------------- Filtro: tipo / formato --------------------
-    valid_tipos = {code for code, _ in FORMATO_CHOICES}
-    if tipo and tipo in valid_tipos:
-        productos = productos.filter(formato=tipo)
-    else:
-        tipo = ""
+    Responde 304 si el catálogo no cambió (ETag / Last-Modified) y, para
+    anónimos, es cacheable por un proxy: el carrito y el token CSRF se piden
+    aparte a cart_summary.
+    """
 
-    # -------------------- Filtro: géneros (múltiples) --------------------
-    selected_generos = []
-    if genero_ids_raw:
-        try:
-            genero_ids = [int(g) for g in genero_ids_raw if g.isdigit()]
-        except ValueError:
-            genero_ids = []
-        if genero_ids:
-            productos = productos.filter(generos__id__in=genero_ids).distinct()
-            selected_generos = genero_ids
-
-    # -------------------- Filtro: rango de precio --------------------
-    def parse_price(value: str):
-        """
-        Convierte string a entero >= 0.
-        Devuelve None si no es válido.
-        """
-        try:
-            v = int(value)
-            return v if v >= 0 else 0
-        except (TypeError, ValueError):
-            return None
-
-    precio_min = parse_price(precio_min_raw) if precio_min_raw else None
-    precio_max = parse_price(precio_max_raw) if precio_max_raw else None
-
-    # Si el usuario pone min > max, los invertimos para que tenga sentido.
-    if precio_min is not None and precio_max is not None and precio_min > precio_max:
-        precio_min, precio_max = precio_max, precio_min
-
-    if precio_min is not None:
-        productos = productos.filter(valor__gte=precio_min)
-    if precio_max is not None:
-        productos = productos.filter(valor__lte=precio_max)
-
-    # -------------------- Datos para el template --------------------
-    filters = {
-        "q": q,
-        "plataforma": plataforma,
-        "tipo": tipo,
-        "generos": selected_generos,
-        "precio_min": precio_min_raw,
-        "precio_max": precio_max_raw,
-    }
+    productos, filters = filtrar_catalogo(
+        Producto.objects.all().order_by("-creado_en"), request.GET
+    )
 
     context = {
-        "productos": productos,
+        # Filas planas de ProductoVista (diccionarios, sin instanciar modelos)
+        "productos": list(catalogo.listar(productos, filters["relevancia"])),
         "plataformas": PLATAFORMA_CHOICES,
         "formatos": FORMATO_CHOICES,
-        "generos_disponibles": Genero.objects.all().order_by("nombre"),
+        "generos_disponibles": generos.todos(),
         "filters": filters,
     }
     return render(request, "store/home.html", context)
 
 
+@require_GET
+def search_suggest(request):
+    """
+    Autocompletado del buscador (GET: q). Lee el índice de prefijos en
+    memoria de store.busqueda, no la BD.
+    """
+    return busqueda.respuesta_sugerencias(request)
+
+
+@never_cache
+@require_GET
+def metrics(request):
+    """
+    Métricas de todos los workers en formato Prometheus (store.metricas).
+    Con METRICAS_TOKEN configurado exige "Authorization: Bearer <token>";
+    sin token solo las ve el staff (sesión iniciada).
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        autorizado = request.headers.get("Authorization") == f"Bearer {token}"
+    else:
+        autorizado = request.user.is_staff
+    if not autorizado:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metricas.exposicion(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # ---------------------------------------------------------------------------
 #  MÓDULO DE STOCK / CRUD DE PRODUCTOS (PANEL ADMIN)
 # ---------------------------------------------------------------------------
 def producto_list(request):
     """
     Vista de administración de productos (módulo de stock).
-    Muestra una tabla con todos los productos y botones para crear/editar/eliminar.
+    Muestra una tabla paginada con búsqueda, orden por columna y filtro de
+    bajo stock, más los botones para crear/editar/eliminar.
     """
-    productos = Producto.objects.all().order_by("id")
-    context = {"productos": productos}
+    productos, filters = filtrar_panel(Producto.objects.all(), request.GET)
+
+    paginator = Paginator(productos, settings.PANEL_PRODUCTOS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    context = {
+        "productos": generos.anotar_generos(page_obj.object_list),
+        "page_obj": page_obj,
+        "filters": filters,
+        "resumen_stock": inventario.resumen(),
+    }
     return render(request, "store/product_list.html", context)
 
 
+@staff_member_required
+def producto_export(request):
+    """
+    Exporta el catálogo en streaming (CSV por defecto, o JSONL con ?formato=jsonl).
+    Acepta los mismos filtros que `home` (q, plataforma, tipo, generos, precio_min, precio_max).
+    """
+    formato = request.GET.get("formato", "csv")
+    if formato not in FORMATOS_EXPORTACION:
+        formato = "csv"
+
+    productos, _ = filtrar_catalogo(Producto.objects.all(), request.GET)
+
+    content_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(
+        exportar(formato, productos),
+        content_type=f"{content_type}; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="productos.{formato}"'
+    return response
+
+
+@staff_member_required
+def producto_stock_bulk(request):
+    """
+    Editor masivo de stock.
+    Por cada producto se puede indicar un stock nuevo (absoluto) o una
+    diferencia (+/-). Todo se guarda en una sola transacción.
+    """
+    productos, filters = filtrar_panel(
+        Producto.objects.only("id", "nombre", "plataforma", "formato", "stock"),
+        request.GET,
+    )
+
+    if request.method == "POST":
+        ajustes = []
+        for producto_id in request.POST.getlist("producto"):
+            stock_raw = request.POST.get(f"stock_{producto_id}", "").strip()
+            delta_raw = request.POST.get(f"delta_{producto_id}", "").strip()
+            if stock_raw:
+                ajustes.append({"id": producto_id, "stock": stock_raw})
+            elif delta_raw and delta_raw not in ("0", "+0", "-0"):
+                ajustes.append({"id": producto_id, "delta": delta_raw})
+
+        try:
+            resultado = ajustar_stock(ajustes)
+        except AjusteStockError as e:
+            messages.error(request, str(e))
+        else:
+            if resultado:
+                messages.success(request, f"Stock actualizado en {len(resultado)} producto(s).")
+            else:
+                messages.info(request, "No se indicó ningún cambio de stock.")
+            return redirect(request.get_full_path())
+
+    paginator = Paginator(productos, settings.PANEL_PRODUCTOS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    context = {
+        "productos": page_obj.object_list,
+        "page_obj": page_obj,
+        "filters": filters,
+    }
+    return render(request, "store/product_stock_bulk.html", context)
+
+
+@require_POST
+def producto_stock_api(request):
+    """
+    API JSON para ajustes masivos de stock (solo staff).
+
+    Cuerpo esperado:
+        {"ajustes": [{"id": 1, "delta": -2}, {"id": 5, "stock": 10}]}
+
+    Respuesta:
+        {"ok": true, "productos": [{"id": 1, "stock_anterior": 7, "stock": 5}, ...]}
+    """
+    if not request.user.is_active or not request.user.is_staff:
+        return JsonResponse({"ok": False, "error": "No autorizado."}, status=403)
+
+    try:
+        data = json.loads(request.body or b"{}")
+        ajustes = data["ajustes"]
+        if not isinstance(ajustes, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"ok": False, "error": "Se esperaba un JSON con la lista 'ajustes'."},
+            status=400,
+        )
+
+    try:
+        resultado = ajustar_stock(ajustes)
+    except AjusteStockError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+
+    return JsonResponse({"ok": True, "productos": resultado})
+
+
+@staff_member_required
+def producto_reporte(request):
+    """
+    Reporte de rotación (sell-through) por plataforma para los últimos
+    N días (?dias=30 por defecto), calculado desde el historial de stock.
+    """
+    try:
+        dias = max(1, min(int(request.GET.get("dias", 30)), 365))
+    except (TypeError, ValueError):
+        dias = 30
+
+    hasta = timezone.now()
+    desde = hasta - timezone.timedelta(days=dias)
+
+    context = {
+        "reporte": reporte_sell_through(desde, hasta),
+        "dias": dias,
+        "desde": desde,
+        "hasta": hasta,
+    }
+    return render(request, "store/product_report.html", context)
+
+
+@staff_member_required
+def perfiles_list(request):
+    """
+    Requests perfilados (store.perfiles), del más lento al más rápido.
+    Se puede filtrar por nombre de URL (?vista=home).
+    """
+    perfiles = PerfilSolicitud.objects.defer("funciones", "consultas_sql")
+    vista = request.GET.get("vista", "").strip()
+    if vista:
+        perfiles = perfiles.filter(vista=vista)
+
+    context = {
+        "perfiles": perfiles.order_by("-duracion_ms")[:100],
+        "vistas": PerfilSolicitud.objects.order_by("vista").values_list("vista", flat=True).distinct(),
+        "vista": vista,
+    }
+    return render(request, "store/perfiles_list.html", context)
+
+
+@staff_member_required
+def perfil_detail(request, pk):
+    """Funciones con más tiempo y log de consultas de un request perfilado."""
+    perfil = get_object_or_404(PerfilSolicitud, pk=pk)
+    return render(request, "store/perfil_detail.html", {"perfil": perfil})
+
+
+# Columnas por las que se puede ordenar el panel de consultas lentas
+ORDENES_CONSULTAS_LENTAS = {
+    "total": "-total_ms",
+    "veces": "-veces",
+    "max": "-max_ms",
+    "ultima": "-ultima_vez",
+}
+
+
+@staff_member_required
+def consultas_lentas_list(request):
+    """
+    Consultas lentas agrupadas por huella (store.consultas_lentas), por
+    tiempo total por defecto (?orden=total|veces|max|ultima). Con POST se
+    vacía el registro.
+    """
+    if request.method == "POST":
+        ConsultaLenta.objects.all().delete()
+        messages.info(request, "Se vació el registro de consultas lentas.")
+        return redirect("consultas_lentas_list")
+
+    orden = request.GET.get("orden", "total")
+    if orden not in ORDENES_CONSULTAS_LENTAS:
+        orden = "total"
+
+    context = {
+        "consultas": ConsultaLenta.objects.defer("plan", "pila", "sql_ejemplo", "parametros")
+        .order_by(ORDENES_CONSULTAS_LENTAS[orden])[:200],
+        "orden": orden,
+        "umbral_ms": settings.CONSULTAS_LENTAS_UMBRAL_MS,
+    }
+    return render(request, "store/consultas_lentas_list.html", context)
+
+
+@staff_member_required
+def consulta_lenta_detail(request, pk):
+    """Plan, último ejemplo (SQL, parámetros, vista) y pila de una consulta lenta."""
+    consulta = get_object_or_404(ConsultaLenta, pk=pk)
+    return render(request, "store/consulta_lenta_detail.html", {"consulta": consulta})
+
+
 def producto_create(request):
     """
     Crea un producto nuevo.
@@ -201,6 +378,21 @@ def producto_delete(request, pk):
 # ---------------------------------------------------------------------------
 #  CARRITO DE COMPRAS
 # ---------------------------------------------------------------------------
+@never_cache
+@require_GET
+def cart_summary(request):
+    """
+    Fragmento por usuario para páginas cacheables (el catálogo): unidades en
+    el carrito y token CSRF para los formularios "Agregar".
+    """
+    return JsonResponse(
+        {
+            "cantidad": Cart.cantidad_en_sesion(request.session),
+            "csrf_token": get_token(request),
+        }
+    )
+
+
 def cart_detail(request):
     """
     Muestra el carrito de compras:
@@ -239,21 +431,28 @@ def cart_detail(request):
 def cart_add(request, product_id):
     """
     Agrega un producto al carrito (cantidad por defecto 1).
+    Por GET solo muestra una confirmación con su token CSRF: es lo que
+    reciben los anónimos sin JavaScript desde el catálogo cacheable.
     """
     cart = Cart(request)
     producto = get_object_or_404(Producto, id=product_id)
 
+    if request.method != "POST":
+        return render(request, "store/cart_add_confirm.html", {"producto": producto})
+
     # Validación de stock
     if producto.stock < 1:
         messages.warning(
             request,
             f"El producto '{producto.nombre}' ya no tiene stock disponible."
         )
+        metricas.contar("stock_agotado_total")
         return redirect("cart_detail")
 
     quantity = 1
     # 👇 AQUÍ EL CAMBIO IMPORTANTE: usar `producto` como parámetro POSICIONAL
     cart.add(producto, quantity=quantity)
+    metricas.contar("carrito_operaciones_total", operacion="agregar")
 
     # Sin mensaje de éxito estridente
     return redirect("cart_detail")
@@ -266,6 +465,7 @@ def cart_remove(request, product_id):
     cart = Cart(request)
     producto = get_object_or_404(Producto, id=product_id)
     cart.remove(producto)
+    metricas.contar("carrito_operaciones_total", operacion="quitar")
     messages.info(request, f"'{producto.nombre}' se eliminó del carrito.")
     return redirect("cart_detail")
 
@@ -277,6 +477,7 @@ def cart_remove_by_id(request, product_id):
     """
     cart = Cart(request)
     cart.remove_by_id(product_id)
+    metricas.contar("carrito_operaciones_total", operacion="quitar")
     messages.info(
         request,
         "Un producto que ya no existe en la tienda fue eliminado del carrito.",
@@ -298,6 +499,7 @@ def cart_update(request, product_id):
 
     if quantity < 1:
         cart.remove(producto)
+        metricas.contar("carrito_operaciones_total", operacion="quitar")
         messages.info(request, f"'{producto.nombre}' se eliminó del carrito.")
         return redirect("cart_detail")
 
@@ -311,6 +513,7 @@ def cart_update(request, product_id):
 
     # 👇 También aquí: parámetro posicional
     cart.add(producto, quantity=quantity, override_quantity=True)
+    metricas.contar("carrito_operaciones_total", operacion="actualizar")
     return redirect("cart_detail")
 
 
@@ -382,7 +585,10 @@ def account_dashboard(request):
     - Si es staff/admin: muestra accesos rápidos al panel de gestión.
     - Si es cliente: resumen simple de su cuenta.
     """
-    return render(request, "accounts/dashboard.html", {})
+    context = {}
+    if request.user.is_staff or request.user.is_superuser:
+        context["resumen_stock"] = inventario.resumen()
+    return render(request, "accounts/dashboard.html", context)
 
 
 